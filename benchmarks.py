@@ -0,0 +1,192 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from typing import Dict, Any, List
+
+import numpy as np
+import pandas as pd
+
+import lsmc_engine
+from market_data import LocalProvider, make_chain
+
+#reproducible benchmarks for the pricer and the ticker pipeline, results as JSON for comparing runs
+#  python benchmarks.py                               engine grid + end-to-end, writes bench_results.json
+#  python benchmarks.py --sims 2000,10000 --steps 50  smaller grid
+#  python benchmarks.py --compare old.json            also print the time ratio against an earlier run
+
+#Cox-Ross-Rubinstein tree, the high-accuracy reference for the American price
+def crrPrice(spotPrice, K, r, sigma, T, steps=2000, optionType="Call"):
+    dt = T / steps
+    u = np.exp(sigma * np.sqrt(dt))
+    d = 1.0 / u
+    p = (np.exp(r * dt) - d) / (u - d)
+    disc = np.exp(-r * dt)
+    sign = 1.0 if optionType == "Call" else -1.0
+
+    S = spotPrice * u ** np.arange(steps, -steps - 1, -2, dtype=np.float64)
+    V = np.maximum(sign * (S - K), 0.0)
+    for n in range(steps - 1, -1, -1):
+        S = S[:-1] * d
+        V = np.maximum(disc * (p * V[:-1] + (1.0 - p) * V[1:]), sign * (S - K))
+    return float(V[0])
+
+def _timed(fn, repeats):
+    best = float("inf")
+    out = None
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+def _peak_bytes(fn) -> int:
+    tracemalloc.start()
+    try:
+        fn()
+        return int(tracemalloc.get_traced_memory()[1])
+    finally:
+        tracemalloc.stop()
+
+#engine grid: simulate + price for every SIMULATIONS x TIME_STEPS pair, best of `repeats` wall times,
+#peak traced memory from one extra run, error against the tree
+def bench_engine(sims: List[int], steps: List[int], option_types: List[str], spot=100.0, K=100.0, r=0.05,
+                 sigma=0.3, T=1.0, repeats=3, seed=2024, tree_steps=2000) -> List[Dict[str, Any]]:
+    rows = []
+    for option_type in option_types:
+        ref = crrPrice(spot, K, r, sigma, T, tree_steps, option_type)
+        for M in steps:
+            for I in sims:
+                def simulate():
+                    return lsmc_engine.genPricePaths(sigma, spot, r, T, M, I, rng=np.random.default_rng(seed))
+                t_paths, paths = _timed(simulate, repeats)
+                t_price, est = _timed(lambda: lsmc_engine.calcOptnPriceStats(paths, K, r, T, option_type), repeats)
+                peak = _peak_bytes(lambda: lsmc_engine.calcOptnPrice(simulate(), K, r, T, option_type))
+                total = t_paths + t_price
+                rows.append({
+                    "option_type": option_type, "simulations": I, "time_steps": M,
+                    "paths_seconds": t_paths, "price_seconds": t_price, "total_seconds": total,
+                    "paths_per_second": I / total, "peak_bytes": peak,
+                    "price": est.price, "stderr": est.stderr, "reference": ref,
+                    "error": est.price - ref, "error_in_stderrs": (est.price - ref) / est.stderr,
+                })
+                del paths
+                print(f"engine {option_type} I={I} M={M}: {total*1e3:.1f} ms ({I/total:,.0f} paths/s), "
+                      f"peak {peak/2**20:.1f} MiB, price {est.price:.4f} vs tree {ref:.4f} (se {est.stderr:.4f})")
+    return rows
+
+#deterministic stand-in for yfinance: GBM bars per ticker, one expiry a year out, a call chain quoted off Black-Scholes
+def fake_provider(ticker_list: List[str], start: str, end: str, seed=7, T=1.0) -> LocalProvider:
+    rng = np.random.default_rng(seed)
+    days = np.arange(np.datetime64(start), np.datetime64(end), dtype="datetime64[D]")
+    days = days[np.is_busday(days)]
+    expiry = (date.today() + timedelta(days=int(round(T * 365)))).isoformat()
+    spots, bars, expiries, chains = {}, {}, {}, {}
+    for tk in ticker_list:
+        sigma = rng.uniform(0.15, 0.6)
+        close = 100.0 * np.exp(np.cumsum(rng.normal(0.0, sigma / np.sqrt(252.0), days.size)))
+        bars[tk] = {"date": days, "close": close, "high": close * 1.01, "low": close * 0.99}
+        spot = spots[tk] = float(close[-1])
+        strikes = np.round(spot * np.linspace(0.7, 1.3, 25))
+        #quotes scattered around fair value so the run sees BUY, SELL and HOLD
+        fair = np.array([lsmc_engine.bsPrice(spot, k, 0.05, sigma, T) for k in strikes])
+        mid = fair * rng.uniform(0.85, 1.15, strikes.size)
+        calls = pd.DataFrame({"strike": strikes, "bid": mid * 0.98, "ask": mid * 1.02, "lastPrice": mid,
+                              "contractSymbol": [f"{tk}{int(k)}C" for k in strikes]})
+        expiries[tk] = [expiry]
+        chains[(tk, expiry)] = make_chain(calls)
+    return LocalProvider(spots, bars, expiries, chains)
+
+#end-to-end: run_once_for_ticker per ticker and a full run_batch_once (trades, journal, state, excel)
+#inside a scratch directory, with market data served by fake_provider
+def bench_e2e(ticker_list: List[str], repeats=3, seed=7) -> Dict[str, Any]:
+    import main
+
+    provider = fake_provider(ticker_list, main.start_date, main.end_date, seed=seed, T=main.T)
+    main.set_market_data_provider(provider)
+    saved_tickers, main.tickers = main.tickers, list(ticker_list)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch:
+        os.chdir(scratch)
+        try:
+            per_ticker = {}
+            for tk in ticker_list:
+                t, res = _timed(lambda: main.run_once_for_ticker(tk, None), repeats)
+                per_ticker[tk] = {"seconds": t, "decision": res.get("decision"), "ok": res.get("ok")}
+            with contextlib.redirect_stdout(io.StringIO()):
+                t_batch, _ = _timed(main.run_batch_once, repeats)
+        finally:
+            os.chdir(cwd)
+            main.tickers = saved_tickers
+            main.set_market_data_provider(None)
+    print(f"e2e run_once_for_ticker: {sum(v['seconds'] for v in per_ticker.values())*1e3:.1f} ms total, "
+          f"run_batch_once: {t_batch*1e3:.1f} ms for {len(ticker_list)} tickers")
+    return {"tickers": ticker_list, "run_once_for_ticker": per_ticker, "run_batch_once_seconds": t_batch,
+            "simulations": main.I, "time_steps": main.M}
+
+def _meta() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"timestamp": datetime.now().isoformat(timespec="seconds"), "commit": commit,
+            "python": sys.version.split()[0], "numpy": np.__version__, "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(), "cpus": os.cpu_count()}
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    key = lambda row: (row["option_type"], row["simulations"], row["time_steps"])
+    base = {key(row): row for row in baseline.get("engine", [])}
+    for row in current.get("engine", []):
+        old = base.get(key(row))
+        if old:
+            print(f"compare {row['option_type']} I={row['simulations']} M={row['time_steps']}: "
+                  f"time x{row['total_seconds']/old['total_seconds']:.2f}, "
+                  f"peak x{row['peak_bytes']/max(old['peak_bytes'], 1):.2f}")
+    if "e2e" in current and "e2e" in baseline:
+        print(f"compare run_batch_once: x{current['e2e']['run_batch_once_seconds']/baseline['e2e']['run_batch_once_seconds']:.2f}")
+
+def _ints(spec: str) -> List[int]:
+    return [int(x) for x in spec.split(",") if x.strip()]
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="LSMC engine and pipeline benchmarks")
+    ap.add_argument("--sims", default="2000,10000,50000", help="SIMULATIONS grid")
+    ap.add_argument("--steps", default="25,50,100", help="TIME_STEPS grid")
+    ap.add_argument("--option-types", default="Call,Put")
+    ap.add_argument("--repeats", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=2024)
+    ap.add_argument("--tree-steps", type=int, default=2000)
+    ap.add_argument("--tickers", default="AAA,BBB,CCC,DDD")
+    ap.add_argument("--skip-engine", action="store_true")
+    ap.add_argument("--skip-e2e", action="store_true")
+    ap.add_argument("--out", default="bench_results.json")
+    ap.add_argument("--compare", default=None, help="earlier results file to compare against")
+    args = ap.parse_args(argv)
+
+    results = {"meta": _meta()}
+    if not args.skip_engine:
+        results["engine"] = bench_engine(_ints(args.sims), _ints(args.steps),
+                                         [s.strip() for s in args.option_types.split(",") if s.strip()],
+                                         repeats=args.repeats, seed=args.seed, tree_steps=args.tree_steps)
+    if not args.skip_e2e:
+        results["e2e"] = bench_e2e([t.strip() for t in args.tickers.split(",") if t.strip()], repeats=args.repeats)
+
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump(results, fh, indent=2)
+    print(f"wrote {args.out}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as fh:
+            compare(results, json.load(fh))
+    return results
+
+if __name__ == "__main__":
+    main()
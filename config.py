@@ -1,25 +1,133 @@
-from dotenv import load_dotenv
-from pathlib import Path
-import os
-
-#load stor_configs.env from the same folder as this file (robust to CWD)
-env_path = Path(__file__).with_name("stor_configs.env")
-load_dotenv(dotenv_path=env_path, override=False)
-
-#SAFE DEFAULTS so we never crash if a key is missing
-tickers_raw = os.getenv("TICKERS") or "AAPL,MSFT,GOOGL,TSLA"
-tickers = [t.strip() for t in tickers_raw.split(",") if t.strip()]
-
-start_date = os.getenv("START_DATE", "2024-01-01")
-end_date   = os.getenv("END_DATE", "2025-01-01")
-
-T = float(os.getenv("MATURITY_YEARS", "1"))
-strike_type = (os.getenv("STRIKE_TYPE", "ATM") or "ATM").upper()
-strike_pct = float(os.getenv("STRIKE_PERCENT", "0.05"))
-thresh = float(os.getenv("THRESHOLD", "0.05"))
-
-M = int(os.getenv("TIME_STEPS", "50"))
-I = int(os.getenv("SIMULATIONS", "10000"))
-r = float(os.getenv("RISK_FREE_RATE", "0.05"))
-
-excel_output = os.getenv("EXCEL_OUTPUT", "TransactionRecords.xlsx")
+from dotenv import load_dotenv
+from pathlib import Path
+import os
+
+#load stor_configs.env from the same folder as this file (robust to CWD)
+env_path = Path(__file__).with_name("stor_configs.env")
+load_dotenv(dotenv_path=env_path, override=False)
+
+#true/false style switches
+def _flag(name, default="false"):
+    return (os.getenv(name, default) or default).strip().lower() in ("1", "true", "yes")
+
+#SAFE DEFAULTS so we never crash if a key is missing
+tickers_raw = os.getenv("TICKERS") or "AAPL,MSFT,GOOGL,TSLA"
+tickers = [t.strip() for t in tickers_raw.split(",") if t.strip()]
+
+start_date = os.getenv("START_DATE", "2024-01-01")
+end_date   = os.getenv("END_DATE", "2025-01-01")
+
+T = float(os.getenv("MATURITY_YEARS", "1"))
+strike_type = (os.getenv("STRIKE_TYPE", "ATM") or "ATM").upper()
+strike_pct = float(os.getenv("STRIKE_PERCENT", "0.05"))
+thresh = float(os.getenv("THRESHOLD", "0.05"))
+
+M = int(os.getenv("TIME_STEPS", "50"))
+I = int(os.getenv("SIMULATIONS", "10000"))
+r = float(os.getenv("RISK_FREE_RATE", "0.05"))
+path_dtype = (os.getenv("PATH_DTYPE", "float64") or "float64").lower()
+#directory for a disk-backed path matrix (np.memmap) when SIMULATIONS x TIME_STEPS does not fit in RAM, empty = RAM
+path_scratch = os.getenv("PATH_SCRATCH", "") or None
+#price without holding the path matrix in memory (for large SIMULATIONS x TIME_STEPS)
+streaming_pricer = _flag("STREAMING_PRICER", "false")
+#continuation regression basis: poly2 (1, S, S^2), polyN, laguerreN or hermiteN on moneyness S/K
+regression_basis = (os.getenv("REGRESSION_BASIS", "poly2") or "poly2").strip().lower()
+#report delta/gamma/vega next to the model price, from the same simulated paths
+compute_greeks = _flag("COMPUTE_GREEKS", "false")
+#price the whole watchlist in one tensorized engine call (plain Monte Carlo, the VR_* switches do not apply)
+watchlist_batch = _flag("WATCHLIST_BATCH", "false")
+#evaluate every quoted contract of every expiry within SCAN_MAX_DAYS instead of one strike per ticker;
+#decisions (and trades) go to the SCAN_TOP contracts with the largest |edge| (0 = all of them)
+scan_full_chain = _flag("SCAN_FULL_CHAIN", "false")
+scan_max_days = int(os.getenv("SCAN_MAX_DAYS", "400"))
+scan_top = int(os.getenv("SCAN_TOP", "10"))
+#memoize prices on a (K/S, sigma, T, r, M, type) grid with fixed-seed paths, so repeat polls are a lookup
+price_cache = _flag("PRICE_CACHE", "false")
+price_cache_size = int(os.getenv("PRICE_CACHE_SIZE", "4096"))
+price_cache_step = float(os.getenv("PRICE_CACHE_STEP", "0.0025"))
+price_cache_neighbours = int(os.getenv("PRICE_CACHE_NEIGHBOURS", "2"))
+price_cache_seed = int(os.getenv("PRICE_CACHE_SEED", "12345"))
+#precomputed price surface (file prefix, empty = off) used as a first-pass screen; grids are "lo,hi,n" or one value
+#tickers whose interpolated edge is within the surface's error bound (+ SURFACE_GUARD) of THRESHOLD get simulated
+price_surface = os.getenv("PRICE_SURFACE", "")
+surface_moneyness = os.getenv("SURFACE_MONEYNESS", "0.7,1.3,61")
+surface_sigmas = os.getenv("SURFACE_SIGMAS", "0.05,1.0,39")
+surface_maturities = os.getenv("SURFACE_MATURITIES", str(T))
+surface_rates = os.getenv("SURFACE_RATES", str(r))
+surface_paths = int(os.getenv("SURFACE_PATHS", "50000"))
+surface_guard = float(os.getenv("SURFACE_GUARD", "0.0"))
+#variance reduction: antithetic pairs, European control variate, randomized Sobol (QMC_REPLICATES scrambles)
+vr_antithetic = _flag("VR_ANTITHETIC", "false")
+vr_control_variate = _flag("VR_CONTROL_VARIATE", "false")
+vr_qmc = _flag("VR_QMC", "false")
+qmc_replicates = int(os.getenv("QMC_REPLICATES", "8"))
+#adaptive budgeting: simulate in batches until the edge CI settles BUY/SELL/HOLD, capped at ADAPTIVE_MAX_PATHS
+adaptive_pricing = _flag("ADAPTIVE_PRICING", "false")
+adaptive_min_batch = int(os.getenv("ADAPTIVE_MIN_BATCH", "2000"))
+adaptive_max_paths = int(os.getenv("ADAPTIVE_MAX_PATHS", str(I)))
+
+#concurrency: threads for yfinance fetches, processes for pricing (1 = price inline)
+fetch_workers = int(os.getenv("FETCH_WORKERS", "8"))
+price_workers = int(os.getenv("PRICE_WORKERS", "0")) or (os.cpu_count() or 1)
+#threads inside one pricing (path blocks of ENGINE_BLOCK_PATHS, each with its own seeded stream), 1 = off;
+#meant for few, very large pricings (e.g. PRICE_WORKERS=1 and millions of SIMULATIONS)
+engine_threads = int(os.getenv("ENGINE_THREADS", "1")) or (os.cpu_count() or 1)
+engine_block_paths = int(os.getenv("ENGINE_BLOCK_PATHS", "65536"))
+
+#market data cache: per-kind ttl in seconds, lru size, on-disk store for closed history windows
+md_ttl = {
+    "spot": float(os.getenv("MD_TTL_SPOT", "15")),
+    "history": float(os.getenv("MD_TTL_HISTORY", "86400")),
+    "expiries": float(os.getenv("MD_TTL_EXPIRIES", "3600")),
+    "chain": float(os.getenv("MD_TTL_CHAIN", "30")),
+}
+md_cache_size = int(os.getenv("MD_CACHE_SIZE", "1024"))
+md_store_dir = os.getenv("MD_STORE_DIR", "market_data")
+
+excel_output = os.getenv("EXCEL_OUTPUT", "TransactionRecords.xlsx")
+#append-only trade journal (one JSONL file per day) that the Excel workbook is exported from
+trade_journal_dir = os.getenv("TRADE_JOURNAL_DIR", "trade_journal")
+trade_journal_fsync = _flag("TRADE_JOURNAL_FSYNC", "true")
+#portfolio state: deltas go to a write-ahead log, compacted into a snapshot every N deltas
+state_snapshot_every = int(os.getenv("STATE_SNAPSHOT_EVERY", "100"))
+state_fsync = _flag("STATE_FSYNC", "true")
+#end of cycle: settle positions past expiry at intrinsic value, then mark the book to
+#off, market (listed mids) or model (one batched lsmc pass per underlying) for the unrealized pnl
+settle_expired = _flag("SETTLE_EXPIRED", "true")
+mark_to_market = (os.getenv("MARK_TO_MARKET", "off") or "off").strip().lower()
+
+#instrumentation: off, jsonl (one line per cycle) or prometheus (text file rewritten each cycle)
+metrics_format = (os.getenv("METRICS", "off") or "off").strip().lower()
+metrics_path = os.getenv("METRICS_PATH", "") or None
+
+#pricing daemon (service.py serve): http on SERVICE_HOST:SERVICE_PORT, or a Unix socket when SERVICE_SOCKET is set;
+#requests arriving within SERVICE_BATCH_MS of each other are priced together, up to SERVICE_MAX_BATCH tickers
+service_host = os.getenv("SERVICE_HOST", "127.0.0.1")
+service_port = int(os.getenv("SERVICE_PORT", "8765"))
+service_socket = os.getenv("SERVICE_SOCKET", "") or None
+service_batch_ms = float(os.getenv("SERVICE_BATCH_MS", "20"))
+service_max_batch = int(os.getenv("SERVICE_MAX_BATCH", "64"))
+
+#market-hours loop: every ticker polls on its own fixed deadline grid, the loop's poll_seconds apart or
+#SCHED_INTERVALS seconds (TICKER:seconds,...); SCHED_FAST_SECONDS instead while its last |edge| was within
+#SCHED_EDGE_BAND of THRESHOLD or its contract expires within SCHED_NEAR_EXPIRY_DAYS (those also go first);
+#at most SCHED_MAX_IN_FLIGHT tickers fetch/price at once (0 = FETCH_WORKERS)
+sched_intervals = {k.strip().upper(): float(v) for k, v in
+                   (p.split(":", 1) for p in (os.getenv("SCHED_INTERVALS", "") or "").split(",") if ":" in p)}
+sched_fast_seconds = float(os.getenv("SCHED_FAST_SECONDS", "15"))
+sched_edge_band = float(os.getenv("SCHED_EDGE_BAND", "0.02"))
+sched_near_expiry_days = int(os.getenv("SCHED_NEAR_EXPIRY_DAYS", "14"))
+sched_max_in_flight = int(os.getenv("SCHED_MAX_IN_FLIGHT", "0")) or fetch_workers
+
+#capture of every poll's market data reads into RECORD_DIR (one segment per cycle, empty = off) for replay.py;
+#REPLAY_WORKERS processes run replay jobs (0 = every core)
+record_dir = os.getenv("RECORD_DIR", "") or None
+replay_workers = int(os.getenv("REPLAY_WORKERS", "0"))
+
+#historical vol (vol_state.py): close (sample std of daily log returns), ewma or parkinson (high/low range),
+#over the last VOL_WINDOW bars (0 = every bar since START_DATE); updated bar by bar and kept in VOL_STATE_PATH
+#between runs (empty = memory only)
+vol_estimator = (os.getenv("VOL_ESTIMATOR", "close") or "close").strip().lower()
+vol_window = int(os.getenv("VOL_WINDOW", "0"))
+vol_ewma_lambda = float(os.getenv("VOL_EWMA_LAMBDA", "0.94"))
+vol_state_path = os.getenv("VOL_STATE_PATH", "vol_state.npz") or None
@@ -1,85 +1,819 @@
-import numpy as np
-import yfinance as yf
-import pandas as pd
-
-#HEAVILY COMMENTED TO DEMONSTRATE UNDERSTANDING
-
-#use GBM here for multiple future paths
-def genPricePaths(hist_sigma, spotPrice, rfr, matInYrs, steps, numOfPaths):
-    dt = matInYrs / steps
-    paths = np.zeros((numOfPaths, steps+1))
-    paths[:, 0] = spotPrice
-    
-    Z = np.random.normal(0, 1, size=(numOfPaths, steps))
-    
-    drift = (rfr - 0.5*hist_sigma**2) * dt
-    diffusion = hist_sigma * np.sqrt(dt) * Z
-    log_returns = drift+diffusion
-    
-    for t in range(1, steps + 1):
-        paths[:, t] = paths[:, t-1] * np.exp(log_returns[:, t-1])
-    return paths
-
-#calc payoff for each sim done
-def payoffCalc(St, Strike, option_type):
-    if option_type == "Call":
-        return np.maximum(St - Strike, 0)
-    else:
-        return np.maximum(Strike - St, 0)
-
-#using rfr (2%), apply time discounting to future cashflows
-def discountCashFlow(values, r, dt, fromTimeIndex, ToTimeIndex):
-    return values * np.exp(-r * dt * (fromTimeIndex - ToTimeIndex))
-
-#checks val of option if not exercised at each step
-def fitRegression(SItem, futureVals):
-    A = np.vstack([np.ones_like(SItem), SItem, SItem**2]).T
-    beta = np.linalg.lstsq(A, futureVals, rcond=None)[0]
-    continuation = beta[0] + beta[1] * SItem + beta[2] * SItem**2
-    return continuation, beta
-
-#compare exercise val to cont val to decide when to exercise
-def detExercise(immediateItem, continuationItem):
-    return immediateItem > continuationItem
-
-#determine fair value of option using discounted cashflows and optimal exercise policy
-def calcOptnPrice(paths, K, r, T, optionType="Call"):
-    I, M_plus_1 = paths.shape
-    M = M_plus_1 - 1
-    dt = T / M
-
-    #default is to exercise at maturity
-    cashflows = np.zeros(I)
-    exerciseTimes = np.full(I, M, dtype=int)
-
-    final_payoff = payoffCalc(paths[:, -1], K, optionType)
-    cashflows[:] = final_payoff
-
-    #backward induction
-    for t in range(M - 1, 0, -1):
-        S_t = paths[:, t]
-        immediate = payoffCalc(S_t, K, optionType)
-
-        #only ITM paths
-        itemIndex = np.where(immediate > 0)[0]
-        if itemIndex.size == 0:
-            continue
-
-        #discount each path's current "plan" (cashflow at its exercise time) to time t
-        fv_at_t = discountCashFlow(cashflows[itemIndex], r, dt, exerciseTimes[itemIndex], t)
-
-        #regress continuation on ITM set
-        cont_vals, _ = fitRegression(S_t[itemIndex], fv_at_t)
-
-        #decide where to exercise now
-        ex_now_mask = detExercise(immediate[itemIndex], cont_vals)
-        ex_now_idx = itemIndex[ex_now_mask]
-
-        #update those paths: lock in immediate payoff and stamp time
-        cashflows[ex_now_idx] = immediate[ex_now_idx]
-        exerciseTimes[ex_now_idx] = t
-
-    #discount all realized cashflows to time 0 and average
-    pv = discountCashFlow(cashflows, r, dt, exerciseTimes, 0)
-    return float(np.mean(pv))
-
+import math
+import tempfile
+import threading
+import warnings
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import regression
+
+#HEAVILY COMMENTED TO DEMONSTRATE UNDERSTANDING
+
+#normals drawn per block of time steps, keeps the scratch block small for huge path counts
+PATH_BLOCK_ELEMS = 1 << 22
+
+#paths per block in priceParallel; fixed rather than derived from the worker count, so the split is too
+PARALLEL_BLOCK_PATHS = 1 << 16
+
+#use GBM here for multiple future paths
+#paths are built time-major so each time column is contiguous, then returned as an (I, M+1) view
+#exercise_every=k keeps only every k-th time column (the dates calcOptnPrice regresses on)
+#rng can be a np.random.Generator/RandomState, defaults to the global np.random stream
+#antithetic: second half of the paths mirrors the first (path i pairs with i + I/2)
+#qmc: scrambled Sobol normals in Brownian-bridge order instead of pseudo-random draws (needs scipy)
+#scratch: directory for a disk-backed (np.memmap) path matrix instead of RAM, for runs that do not fit;
+#the file is anonymous and goes away with the array. dtype=np.float32 halves it, log-prices are still
+#accumulated in float64. same rng -> same paths, whether in RAM or on disk
+def genPricePaths(hist_sigma, spotPrice, rfr, matInYrs, steps, numOfPaths, dtype=np.float64, exercise_every=1,
+                  rng=None, antithetic=False, qmc=False, scratch=None):
+    if exercise_every < 1 or steps % exercise_every:
+        raise ValueError("exercise_every must divide steps")
+    if antithetic and numOfPaths % 2:
+        raise ValueError("antithetic paths need an even numOfPaths")
+    rng = np.random if rng is None else rng
+    dt = matInYrs / steps
+    cols = steps // exercise_every
+
+    #row t of the buffer is time column t
+    if scratch is not None:
+        paths = np.memmap(tempfile.TemporaryFile(dir=scratch), dtype=dtype, mode="w+", shape=(cols + 1, numOfPaths))
+    else:
+        paths = np.empty((cols + 1, numOfPaths), dtype=dtype)
+    paths[0] = spotPrice
+
+    drift = (rfr - 0.5*hist_sigma**2) * dt
+    vol = hist_sigma * np.sqrt(dt)
+
+    running = np.zeros(numOfPaths)
+    half = numOfPaths // 2 if antithetic else numOfPaths
+    normals = sobolNormals(steps, half, rng) if qmc else None
+    if half * exercise_every > PATH_BLOCK_ELEMS:
+        _fillWide(paths, running, rng, normals, half, cols, exercise_every, drift, vol, spotPrice, antithetic)
+        return paths.T
+
+    #draw a block of time steps at a time, accumulate in float64 and carry the running log-sum
+    per_block = max(1, PATH_BLOCK_ELEMS // max(1, numOfPaths * exercise_every))
+    for c0 in range(0, cols, per_block):
+        c1 = min(c0 + per_block, cols)
+        rows = (c1 - c0) * exercise_every
+        if normals is not None:
+            Z = normals[c0 * exercise_every:c1 * exercise_every]
+        else:
+            Z = rng.standard_normal((rows, half))
+        if antithetic:
+            Zh = Z
+            Z = np.empty((rows, numOfPaths))
+            Z[:, :half] = Zh
+            np.negative(Zh, out=Z[:, half:])
+        Z *= vol
+        Z += drift
+        if exercise_every > 1:
+            #only exercise dates are stored, so sum the increments in between
+            Z = Z.reshape(c1 - c0, exercise_every, numOfPaths).sum(axis=1)
+        Z[0] += running
+        np.cumsum(Z, axis=0, out=Z)
+        running[:] = Z[-1]
+        np.exp(Z, out=Z)
+        Z *= spotPrice
+        paths[c0 + 1:c1 + 1] = Z
+    return paths.T
+
+#genPricePaths for path counts where even one time step exceeds the block: each step is drawn in
+#path chunks (same draw order as one full row, so the same paths) and only the float64 running
+#log-sum stays in memory at full width
+def _fillWide(paths, running, rng, normals, half, cols, exercise_every, drift, vol, spotPrice, antithetic):
+    chunk = PATH_BLOCK_ELEMS
+    incr = np.empty(running.size)
+    for c in range(cols):
+        for k in range(exercise_every):
+            s = c * exercise_every + k
+            for p0 in range(0, half, chunk):
+                p1 = min(p0 + chunk, half)
+                z = normals[s, p0:p1] if normals is not None else rng.standard_normal(p1 - p0)
+                dz = z * vol
+                dz += drift
+                if k == 0:
+                    incr[p0:p1] = dz
+                else:
+                    incr[p0:p1] += dz
+                if antithetic:
+                    dz = -z * vol
+                    dz += drift
+                    if k == 0:
+                        incr[half + p0:half + p1] = dz
+                    else:
+                        incr[half + p0:half + p1] += dz
+        for p0 in range(0, running.size, chunk):
+            p1 = min(p0 + chunk, running.size)
+            running[p0:p1] += incr[p0:p1]
+            out = np.exp(running[p0:p1])
+            out *= spotPrice
+            paths[c + 1, p0:p1] = out
+
+#scrambled Sobol points turned into normals, returned as (steps, numOfPaths) unit-variance increments
+#dimensions are handed out in Brownian-bridge order, so the first (best spread) coordinates set the
+#terminal value and the coarse shape of every path and the later ones only fill in detail
+def sobolNormals(steps, numOfPaths, rng=None):
+    try:
+        from scipy.stats import qmc
+        from scipy.special import ndtri
+    except ImportError as e:
+        raise ImportError("qmc paths need scipy (pip install scipy)") from e
+
+    #tie the scramble to the caller's stream so seeding stays reproducible
+    if isinstance(rng, (np.random.Generator, np.random.RandomState)):
+        seed = rng
+    else:
+        seed = int(np.random.randint(0, 2**31 - 1))
+    try:
+        sampler = qmc.Sobol(d=steps, scramble=True, rng=seed)
+    except TypeError:
+        sampler = qmc.Sobol(d=steps, scramble=True, seed=seed)
+    with warnings.catch_warnings():
+        #non power-of-two counts lose some balance but stay valid
+        warnings.simplefilter("ignore")
+        U = sampler.random(numOfPaths)
+    np.clip(U, 1e-12, 1 - 1e-12, out=U)
+    return _brownianBridge(ndtri(U).T)
+
+#maps normals (row 0 = most important dimension) to Brownian increments on a unit-step grid
+def _brownianBridge(Z):
+    n = Z.shape[0]
+    W = np.zeros((n + 1, Z.shape[1]))
+    W[n] = np.sqrt(n) * Z[0]
+    j = 1
+    queue = [(0, n)]
+    for left, right in queue:
+        if right - left < 2:
+            continue
+        mid = (left + right) // 2
+        W[mid] = ((right - mid) * W[left] + (mid - left) * W[right]) / (right - left)
+        W[mid] += np.sqrt((mid - left) * (right - mid) / (right - left)) * Z[j]
+        j += 1
+        queue.append((left, mid))
+        queue.append((mid, right))
+    return np.diff(W, axis=0)
+
+#calc payoff for each sim done
+def payoffCalc(St, Strike, option_type):
+    if option_type == "Call":
+        return np.maximum(St - Strike, 0)
+    else:
+        return np.maximum(Strike - St, 0)
+
+#using rfr (2%), apply time discounting to future cashflows
+def discountCashFlow(values, r, dt, fromTimeIndex, ToTimeIndex):
+    return values * np.exp(-r * dt * (fromTimeIndex - ToTimeIndex))
+
+#checks val of option if not exercised at each step
+#basis picks the regression functions (see regression.py), default "poly2" is 1, S, S^2;
+#they are evaluated on S/scale (the strike in the engine, so normalized moneyness)
+def fitRegression(SItem, futureVals, basis="poly2", scale=None):
+    if scale is None:
+        scale = float(np.mean(SItem))
+    return regression.fitContinuation(SItem, futureVals, scale, basis)
+
+#compare exercise val to cont val to decide when to exercise
+def detExercise(immediateItem, continuationItem):
+    return immediateItem > continuationItem
+
+#determine fair value of option using discounted cashflows and optimal exercise policy
+def calcOptnPrice(paths, K, r, T, optionType="Call", basis="poly2"):
+    return float(np.mean(_pathValues(paths, K, r, T, optionType, basis)))
+
+#per-path discounted cashflows under the regressed exercise policy
+#this is the calling thread's LSMCPricer buffer, valid until its next price on the same (I, M)
+def _pathValues(paths, K, r, T, optionType="Call", basis="poly2"):
+    I, M_plus_1 = paths.shape
+    return getPricer(I, M_plus_1 - 1, basis).pathValues(paths, K, r, T, optionType)
+
+#runs the regression/exercise sweep, returns undiscounted cashflows, their exercise steps and dt
+#(the pricer's buffers, as for _pathValues)
+def _backwardInduction(paths, K, r, T, optionType="Call", basis="poly2"):
+    I, M_plus_1 = paths.shape
+    return getPricer(I, M_plus_1 - 1, basis).run(paths, K, r, T, optionType)
+
+#stateful lsmc pricer owning every per-step temporary for I paths and M steps, reusable across contracts
+#and tickers: gathers and scatters go through np.take/np.put on fixed buffers, payoffs, masks and discounting are
+#written with out=, the design matrix is filled in place, and exp(-r*dt*k) comes from a table built once
+#per (r, dt). gives exactly the prices of the plain per-step version
+#not thread-safe, use one per thread (getPricer does)
+class LSMCPricer:
+    def __init__(self, numOfPaths, steps, basis="poly2"):
+        I = self.numOfPaths = int(numOfPaths)
+        self.steps = int(steps)
+        self.basis = basis
+        p = regression.parseBasis(basis)[1] + 1
+
+        #full-length workspaces
+        self.cashflows = np.empty(I)
+        self.exerciseTimes = np.empty(I, dtype=int)
+        self.pv = np.empty(I)
+        self._S_t = np.empty(I)
+        self._immediate = np.empty(I)
+        self._itm = np.empty(I, dtype=bool)
+        #ITM-compacted workspaces, the leading n entries are used at each step
+        self._S = np.empty(I)
+        self._fv = np.empty(I)
+        self._disc = np.empty(I)
+        self._lag = np.empty(I, dtype=int)
+        self._fit = np.empty(I)
+        self._immItm = np.empty(I)
+        self._exNow = np.empty(I, dtype=bool)
+        self._exIdx = np.empty(I, dtype=np.intp)
+        self._design = np.empty((I, p))
+
+        self._discKey = None
+        self._discTable = None
+
+    #exp(-r*dt*k) for k = 0..M, the same products discountCashFlow forms
+    def _discounts(self, r, dt):
+        if self._discKey != (r, dt):
+            self._discTable = np.exp(-r * dt * np.arange(self.steps + 1))
+            self._discKey = (r, dt)
+        return self._discTable
+
+    @staticmethod
+    def _payoff(S, K, call, out):
+        if call:
+            np.subtract(S, K, out=out)
+        else:
+            np.subtract(K, S, out=out)
+        return np.maximum(out, 0, out=out)
+
+    #backward induction into self.cashflows/self.exerciseTimes, returns them and dt
+    def run(self, paths, K, r, T, optionType="Call"):
+        I, M_plus_1 = paths.shape
+        M = self.steps
+        if I != self.numOfPaths or M_plus_1 != M + 1:
+            raise ValueError(f"pricer is sized for ({self.numOfPaths}, {M + 1}) paths, got {paths.shape}")
+        dt = T / M
+        disc = self._discounts(r, dt)
+        call = optionType == "Call"
+        cashflows, exerciseTimes = self.cashflows, self.exerciseTimes
+
+        #default is to exercise at maturity; float32 columns are widened into the float64 workspace
+        exerciseTimes.fill(M)
+        np.copyto(self._S_t, paths[:, -1])
+        self._payoff(self._S_t, K, call, cashflows)
+
+        for t in range(M - 1, 0, -1):
+            S_t = self._S_t
+            np.copyto(S_t, paths[:, t])
+            immediate = self._payoff(S_t, K, call, self._immediate)
+            #index lists are the one per-step allocation: boolean-mask gathers and scatters go element by
+            #element on an unpredictable mask and run several times slower than take/put on indices
+            #(take's mode="clip" only skips the buffered copy of out that "raise" makes, indices are in range)
+            itm = np.greater(immediate, 0, out=self._itm)
+            idx = np.flatnonzero(itm)
+            n = idx.size
+            if n == 0:
+                continue
+
+            #ITM paths' plans discounted to t: cashflow * exp(-r*dt*(tau - t))
+            S = np.take(S_t, idx, out=self._S[:n], mode="clip")
+            fv = np.take(cashflows, idx, out=self._fv[:n], mode="clip")
+            lag = np.take(exerciseTimes, idx, out=self._lag[:n], mode="clip")
+            lag -= t
+            fv *= np.take(disc, lag, out=self._disc[:n], mode="clip")
+
+            #continuation regression on S/K, design matrix written into the workspace
+            S /= K
+            A = regression.basisMatrix(S, self.basis, out=self._design[:n])
+            beta = regression.solveLeastSquares(A, fv)
+            fit = np.dot(A, beta, out=self._fit[:n])
+
+            #lock in the immediate payoff where it beats continuation
+            immItm = np.take(immediate, idx, out=self._immItm[:n], mode="clip")
+            ex = np.flatnonzero(np.greater(immItm, fit, out=self._exNow[:n]))
+            exIdx = np.take(idx, ex, out=self._exIdx[:ex.size], mode="clip")
+            np.put(cashflows, exIdx, np.take(immItm, ex, out=self._S[:ex.size], mode="clip"))
+            np.put(exerciseTimes, exIdx, t)
+
+        return cashflows, exerciseTimes, dt
+
+    #per-path discounted cashflows (self.pv, overwritten by the next call)
+    def pathValues(self, paths, K, r, T, optionType="Call"):
+        cashflows, exerciseTimes, dt = self.run(paths, K, r, T, optionType)
+        disc = np.take(self._discounts(r, dt), exerciseTimes, out=self._disc, mode="clip")
+        return np.multiply(cashflows, disc, out=self.pv)
+
+    def price(self, paths, K, r, T, optionType="Call"):
+        return float(np.mean(self.pathValues(paths, K, r, T, optionType)))
+
+#one pricer per thread, kept while (I, M, basis) stays the same, so repeat pricing allocates nothing per step
+_pricers = threading.local()
+
+def getPricer(numOfPaths, steps, basis="poly2"):
+    pricer = getattr(_pricers, "pricer", None)
+    if pricer is None or (pricer.numOfPaths, pricer.steps, pricer.basis) != (int(numOfPaths), int(steps), basis):
+        pricer = _pricers.pricer = LSMCPricer(numOfPaths, steps, basis)
+    return pricer
+
+#one backward induction step at time t, updates cashflows/exerciseTimes in place
+def _exerciseStep(S_t, t, cashflows, exerciseTimes, K, r, dt, optionType, basis="poly2"):
+    immediate = payoffCalc(S_t, K, optionType)
+
+    #only ITM paths
+    itemIndex = np.where(immediate > 0)[0]
+    if itemIndex.size == 0:
+        return
+
+    #discount each path's current "plan" (cashflow at its exercise time) to time t
+    fv_at_t = discountCashFlow(cashflows[itemIndex], r, dt, exerciseTimes[itemIndex], t)
+
+    #regress continuation on ITM set
+    cont_vals, _ = fitRegression(S_t[itemIndex], fv_at_t, basis, scale=K)
+
+    #decide where to exercise now
+    ex_now_mask = detExercise(immediate[itemIndex], cont_vals)
+    ex_now_idx = itemIndex[ex_now_mask]
+
+    #update those paths: lock in immediate payoff and stamp time
+    cashflows[ex_now_idx] = immediate[ex_now_idx]
+    exerciseTimes[ex_now_idx] = t
+
+#rng state helpers, lets a step's normals be replayed later from its recorded state
+def _rngState(rng):
+    if isinstance(rng, np.random.Generator):
+        return rng.bit_generator.state
+    return rng.get_state()
+
+def _setRngState(rng, state):
+    if isinstance(rng, np.random.Generator):
+        rng.bit_generator.state = state
+    else:
+        rng.set_state(state)
+
+#streaming LSMC that never holds the path matrix, working memory is O(I) for any number of steps
+#forward pass keeps only log S and the rng state before each step's draw,
+#backward pass replays each step's normals from its state and walks log S back one column at a time
+#same seed gives the same price as calcOptnPrice(genPricePaths(...)) up to floating point roundoff
+def calcOptnPriceStreaming(hist_sigma, spotPrice, rfr, matInYrs, steps, numOfPaths, K, optionType="Call",
+                           rng=None, basis="poly2"):
+    rng = np.random if rng is None else rng
+    dt = matInYrs / steps
+    drift = (rfr - 0.5*hist_sigma**2) * dt
+    vol = hist_sigma * np.sqrt(dt)
+
+    #forward pass, draws in the same step-major order as genPricePaths
+    states = []
+    logS = np.zeros(numOfPaths)
+    for t in range(steps):
+        states.append(_rngState(rng))
+        inc = rng.standard_normal(numOfPaths)
+        inc *= vol
+        inc += drift
+        logS += inc
+    endState = _rngState(rng)
+
+    S_t = np.exp(logS)
+    S_t *= spotPrice
+
+    #default is to exercise at maturity
+    cashflows = payoffCalc(S_t, K, optionType)
+    exerciseTimes = np.full(numOfPaths, steps, dtype=int)
+
+    #backward induction, regenerating column t from column t+1
+    for t in range(steps - 1, 0, -1):
+        _setRngState(rng, states[t])
+        inc = rng.standard_normal(numOfPaths)
+        inc *= vol
+        inc += drift
+        logS -= inc
+        np.exp(logS, out=S_t)
+        S_t *= spotPrice
+        _exerciseStep(S_t, t, cashflows, exerciseTimes, K, rfr, dt, optionType, basis)
+
+    #leave the stream where a full path draw would have left it
+    _setRngState(rng, endState)
+
+    pv = discountCashFlow(cashflows, rfr, dt, exerciseTimes, 0)
+    return float(np.mean(pv))
+
+#price a whole strike (and optionally maturity) grid off one path set in a single backward induction
+#maturities must sit on the path grid (multiples of T/M), result is (len(maturities), len(strikes))
+#or just (len(strikes),) when no maturities are given
+#regressions for all contracts are solved together on the shared paths (regression.fitContinuationBatched)
+def calcOptnPrices(paths, strikes, r, T, optionType="Call", maturities=None, basis="poly2"):
+    I, M_plus_1 = paths.shape
+    M = M_plus_1 - 1
+    dt = T / M
+
+    strikes = np.atleast_1d(np.asarray(strikes, dtype=np.float64))
+    if maturities is None:
+        matSteps = np.array([M])
+    else:
+        m = np.atleast_1d(np.asarray(maturities, dtype=np.float64)) / dt
+        matSteps = np.rint(m).astype(int)
+        if np.any(np.abs(m - matSteps) > 1e-6) or np.any(matSteps < 1) or np.any(matSteps > M):
+            raise ValueError("maturities must fall on the path grid (multiples of T/M, at most T)")
+
+    prices = _pricePairs(paths, np.tile(strikes, matSteps.size), np.repeat(matSteps, strikes.size), r, dt,
+                         optionType, basis)
+    if maturities is None:
+        return prices
+    return prices.reshape(matSteps.size, strikes.size)
+
+#every listed contract of a chain off one path set: strikes[c] expiring at maturities[c] (same length),
+#maturities on the path grid as for calcOptnPrices; unlike the strike x maturity grid only the listed pairs are priced
+def calcChainPrices(paths, strikes, maturities, r, T, optionType="Call", basis="poly2"):
+    I, M_plus_1 = paths.shape
+    M = M_plus_1 - 1
+    dt = T / M
+
+    Ks = np.atleast_1d(np.asarray(strikes, dtype=np.float64))
+    m = np.atleast_1d(np.asarray(maturities, dtype=np.float64)) / dt
+    matSteps = np.rint(m).astype(int)
+    if Ks.shape != matSteps.shape:
+        raise ValueError("strikes and maturities must have one entry per contract")
+    if np.any(np.abs(m - matSteps) > 1e-6) or np.any(matSteps < 1) or np.any(matSteps > M):
+        raise ValueError("maturities must fall on the path grid (multiples of T/M, at most T)")
+    if Ks.size == 0:
+        return np.empty(0)
+    return _pricePairs(paths, Ks, matSteps, r, dt, optionType, basis)
+
+#shared backward induction for flattened contracts (strike Ks[c], maturity step ms[c])
+def _pricePairs(paths, Ks, ms, r, dt, optionType, basis):
+    I = paths.shape[0]
+    #longest maturity first so the live set at each step is a leading slice
+    order = np.argsort(-ms, kind="stable")
+    Ks, ms = Ks[order], ms[order]
+    C = Ks.size
+    perStrike = regression.parseBasis(basis)[0] == "laguerre"
+
+    #default is to exercise at each contract's own maturity
+    #values are kept discounted to the current step, so stepping back is one multiply by the one-step discount
+    values = np.empty((C, I))
+    for m_ in np.unique(ms):
+        rows = ms == m_
+        S_m = np.asarray(paths[:, m_], dtype=np.float64)
+        values[rows] = payoffCalc(S_m[None, :], Ks[rows, None], optionType)
+    stepDisc = np.exp(-r * dt)
+
+    #backward induction for every contract at once
+    for t in range(int(ms[0]) - 1, 0, -1):
+        live = int(np.count_nonzero(ms > t))
+        fv_at_t = values[:live]
+        fv_at_t *= stepDisc
+
+        S_t = np.asarray(paths[:, t], dtype=np.float64)
+        immediate = payoffCalc(S_t[None, :], Ks[:live, None], optionType)
+        itm = immediate > 0
+        if not itm.any():
+            continue
+
+        #poly and hermite span the same polynomials in S whatever the scale, so one moneyness scale keeps the
+        #design matrix shared and the fit equal to per-strike pricing; laguerre's exp weight is scale dependent,
+        #so there every contract regresses on its own S/K and the price does not depend on the other strikes
+        if perStrike:
+            cont_vals = regression.fitContinuationMulti(np.broadcast_to(S_t, (live, I)), itm, fv_at_t, Ks[:live],
+                                                        basis)
+        else:
+            cont_vals = regression.fitContinuationBatched(S_t, itm, fv_at_t, float(np.mean(Ks[:live])), basis)
+
+        #lock in immediate payoff where it beats continuation on ITM paths
+        ex_now = itm & detExercise(immediate, cont_vals)
+        np.copyto(fv_at_t, immediate, where=ex_now)
+
+    #everything now sits at step 1, one more discount to time 0
+    prices = np.empty(C)
+    prices[order] = values.mean(axis=1) * stepDisc
+    return prices
+
+#price plus its Monte Carlo standard error and a normal confidence interval
+PriceEstimate = namedtuple("PriceEstimate", ["price", "stderr", "ci_low", "ci_high", "paths"])
+
+def _normCdf(x):
+    return 0.5 * (1.0 + math.erf(x / math.sqrt(2.0)))
+
+#closed form European price, the control variate's known mean
+def bsPrice(spotPrice, K, r, sigma, T, optionType="Call"):
+    if T <= 0 or sigma <= 0:
+        fwd = spotPrice - K * math.exp(-r * max(T, 0.0))
+        return max(fwd, 0.0) if optionType == "Call" else max(-fwd, 0.0)
+    sqT = sigma * math.sqrt(T)
+    d1 = (math.log(spotPrice / K) + (r + 0.5 * sigma**2) * T) / sqT
+    d2 = d1 - sqT
+    if optionType == "Call":
+        return spotPrice * _normCdf(d1) - K * math.exp(-r * T) * _normCdf(d2)
+    return K * math.exp(-r * T) * _normCdf(-d2) - spotPrice * _normCdf(-d1)
+
+#calcOptnPrice with a standard error
+#antithetic: paths came from genPricePaths(antithetic=True), pairs are averaged before the error is taken
+#control_variate: regress out the discounted European payoff (mean known from bsPrice, needs sigma)
+def calcOptnPriceStats(paths, K, r, T, optionType="Call", antithetic=False, control_variate=False, sigma=None,
+                       z=1.96, basis="poly2"):
+    pv = _pathValues(paths, K, r, T, optionType, basis)
+
+    if control_variate:
+        if sigma is None:
+            raise ValueError("control_variate needs sigma")
+        spot = float(paths[0, 0])
+        X = payoffCalc(np.asarray(paths[:, -1], dtype=np.float64), K, optionType) * np.exp(-r * T)
+        Xc = X - X.mean()
+        var = float(Xc @ Xc)
+        if var > 0:
+            beta = float(Xc @ (pv - pv.mean())) / var
+            pv = pv - beta * (X - bsPrice(spot, K, r, sigma, T, optionType))
+
+    if antithetic:
+        half = pv.size // 2
+        pv = 0.5 * (pv[:half] + pv[half:])
+
+    price = float(np.mean(pv))
+    stderr = float(np.std(pv, ddof=1) / np.sqrt(pv.size)) if pv.size > 1 else float("nan")
+    return PriceEstimate(price, stderr, price - z * stderr, price + z * stderr, int(paths.shape[0]))
+
+#simulate and price in one call with any mix of variance reduction
+#with qmc the error bar comes from `replicates` independently scrambled Sobol sets (a single QMC set
+#has no usable sample variance), so numOfPaths is split across them
+def priceAmerican(hist_sigma, spotPrice, rfr, matInYrs, steps, numOfPaths, K, optionType="Call",
+                  antithetic=False, control_variate=False, qmc=False, replicates=8, rng=None,
+                  dtype=np.float64, z=1.96, basis="poly2", scratch=None):
+    if not qmc:
+        paths = genPricePaths(hist_sigma, spotPrice, rfr, matInYrs, steps, numOfPaths, dtype=dtype, rng=rng,
+                              antithetic=antithetic, scratch=scratch)
+        return calcOptnPriceStats(paths, K, rfr, matInYrs, optionType, antithetic=antithetic,
+                                  control_variate=control_variate, sigma=hist_sigma, z=z, basis=basis)
+
+    per = numOfPaths // replicates
+    if antithetic:
+        per -= per % 2
+    if replicates < 2 or per < 2:
+        raise ValueError("qmc needs at least 2 replicates of 2+ paths")
+    estimates = np.empty(replicates)
+    for k in range(replicates):
+        paths = genPricePaths(hist_sigma, spotPrice, rfr, matInYrs, steps, per, dtype=dtype, rng=rng,
+                              antithetic=antithetic, qmc=True, scratch=scratch)
+        estimates[k] = calcOptnPriceStats(paths, K, rfr, matInYrs, optionType, antithetic=antithetic,
+                                          control_variate=control_variate, sigma=hist_sigma, basis=basis).price
+    price = float(estimates.mean())
+    stderr = float(estimates.std(ddof=1) / np.sqrt(replicates))
+    return PriceEstimate(price, stderr, price - z * stderr, price + z * stderr, per * replicates)
+
+#multi-core lsmc for one contract: the paths are cut into fixed blocks of blockPaths, block b is simulated
+#from its own generator (child b of seed) and every per-path stage runs block by block on a thread pool
+#(numpy releases the GIL in the heavy loops); each step's regression sums the blocks' Gram matrices and the
+#price sums the blocks' path values, both in block order, so a given seed gives bit-identical results for
+#any number of workers. pool: an executor to run on, otherwise `workers` threads are started for the call
+#antithetic pairs are formed inside each block, so blockPaths must be even
+def priceParallel(hist_sigma, spotPrice, rfr, matInYrs, steps, numOfPaths, K, optionType="Call", seed=None,
+                  workers=None, pool=None, blockPaths=PARALLEL_BLOCK_PATHS, antithetic=False, dtype=np.float64,
+                  z=1.96, basis="poly2"):
+    blockPaths = int(blockPaths)
+    if antithetic and (numOfPaths % 2 or blockPaths % 2):
+        raise ValueError("antithetic paths need an even numOfPaths and blockPaths")
+    bounds = list(range(0, numOfPaths, blockPaths)) + [numOfPaths]
+    nb = len(bounds) - 1
+    root = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    #children keyed off the root directly (not root.spawn, which counts calls), so the same seed repeats
+    children = [np.random.SeedSequence(root.entropy, spawn_key=root.spawn_key + (b,)) for b in range(nb)]
+
+    own = pool is None and (workers or 1) > 1
+    if own:
+        pool = ThreadPoolExecutor(max_workers=int(workers))
+    def each(fn):
+        if pool is None:
+            return [fn(b) for b in range(nb)]
+        return list(pool.map(fn, range(nb)))
+
+    dt = matInYrs / steps
+    disc = np.exp(-rfr * dt * np.arange(steps + 1))
+    try:
+        def simulate(b):
+            n = bounds[b + 1] - bounds[b]
+            P = genPricePaths(hist_sigma, spotPrice, rfr, matInYrs, steps, n, dtype=dtype,
+                              rng=np.random.default_rng(children[b]), antithetic=antithetic).T
+            cashflows = payoffCalc(np.asarray(P[-1], dtype=np.float64), K, optionType)
+            return P, cashflows, np.full(n, steps, dtype=int)
+        blocks = each(simulate)
+
+        for t in range(steps - 1, 0, -1):
+            #per block: ITM paths, their discounted plans, design matrix and partial normal equations
+            def gram(b):
+                P, cashflows, exerciseTimes = blocks[b]
+                S_t = np.asarray(P[t], dtype=np.float64)
+                immediate = payoffCalc(S_t, K, optionType)
+                idx = np.flatnonzero(immediate > 0)
+                fv = cashflows[idx] * disc[exerciseTimes[idx] - t]
+                A = regression.basisMatrix(S_t[idx] / K, basis)
+                return idx, immediate[idx], A, fv, A.T @ A, A.T @ fv
+            parts = each(gram)
+            if sum(part[0].size for part in parts) == 0:
+                continue
+            G, rhs = parts[0][4].copy(), parts[0][5].copy()
+            for part in parts[1:]:
+                G += part[4]
+                rhs += part[5]
+            beta = regression.solveNormalEquations(
+                G, rhs, lambda: np.linalg.lstsq(np.concatenate([part[2] for part in parts]),
+                                                np.concatenate([part[3] for part in parts]), rcond=None)[0])
+
+            def exercise(b):
+                _, cashflows, exerciseTimes = blocks[b]
+                idx, immediate, A = parts[b][:3]
+                ex = immediate > A @ beta
+                cashflows[idx[ex]] = immediate[ex]
+                exerciseTimes[idx[ex]] = t
+            each(exercise)
+
+        def pathValues(b):
+            _, cashflows, exerciseTimes = blocks[b]
+            pv = cashflows * disc[exerciseTimes]
+            if antithetic:
+                half = pv.size // 2
+                pv = 0.5 * (pv[:half] + pv[half:])
+            return pv
+        pvs = each(pathValues)
+    finally:
+        if own:
+            pool.shutdown(wait=True)
+
+    count = sum(pv.size for pv in pvs)
+    total = 0.0
+    for pv in pvs:
+        total += float(pv.sum())
+    price = total / count
+    ss = 0.0
+    for pv in pvs:
+        ss += float(np.square(pv - price).sum())
+    stderr = math.sqrt(ss / (count - 1) / count) if count > 1 else float("nan")
+    return PriceEstimate(price, stderr, price - z * stderr, price + z * stderr, int(numOfPaths))
+
+#simulate independent batches until the price's confidence interval settles a decision band
+#lower/upper are the prices where the decision flips (for the edge test: mid*(1-thresh), mid*(1+thresh));
+#stops once the CI lies entirely above upper, entirely below lower or entirely inside [lower, upper],
+#or when max_paths is spent. batches start at min_batch and double, so clear cases cost one small batch
+def priceAdaptive(hist_sigma, spotPrice, rfr, matInYrs, steps, K, lower, upper, optionType="Call",
+                  min_batch=2000, max_paths=100000, z=1.96, rng=None, dtype=np.float64,
+                  antithetic=False, control_variate=False, basis="poly2", scratch=None):
+    n = 0
+    weighted = 0.0
+    var_acc = 0.0
+    batch = max(2, int(min_batch))
+    price = stderr = float("nan")
+    while n < max_paths:
+        size = min(batch, max_paths - n)
+        if antithetic:
+            size -= size % 2
+        if size < 2:
+            break
+        est = calcOptnPriceStats(
+            genPricePaths(hist_sigma, spotPrice, rfr, matInYrs, steps, size, dtype=dtype, rng=rng,
+                          antithetic=antithetic, scratch=scratch),
+            K, rfr, matInYrs, optionType, antithetic=antithetic, control_variate=control_variate,
+            sigma=hist_sigma, z=z, basis=basis)
+
+        #pool batch estimates weighted by their path counts
+        n += size
+        weighted += size * est.price
+        var_acc += (size * est.stderr) ** 2
+        price = weighted / n
+        stderr = float(np.sqrt(var_acc)) / n
+
+        lo, hi = price - z * stderr, price + z * stderr
+        if lo > upper or hi < lower or (lo >= lower and hi <= upper):
+            break
+        batch *= 2
+    return PriceEstimate(price, stderr, price - z * stderr, price + z * stderr, n)
+
+#price and greeks from one simulation, each with its standard error
+Greeks = namedtuple("Greeks", ["price", "stderr", "delta", "gamma", "vega", "paths", "greek_stderr"])
+
+#greeks from the same paths as the price
+#delta and vega are pathwise: the backward induction fixes each path's exercise time tau, and holding tau
+#fixed is exact to first order (envelope argument at the optimal boundary), so on the GBM path
+#  delta = E[disc * payoff'(S_tau) * S_tau/S0],  vega = E[disc * payoff'(S_tau) * S_tau (W_tau - sigma tau)]
+#gamma is second order, where the boundary's response to spot matters (a fixed-tau gamma runs ~30% low for
+#an ATM put), so it is a central difference of pathwise deltas with the policy re-fitted on the same paths:
+#GBM is homogeneous, delta(S0(1+e), K) = delta(S0, K/(1+e)), so no paths are re-simulated
+#sigma and r must be the ones the paths were simulated with
+def _pathwiseDelta(paths, K, r, T, optionType, basis):
+    cashflows, exerciseTimes, dt = _backwardInduction(paths, K, r, T, optionType, basis)
+    I = paths.shape[0]
+    tau = exerciseTimes * dt
+    disc = np.exp(-r * tau)
+    S_tau = np.asarray(paths[np.arange(I), exerciseTimes], dtype=np.float64)
+    #payoff slope where the option pays at tau, zero where it expired worthless
+    slope = np.where(cashflows > 0, 1.0 if optionType == "Call" else -1.0, 0.0)
+    dS = disc * slope * S_tau
+    return cashflows * disc, dS, S_tau, tau
+
+def calcOptnGreeks(paths, K, r, T, sigma, optionType="Call", basis="poly2", gamma_bump=0.02):
+    I = paths.shape[0]
+    S0 = float(paths[0, 0])
+    pv, dS, S_tau, tau = _pathwiseDelta(paths, K, r, T, optionType, basis)
+
+    #Brownian motion at tau recovered from the path itself
+    W_tau = (np.log(S_tau / S0) - (r - 0.5 * sigma**2) * tau) / sigma
+    delta = dS / S0
+    vega = dS * (W_tau - sigma * tau)
+
+    up = _pathwiseDelta(paths, K / (1.0 + gamma_bump), r, T, optionType, basis)[1]
+    down = _pathwiseDelta(paths, K / (1.0 - gamma_bump), r, T, optionType, basis)[1]
+    gamma = (up - down) / (2.0 * gamma_bump * S0**2)
+
+    se = {name: float(np.std(v, ddof=1) / np.sqrt(I)) for name, v in
+          (("price", pv), ("delta", delta), ("gamma", gamma), ("vega", vega))}
+    return Greeks(float(pv.mean()), se["price"], float(delta.mean()), float(gamma.mean()),
+                  float(vega.mean()), I, se)
+
+#whole-watchlist engine: N underlyings simulated together, optionally correlated through one
+#Cholesky-transformed draw per step, on a common grid dt = max(T)/steps
+#spots/sigmas/rates are per underlying, corr is an (N, N) correlation matrix (None = independent)
+#returns an (N, I, steps+1) view of a time-major buffer, so paths[:, :, t] is one contiguous block
+def genCorrelatedPaths(spots, sigmas, rates, matInYrs, steps, numOfPaths, corr=None, dtype=np.float64, rng=None):
+    rng = np.random if rng is None else rng
+    spots = np.asarray(spots, dtype=np.float64).reshape(-1)
+    N = spots.size
+    sigmas = np.broadcast_to(np.asarray(sigmas, dtype=np.float64), (N,))
+    rates = np.broadcast_to(np.asarray(rates, dtype=np.float64), (N,))
+    L = None
+    if corr is not None:
+        corr = np.asarray(corr, dtype=np.float64)
+        if corr.shape != (N, N):
+            raise ValueError(f"corr must be ({N}, {N})")
+        L = np.linalg.cholesky(corr)
+
+    dt = float(np.max(matInYrs)) / steps
+    drift = ((rates - 0.5 * sigmas**2) * dt)[:, None]
+    vol = (sigmas * np.sqrt(dt))[:, None]
+
+    paths = np.empty((steps + 1, N, numOfPaths), dtype=dtype)
+    paths[0] = spots[:, None]
+    running = np.zeros((N, numOfPaths))
+    per_block = max(1, PATH_BLOCK_ELEMS // max(1, N * numOfPaths))
+    for t0 in range(0, steps, per_block):
+        t1 = min(t0 + per_block, steps)
+        Z = rng.standard_normal((t1 - t0, N, numOfPaths))
+        if L is not None:
+            Z = np.matmul(L, Z)
+        Z *= vol
+        Z += drift
+        Z[0] += running
+        np.cumsum(Z, axis=0, out=Z)
+        running[:] = Z[-1]
+        np.exp(Z, out=Z)
+        Z *= spots[:, None]
+        paths[t0 + 1:t1 + 1] = Z
+    return paths.transpose(1, 2, 0)
+
+#one american contract per underlying of genCorrelatedPaths, all backward-inducted in one pass
+#strikes/rates/maturities/optionTypes are per contract (scalars broadcast); maturities must sit on the
+#common grid (multiples of max(T)/steps); returns the PriceEstimate fields as arrays
+def calcOptnPricesMulti(paths, strikes, rates, matInYrs, optionTypes="Call", z=1.96, basis="poly2"):
+    N, I, M_plus_1 = paths.shape
+    M = M_plus_1 - 1
+    Ks = np.broadcast_to(np.asarray(strikes, dtype=np.float64), (N,))
+    rates = np.broadcast_to(np.asarray(rates, dtype=np.float64), (N,))
+    mats = np.broadcast_to(np.asarray(matInYrs, dtype=np.float64), (N,))
+    dt = float(mats.max()) / M
+    m = mats / dt
+    matSteps = np.rint(m).astype(int)
+    if np.any(np.abs(m - matSteps) > 1e-6) or np.any(matSteps < 1):
+        raise ValueError("maturities must fall on the common grid (multiples of max(T)/steps)")
+    types = np.broadcast_to(np.asarray(optionTypes), (N,))
+
+    #longest maturity first, so the contracts still alive at a step are a leading slice
+    order = np.argsort(-matSteps, kind="stable")
+    Ks, ms = Ks[order][:, None], matSteps[order]
+    sign = np.where(types[order] == "Call", 1.0, -1.0)[:, None]
+    stepDisc = np.exp(-rates[order] * dt)[:, None]
+    #underlyings in the same order; a time column of the time-major buffer is then one slice
+    ordered = paths[order] if np.any(order != np.arange(N)) else paths
+
+    #values kept discounted to the current step, each contract starting from its own maturity
+    values = np.empty((N, I))
+    for c in range(N):
+        S_m = np.asarray(ordered[c, :, ms[c]], dtype=np.float64)
+        values[c] = np.maximum(sign[c] * (S_m - Ks[c]), 0.0)
+
+    for t in range(int(ms[0]) - 1, 0, -1):
+        live = int(np.count_nonzero(ms > t))
+        fv_at_t = values[:live]
+        fv_at_t *= stepDisc[:live]
+        S_t = np.asarray(ordered[:live, :, t], dtype=np.float64)
+        immediate = S_t - Ks[:live]
+        immediate *= sign[:live]
+        np.maximum(immediate, 0.0, out=immediate)
+        itm = immediate > 0
+        if not itm.any():
+            continue
+        cont_vals = regression.fitContinuationMulti(S_t, itm, fv_at_t, Ks[:live, 0], basis)
+        np.copyto(fv_at_t, immediate, where=itm & detExercise(immediate, cont_vals))
+
+    pv = values * stepDisc
+    price = np.empty(N)
+    stderr = np.empty(N)
+    price[order] = pv.mean(axis=1)
+    stderr[order] = pv.std(axis=1, ddof=1) / np.sqrt(I)
+    return PriceEstimate(price, stderr, price - z * stderr, price + z * stderr, np.full(N, I))
+
+#simulate and price a watchlist in one call, one contract per underlying
+def priceWatchlist(spots, sigmas, strikes, matInYrs, rates, steps, numOfPaths, optionTypes="Call", corr=None,
+                   rng=None, dtype=np.float64, z=1.96, basis="poly2"):
+    paths = genCorrelatedPaths(spots, sigmas, rates, matInYrs, steps, numOfPaths, corr=corr, dtype=dtype, rng=rng)
+    return calcOptnPricesMulti(paths, strikes, rates, matInYrs, optionTypes, z=z, basis=basis)
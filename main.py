@@ -1,314 +1,950 @@
-import numpy as np
-import pandas as pd
-import yfinance as yf
-import time
-from datetime import datetime, date, timedelta
-from datetime import time as dtime
-from zoneinfo import ZoneInfo
-from typing import Dict, Any, Optional
-
-import lsmc_engine
-from config import tickers, start_date, end_date, T, strike_type, strike_pct, M, I, r, thresh
-from paper_trader import PaperTrader
-
-STATE_PATH = "portfolio_state.json"
-
-OPTION_TYPE = "Call"  #we trade calls; can generalize later
-
-#compute strike model implemented with the idea of expansion
-def compute_model_strike(spot: float, option_type: str) -> float:
-    st = strike_type.upper()
-    pct = float(strike_pct)
-    if option_type.lower() == "call":
-        if st == "ATM":
-            return float(spot)
-        elif st == "ITM":
-            return float(spot) * (1 - pct)
-        elif st == "OTM":
-            return float(spot) * (1 + pct)
-    else:  #put
-        if st == "ATM":
-            return float(spot)
-        elif st == "ITM":
-            return float(spot) * (1 + pct)
-        elif st == "OTM":
-            return float(spot) * (1 - pct)
-    raise ValueError("STRIKE_TYPE must be one of ITM/ATM/OTM")
-
-def select_strike_and_expiry(ticker: str, spot: float, option_type: str) -> Dict[str, Any]:
-    tk = yf.Ticker(ticker)
-    expirations = tk.options or []
-    if not expirations:
-        return {"ok": False, "reason": "No expirations"}
-
-    #parse expiry strings to dates
-    exp_dates = []
-    for s in expirations:
-        try:
-            y, m, d = map(int, s.split("-"))
-            exp_dates.append((s, date(y, m, d)))
-        except Exception:
-            continue
-
-    today = date.today()
-    target = today + timedelta(days=int(round(float(T) * 365)))
-
-    candidates = [(s, d, (d - target).days) for (s, d) in exp_dates if d >= today]
-    if candidates:
-        #minimize absolute difference but prefer non-negative distance
-        candidates.sort(key=lambda x: (abs(x[2]), x[2]))
-        expiry_str, expiry_date, _ = candidates[0]
-    else:
-        #fallback to soonest in future
-        exp_dates.sort(key=lambda x: x[1])
-        expiry_str, expiry_date = exp_dates[0]
-
-    #choose model target strike consistent with policy
-    target_strike = compute_model_strike(spot, option_type)
-    return {"ok": True, "expiry_str": expiry_str, "expiry_date": expiry_date, "target_strike": float(target_strike)}
-
-def get_option_market_price(ticker: str, expiry_str: str, strike: float, option_type: str) -> Dict[str, Any]:
-    tk = yf.Ticker(ticker)
-    try:
-        chain = tk.option_chain(expiry_str)
-    except Exception as e:
-        return {"ok": False, "reason": f"Option chain error: {e}"}
-
-    side = chain.calls if option_type.lower() == "call" else chain.puts
-    if side is None or side.empty:
-        return {"ok": False, "reason": "Empty option side"}
-
-    df = side.copy()
-
-    #coerce numeric, drop rows with no strike
-    for col in ["strike", "bid", "ask", "lastPrice"]:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
-    df = df.dropna(subset=["strike"])
-    if df.empty:
-        return {"ok": False, "reason": "No strikes in chain"}
-
-    #find nearest listed strike
-    df["dist"] = (df["strike"] - float(strike)).abs()
-    df = df.sort_values("dist")
-    row = df.iloc[0]
-
-    bid = float(row.get("bid") or 0)
-    ask = float(row.get("ask") or 0)
-    last = float(row.get("lastPrice") or 0)
-
-    mid = None
-    if bid > 0 and ask > 0:
-        mid = (bid + ask) / 2.0
-    elif last > 0:
-        mid = last
-    elif bid > 0 and ask == 0:
-        mid = bid
-    elif ask > 0 and bid == 0:
-        mid = ask
-
-    if mid is None or mid <= 0:
-        return {"ok": False, "reason": "No valid quotes"}
-
-    return {
-        "ok": True,
-        "listed_strike": float(row["strike"]),
-        "bid": bid if bid > 0 else None,
-        "ask": ask if ask > 0 else None,
-        "last": last if last > 0 else None,
-        "mid_price": float(mid),
-        "contract_symbol": row.get("contractSymbol", None)
-    }
-
-def run_once_for_ticker(ticker: str, trader: Optional[PaperTrader]) -> Dict[str, Any]:
-    try:
-        #spot ---
-        tk = yf.Ticker(ticker)
-        spot_hist = tk.history(period="1d", auto_adjust=True)
-        if spot_hist is None or spot_hist.empty:
-            return {"ok": False, "ticker": ticker, "reason": "No spot"}
-        spot = float(spot_hist["Close"].iloc[-1])
-
-        #history, making sigma 1-D
-        prices = yf.download(
-            ticker,
-            start=start_date,
-            end=end_date,
-            progress=False,
-            auto_adjust=True,
-            group_by="column",
-        )
-        if prices is None or prices.empty:
-            return {"ok": False, "ticker": ticker, "reason": "No historical data"}
-
-        if "Close" in prices.columns:
-            s = prices["Close"]
-        elif "Adj Close" in prices.columns:
-            s = prices["Adj Close"]
-        else:
-            s = prices.select_dtypes(include="number").iloc[:, 0]
-
-        # ensure 1-D numeric ndarray
-        arr = np.asarray(s, dtype="float64").reshape(-1)
-        arr = arr[~np.isnan(arr)]
-        if arr.size < 30:
-            return {"ok": False, "ticker": ticker, "reason": "Insufficient history"}
-
-        log_ret = np.diff(np.log(arr))
-        sigma_daily = float(np.std(log_ret, ddof=1))
-        hist_sigma = sigma_daily * np.sqrt(252.0)
-
-        #exp and strike
-        sel = select_strike_and_expiry(ticker, spot, OPTION_TYPE)
-        if not sel.get("ok", False):
-            return {"ok": False, "ticker": ticker, "reason": sel.get("reason", "expiry selection failed")}
-        expiry_str = sel["expiry_str"]
-        model_strike = float(sel["target_strike"])
-
-        #mkt optn
-        mkt = get_option_market_price(ticker, expiry_str, model_strike, OPTION_TYPE)
-        if not mkt.get("ok", False):
-            return {"ok": False, "ticker": ticker, "reason": mkt.get("reason", "quote retrieval failed")}
-        listed_strike = float(mkt["listed_strike"])
-        mid_price = float(mkt["mid_price"])
-
-        #lsmc priced
-        paths = lsmc_engine.genPricePaths(hist_sigma, spot, r, T, M, I)
-        model_price = lsmc_engine.calcOptnPrice(paths, listed_strike, r, T, OPTION_TYPE)
-
-        #decision
-        edge = (model_price - mid_price) / max(mid_price, 1e-12)
-        if edge > float(thresh):
-            decision = "BUY"
-        elif edge < -float(thresh):
-            decision = "SELL"
-        else:
-            decision = "HOLD"
-
-        #execution
-        ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        optnID = f"{ticker}_{expiry_str}_{listed_strike:.2f}_{OPTION_TYPE}"
-
-        executed = False
-        if trader is not None:
-            if decision == "BUY":
-                executed = trader.buyOptn(optnID, listed_strike, 1, mid_price, OPTION_TYPE.lower(), expiry_str, spot, ts)
-            elif decision == "SELL":
-                executed = trader.sellOptn(optnID, mid_price, 1, ts, underlying_price=spot)
-
-            if executed:
-                #persist portfolio to disk after successful trade
-                trader.save_state(STATE_PATH)
-
-        #need to return some function
-        return {
-            "ok": True,
-            "ticker": ticker,
-            "spot": spot,
-            "expiry": expiry_str,
-            "listed_strike": listed_strike,
-            "market_mid": mid_price,
-            "model_price": model_price,
-            "edge": edge,
-            "decision": decision,
-        }
-
-    except Exception as e:
-        #patch so it doesnt retun None
-        return {"ok": False, "ticker": ticker, "reason": f"Unhandled error: {type(e).__name__}: {e}"}
-
-def run_batch_once():
-    trader = PaperTrader()
-    for t in tickers:
-        t = t.strip().upper()
-        if not t:
-            continue
-        res = run_once_for_ticker(t, trader)
-        if isinstance(res, dict) and res.get("ok"):
-            print(f"{t} | {res['expiry']} @ {res['listed_strike']:.2f}: "
-                  f"spot={res['spot']:.2f} mid={res['market_mid']:.2f} "
-                  f"model={res['model_price']:.2f} edge={res['edge']*100:.2f}% "
-                  f"decision={res['decision']}")
-        elif isinstance(res, dict):
-            print(f"{t} | SKIPPED - {res.get('reason', 'unknown reason')}")
-        else:
-            print(f"{t} | SKIPPED - run_once_for_ticker returned {type(res).__name__}")
-    portfolio = trader.getPortfolio()
-    print(f"\nCash: {portfolio['cash']:.2f}  |  Positions: {len(portfolio['positions'])}  |  PnL: {portfolio['PnL']}")
-    return portfolio
-
-def _seconds_until_next_open(now_et):
-    open_t = dtime(9, 30)
-    close_t = dtime(16, 0)
-
-    #if it’s a weekday and before 9:30
-    if now_et.weekday() < 5 and now_et.time() < open_t:
-        next_open = now_et.replace(hour=open_t.hour, minute=open_t.minute, second=0, microsecond=0)
-        return (next_open - now_et).total_seconds()
-
-    #otherwise find the next weekday and use 9:30 that day
-    days_ahead = 1
-    while True:
-        candidate = now_et + timedelta(days=days_ahead)
-        if candidate.weekday() < 5:
-            next_open = candidate.replace(hour=open_t.hour, minute=open_t.minute, second=0, microsecond=0)
-            return (next_open - now_et).total_seconds()
-        days_ahead += 1
-
-def run_market_hours_loop(poll_seconds=60):
-    tz = ZoneInfo("America/Toronto")
-    open_t = dtime(9, 0); close_t = dtime(16, 30)
-    trader = PaperTrader.load_state(STATE_PATH, starting_cash=200.0, allow_multiple_lots_same_option=False)
-
-    print("Starting market-hours loop. Ctrl+C to stop.")
-    while True:
-        now = datetime.now(tz)
-        is_weekday = now.weekday() < 5
-        in_session = is_weekday and (open_t <= now.time() < close_t)
-        if in_session:
-            try:
-                for t in tickers:
-                    t = t.strip().upper()
-                    if not t: continue
-                    res = run_once_for_ticker(t, trader)
-                    if isinstance(res, dict) and res.get("ok"):
-                        print(f"{t} | {res['expiry']} @ {res['listed_strike']:.2f}: "
-                              f"spot={res['spot']:.2f} mid={res['market_mid']:.2f} "
-                              f"model={res['model_price']:.2f} edge={res['edge']*100:.2f}% "
-                              f"decision={res['decision']}")
-                    elif isinstance(res, dict):
-                        print(f"{t} | SKIPPED - {res.get('reason', 'unknown reason')}")
-                #save snapshot each cycle
-                trader.save_state(STATE_PATH)
-            except Exception as e:
-                print(f"[Loop] Error: {type(e).__name__}: {e}")
-            time.sleep(poll_seconds)
-        else:
-            secs = _seconds_until_next_open(now)
-            time.sleep(max(30, min(int(secs), 900)))
-
-
-def main():
-    trader = PaperTrader.load_state(STATE_PATH, starting_cash=200.0, allow_multiple_lots_same_option=False)
-    results = []
-    for t in tickers:
-        t = t.strip().upper()
-        if not t:
-            continue
-        res = run_once_for_ticker(t, trader)
-        results.append(res)
-        if isinstance(res, dict) and res.get("ok"):
-            print(f"{t} | {res['expiry']} @ {res['listed_strike']:.2f}: "
-                  f"spot={res['spot']:.2f} mid={res['market_mid']:.2f} "
-                  f"model={res['model_price']:.2f} edge={res['edge']*100:.2f}% "
-                  f"decision={res['decision']}")
-        elif isinstance(res, dict):
-            print(f"{t} | SKIPPED - {res.get('reason', 'unknown reason')}")
-        else:
-            print(f"{t} | SKIPPED - run_once_for_ticker returned {type(res).__name__}")
-    #show portfolio
-    portfolio = trader.getPortfolio()
-    print(f"\nCash: {portfolio['cash']:.2f}  |  Positions: {len(portfolio['positions'])}  |  PnL: {portfolio['PnL']}")
-
-if __name__ == "__main__":
-    main()
+import functools
+import math
+import numpy as np
+import time
+from datetime import datetime, date, timedelta
+from datetime import time as dtime
+from typing import Dict, Any, Optional, List
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future, as_completed, wait, FIRST_COMPLETED
+
+import lsmc_engine
+import pricing_cache
+import price_surface as price_surface_mod
+from metrics import get_metrics
+from scheduler import DeadlineScheduler
+from vol_state import VolState
+from market_data import YFinanceProvider, CachedProvider
+from config import (tickers, start_date, end_date, T, strike_type, strike_pct, M, I, r, thresh,
+                    path_dtype, path_scratch, streaming_pricer, fetch_workers, price_workers, md_ttl, md_cache_size,
+                    md_store_dir, vr_antithetic, vr_control_variate, vr_qmc, qmc_replicates, adaptive_pricing,
+                    adaptive_min_batch, adaptive_max_paths, regression_basis, compute_greeks, watchlist_batch,
+                    scan_full_chain, scan_max_days, scan_top, engine_threads, engine_block_paths,
+                    price_cache, price_cache_size, price_cache_step, price_cache_neighbours, price_cache_seed,
+                    price_surface, surface_guard, settle_expired, mark_to_market, sched_intervals, sched_fast_seconds,
+                    sched_edge_band, sched_near_expiry_days, sched_max_in_flight, record_dir, vol_estimator,
+                    vol_window, vol_ewma_lambda, vol_state_path)
+from paper_trader import PaperTrader
+
+STATE_PATH = "portfolio_state.json"
+
+OPTION_TYPE = "Call"  #we trade calls; can generalize later
+
+#market data source, created on first use; tests/benchmarks swap in a stand-in with set_market_data_provider
+_market_data = None
+
+def get_market_data():
+    global _market_data
+    if _market_data is None:
+        _market_data = CachedProvider(YFinanceProvider(), ttl=md_ttl, maxsize=md_cache_size, store_dir=md_store_dir)
+        if record_dir:
+            from replay import RecordingProvider
+            _market_data = RecordingProvider(_market_data, record_dir)
+    return _market_data
+
+def set_market_data_provider(provider) -> None:
+    global _market_data
+    _market_data = provider
+
+#wall clock for expiry selection, expiry settlement and trade timestamps; replay.py sets it to each recorded poll
+_clock = datetime.now
+
+def set_clock(clock=None) -> None:
+    global _clock
+    _clock = clock or datetime.now
+
+#RECORD_DIR: the market data reads of one poll are stamped with the poll's start, so a replay sees exactly them
+def _recorded_poll(fetch):
+    @functools.wraps(fetch)
+    def wrapper(ticker: str):
+        md = get_market_data()
+        if not hasattr(md, "poll"):
+            return fetch(ticker)
+        with md.poll(ticker):
+            return fetch(ticker)
+    return wrapper
+
+#running per-ticker vol (VOL_ESTIMATOR), loaded from VOL_STATE_PATH on first use; while RECORD_DIR captures
+#it starts empty, so the capture holds each ticker's full history window and not just the tails
+_vol_state = None
+
+def get_vol_state() -> VolState:
+    global _vol_state
+    if _vol_state is None:
+        _vol_state = VolState(vol_estimator, vol_window, vol_ewma_lambda, None if record_dir else vol_state_path,
+                              start_date, end_date)
+    return _vol_state
+
+def set_vol_state(state: Optional[VolState]) -> None:
+    global _vol_state
+    _vol_state = state
+
+#threads for block-parallel pricing (ENGINE_THREADS), one pool per process, started on first use
+_engine_pool = None
+
+def get_engine_pool() -> ThreadPoolExecutor:
+    global _engine_pool
+    if _engine_pool is None:
+        _engine_pool = ThreadPoolExecutor(max_workers=engine_threads)
+    return _engine_pool
+
+#moneyness-keyed price cache, created on first use when PRICE_CACHE is on
+_price_cache = None
+
+def get_price_cache() -> pricing_cache.PricingCache:
+    global _price_cache
+    if _price_cache is None:
+        _price_cache = pricing_cache.PricingCache(paths=I, maxsize=price_cache_size, step=price_cache_step,
+                                                  neighbours=price_cache_neighbours, seed=price_cache_seed,
+                                                  dtype=path_dtype, basis=regression_basis)
+    return _price_cache
+
+def _cache_args(inputs: Dict[str, Any]):
+    return (inputs["spot"], inputs["listed_strike"], inputs["hist_sigma"], T, r, M, OPTION_TYPE)
+
+#precomputed surface from PRICE_SURFACE, loaded (memory-mapped) on first use; False once it failed to load
+_price_surface = None
+
+def get_price_surface() -> Optional[price_surface_mod.PriceSurface]:
+    global _price_surface
+    if _price_surface is None:
+        _price_surface = False
+        if price_surface:
+            try:
+                _price_surface = price_surface_mod.PriceSurface(price_surface)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"[WARN] price surface {price_surface} not loaded ({e}), simulating every ticker.")
+    return _price_surface or None
+
+#first-pass screen: the interpolated surface price settles the decision unless the edge is within
+#the surface's error bound (+ SURFACE_GUARD) of +-thresh; None means run the full simulation
+def screen_with_surface(inputs: Dict[str, Any]) -> Optional[lsmc_engine.PriceEstimate]:
+    surface = get_price_surface()
+    if surface is None:
+        return None
+    hit = surface.lookup(inputs["spot"], inputs["listed_strike"], inputs["hist_sigma"], T, r, OPTION_TYPE)
+    if hit is None:
+        return None
+    price, bound = hit
+    mid_price = max(inputs["market_mid"], 1e-12)
+    edge = (price - mid_price) / mid_price
+    if abs(abs(edge) - float(thresh)) <= bound / mid_price + surface_guard:
+        return None
+    #paths=0 marks a surface price; the bound stands in for the confidence interval
+    return lsmc_engine.PriceEstimate(price, float("nan"), price - bound, price + bound, 0)
+
+#compute strike model implemented with the idea of expansion
+def compute_model_strike(spot: float, option_type: str) -> float:
+    st = strike_type.upper()
+    pct = float(strike_pct)
+    if option_type.lower() == "call":
+        if st == "ATM":
+            return float(spot)
+        elif st == "ITM":
+            return float(spot) * (1 - pct)
+        elif st == "OTM":
+            return float(spot) * (1 + pct)
+    else:  #put
+        if st == "ATM":
+            return float(spot)
+        elif st == "ITM":
+            return float(spot) * (1 + pct)
+        elif st == "OTM":
+            return float(spot) * (1 - pct)
+    raise ValueError("STRIKE_TYPE must be one of ITM/ATM/OTM")
+
+def select_strike_and_expiry(ticker: str, spot: float, option_type: str) -> Dict[str, Any]:
+    #expiries come pre-parsed (and cached) as a datetime64 schedule
+    schedule = get_market_data().expiry_schedule(ticker)
+    today = _clock().date()
+    target = today + timedelta(days=int(round(float(T) * 365)))
+    k = schedule.select(target, today)
+    if k is None:
+        return {"ok": False, "reason": "No expirations"}
+    expiry_str = schedule.expiries[k]
+    expiry_date = schedule.dates[k].astype(object)
+
+    #choose model target strike consistent with policy
+    target_strike = compute_model_strike(spot, option_type)
+    return {"ok": True, "expiry_str": expiry_str, "expiry_date": expiry_date, "target_strike": float(target_strike)}
+
+def get_option_market_price(ticker: str, expiry_str: str, strike: float, option_type: str) -> Dict[str, Any]:
+    try:
+        chain = get_market_data().chain_snapshot(ticker, expiry_str, option_type)
+    except Exception as e:
+        return {"ok": False, "reason": f"Option chain error: {e}"}
+
+    if len(chain) == 0:
+        return {"ok": False, "reason": "No strikes in chain"}
+
+    #nearest listed strike by binary search on the sorted strikes
+    i = chain.nearest(float(strike))
+    bid, ask, last, mid = chain.bid[i], chain.ask[i], chain.last[i], chain.mid[i]
+    if not mid > 0:
+        return {"ok": False, "reason": "No valid quotes"}
+
+    return {
+        "ok": True,
+        "listed_strike": float(chain.strike[i]),
+        "bid": float(bid) if bid > 0 else None,
+        "ask": float(ask) if ask > 0 else None,
+        "last": float(last) if last > 0 else None,
+        "mid_price": float(mid),
+        "contract_symbol": None if chain.symbol is None else chain.symbol[i]
+    }
+
+#spot and annualized vol (VOL_ESTIMATOR) from the running vol state
+#returns (spot, sigma, None) or (None, None, reason)
+def fetch_spot_and_sigma(ticker: str):
+    md = get_market_data()
+    mx = get_metrics()
+
+    #spot ---
+    with mx.timer("spot", ticker=ticker):
+        spot = md.spot(ticker)
+    if spot is None:
+        return None, None, "No spot"
+    spot = float(spot)
+
+    #only the bars since the ticker's last refresh are fetched (none after the first poll of a day)
+    vs = get_vol_state()
+    with mx.timer("history", ticker=ticker):
+        vs.refresh([ticker], md.history, _clock().date())
+    with mx.timer("vol", ticker=ticker):
+        hist_sigma = vs.estimate(ticker)
+    if hist_sigma is None:
+        return None, None, "No historical data" if vs.bars(ticker) == 0 else "Insufficient history"
+    return spot, hist_sigma, None
+
+#the watchlist's history tails in one pass (fetches on pool's threads, one vectorized commit),
+#so the per-ticker refresh in fetch_spot_and_sigma finds nothing left to do
+def refresh_vol(names: List[str], pool: Optional[ThreadPoolExecutor] = None) -> None:
+    with get_metrics().timer("vol_refresh"):
+        get_vol_state().refresh(names, get_market_data().history, _clock().date(),
+                                map=pool.map if pool is not None else map)
+
+#network-bound half of a ticker run: spot, history vol, expiry and the listed quote
+@_recorded_poll
+def fetch_ticker_inputs(ticker: str) -> Dict[str, Any]:
+    try:
+        mx = get_metrics()
+        spot, hist_sigma, reason = fetch_spot_and_sigma(ticker)
+        if reason is not None:
+            return {"ok": False, "ticker": ticker, "reason": reason}
+
+        #exp and strike
+        with mx.timer("expiry", ticker=ticker):
+            sel = select_strike_and_expiry(ticker, spot, OPTION_TYPE)
+        if not sel.get("ok", False):
+            return {"ok": False, "ticker": ticker, "reason": sel.get("reason", "expiry selection failed")}
+        expiry_str = sel["expiry_str"]
+        model_strike = float(sel["target_strike"])
+
+        #mkt optn
+        with mx.timer("chain", ticker=ticker):
+            mkt = get_option_market_price(ticker, expiry_str, model_strike, OPTION_TYPE)
+        if not mkt.get("ok", False):
+            return {"ok": False, "ticker": ticker, "reason": mkt.get("reason", "quote retrieval failed")}
+
+        return {
+            "ok": True,
+            "ticker": ticker,
+            "spot": spot,
+            "hist_sigma": hist_sigma,
+            "expiry": expiry_str,
+            "listed_strike": float(mkt["listed_strike"]),
+            "market_mid": float(mkt["mid_price"]),
+        }
+
+    except Exception as e:
+        return {"ok": False, "ticker": ticker, "reason": f"Unhandled error: {type(e).__name__}: {e}"}
+
+#full-chain inputs: spot, vol and every quoted contract of each expiry listed within SCAN_MAX_DAYS,
+#flattened to per-contract arrays (expiry, strike, days to expiry, mid)
+@_recorded_poll
+def fetch_chain_inputs(ticker: str) -> Dict[str, Any]:
+    try:
+        md = get_market_data()
+        mx = get_metrics()
+        spot, hist_sigma, reason = fetch_spot_and_sigma(ticker)
+        if reason is not None:
+            return {"ok": False, "ticker": ticker, "reason": reason}
+
+        today = _clock().date()
+        with mx.timer("expiry", ticker=ticker):
+            schedule = md.expiry_schedule(ticker)
+            picks = [k for k in schedule.upcoming(today, scan_max_days) if schedule.dates[k] > np.datetime64(today)]
+        if not picks:
+            return {"ok": False, "ticker": ticker, "reason": "No expirations"}
+
+        expiry, strike, days, mid = [], [], [], []
+        with mx.timer("chain", ticker=ticker):
+            for k in picks:
+                chain = md.chain_snapshot(ticker, schedule.expiries[k], OPTION_TYPE)
+                q = chain.quoted()
+                expiry.extend([schedule.expiries[k]] * q.size)
+                strike.append(chain.strike[q])
+                days.append(np.full(q.size, (schedule.dates[k] - np.datetime64(today)).astype(int)))
+                mid.append(chain.mid[q])
+        if not expiry:
+            return {"ok": False, "ticker": ticker, "reason": "No valid quotes"}
+
+        return {
+            "ok": True,
+            "ticker": ticker,
+            "spot": spot,
+            "hist_sigma": hist_sigma,
+            "expiry": expiry,
+            "strike": np.concatenate(strike),
+            "days": np.concatenate(days),
+            "mid": np.concatenate(mid),
+        }
+
+    except Exception as e:
+        return {"ok": False, "ticker": ticker, "reason": f"Unhandled error: {type(e).__name__}: {e}"}
+
+#one path set on the usual dt = T/M grid, long enough for the furthest expiry, and every contract priced on it
+#in one backward pass; expiries are snapped to the nearest step (at least one); returns prices and wall time
+def price_chain_inputs(inputs: Dict[str, Any], seed=None):
+    t0 = time.perf_counter()
+    rng = None if seed is None else np.random.default_rng(seed)
+    dt = T / M
+    steps = np.maximum(1, np.rint(inputs["days"] / 365.0 / dt).astype(int))
+    n = int(steps.max())
+    paths = lsmc_engine.genPricePaths(inputs["hist_sigma"], inputs["spot"], r, n * dt, n, I, dtype=path_dtype, rng=rng,
+                                      scratch=path_scratch)
+    prices = lsmc_engine.calcChainPrices(paths, inputs["strike"], steps * dt, r, n * dt,
+                                         inputs.get("option_type", OPTION_TYPE), basis=regression_basis)
+    return prices, time.perf_counter() - t0
+
+#cpu-bound half: lsmc price (with standard error) for fetched inputs, module level so a process pool can run it
+#seed gives each ticker its own stream (worker processes would otherwise share the parent's rng state)
+#returns a PriceEstimate, or a Greeks tuple (same price/stderr/paths fields) when COMPUTE_GREEKS is on
+def price_ticker_inputs(inputs: Dict[str, Any], seed=None):
+    rng = None if seed is None else np.random.default_rng(seed)
+    hist_sigma, spot, listed_strike = inputs["hist_sigma"], inputs["spot"], inputs["listed_strike"]
+    if price_cache:
+        #fixed-seed paths by design (common random numbers across polls), so seed is not used
+        return get_price_cache().estimate(*_cache_args(inputs))
+    if streaming_pricer:
+        price = lsmc_engine.calcOptnPriceStreaming(hist_sigma, spot, r, T, M, I, listed_strike, OPTION_TYPE, rng=rng,
+                                                   basis=regression_basis)
+        return lsmc_engine.PriceEstimate(price, float("nan"), float("nan"), float("nan"), I)
+    if adaptive_pricing:
+        #stop as soon as the edge CI is clearly past +thresh, -thresh or inside the HOLD band
+        mid_price = inputs["market_mid"]
+        return lsmc_engine.priceAdaptive(hist_sigma, spot, r, T, M, listed_strike,
+                                         mid_price * (1 - float(thresh)), mid_price * (1 + float(thresh)),
+                                         OPTION_TYPE, min_batch=adaptive_min_batch, max_paths=adaptive_max_paths,
+                                         rng=rng, dtype=path_dtype, antithetic=vr_antithetic,
+                                         control_variate=vr_control_variate, basis=regression_basis,
+                                         scratch=path_scratch)
+    if compute_greeks:
+        #plain paths so the pathwise greeks are exact; carries price/stderr/paths like a PriceEstimate
+        paths = lsmc_engine.genPricePaths(hist_sigma, spot, r, T, M, I, dtype=path_dtype, rng=rng, scratch=path_scratch)
+        return lsmc_engine.calcOptnGreeks(paths, listed_strike, r, T, hist_sigma, OPTION_TYPE, basis=regression_basis)
+    if engine_threads > 1 and not (vr_control_variate or vr_qmc):
+        #block-parallel, and bit-identical for a given seed whatever ENGINE_THREADS is
+        return lsmc_engine.priceParallel(hist_sigma, spot, r, T, M, I, listed_strike, OPTION_TYPE, seed=seed,
+                                         pool=get_engine_pool(), blockPaths=engine_block_paths,
+                                         antithetic=vr_antithetic, dtype=path_dtype, basis=regression_basis)
+    return lsmc_engine.priceAmerican(hist_sigma, spot, r, T, M, I, listed_strike, OPTION_TYPE,
+                                     antithetic=vr_antithetic, control_variate=vr_control_variate, qmc=vr_qmc,
+                                     replicates=qmc_replicates, rng=rng, dtype=path_dtype, basis=regression_basis,
+                                     scratch=path_scratch)
+
+#price_ticker_inputs plus its own wall time, so pricing done in a worker process still gets measured
+def price_ticker_inputs_timed(inputs: Dict[str, Any], seed=None):
+    t0 = time.perf_counter()
+    estimate = price_ticker_inputs(inputs, seed)
+    return estimate, time.perf_counter() - t0
+
+#the same for several tickers in one engine pass (WATCHLIST_BATCH): one contract per ticker, plain Monte Carlo
+#returns the PriceEstimates in input order plus the batch's wall time
+def price_watchlist_inputs(batch: List[Dict[str, Any]], seed=None):
+    t0 = time.perf_counter()
+    rng = None if seed is None else np.random.default_rng(seed)
+    est = lsmc_engine.priceWatchlist([b["spot"] for b in batch], [b["hist_sigma"] for b in batch],
+                                     [b["listed_strike"] for b in batch], T, r, M, I, OPTION_TYPE, rng=rng,
+                                     dtype=path_dtype, basis=regression_basis)
+    estimates = [lsmc_engine.PriceEstimate(float(est.price[k]), float(est.stderr[k]), float(est.ci_low[k]),
+                                           float(est.ci_high[k]), int(est.paths[k])) for k in range(len(batch))]
+    return estimates, time.perf_counter() - t0
+
+#decision and execution, always run serially against the one trader
+def apply_decision(inputs: Dict[str, Any], estimate, trader: Optional[PaperTrader]) -> Dict[str, Any]:
+    model_price = float(estimate.price)
+    ticker = inputs["ticker"]
+    spot = inputs["spot"]
+    expiry_str = inputs["expiry"]
+    listed_strike = inputs["listed_strike"]
+    mid_price = inputs["market_mid"]
+
+    #decision
+    edge = (model_price - mid_price) / max(mid_price, 1e-12)
+    if edge > float(thresh):
+        decision = "BUY"
+    elif edge < -float(thresh):
+        decision = "SELL"
+    else:
+        decision = "HOLD"
+
+    #execution
+    ts = _clock().strftime("%Y-%m-%d %H:%M:%S")
+    optnID = f"{ticker}_{expiry_str}_{listed_strike:.2f}_{OPTION_TYPE}"
+
+    mx = get_metrics()
+    mx.count("decisions", ticker=ticker, decision=decision)
+    executed = False
+    if trader is not None:
+        with mx.timer("execute", ticker=ticker):
+            if decision == "BUY":
+                executed = trader.buyOptn(optnID, listed_strike, 1, mid_price, OPTION_TYPE.lower(), expiry_str, spot, ts)
+            elif decision == "SELL":
+                executed = trader.sellOptn(optnID, mid_price, 1, ts, underlying_price=spot)
+
+        if executed:
+            mx.count("trades", ticker=ticker, decision=decision)
+            #persist portfolio to disk after successful trade
+            with mx.timer("state_save", ticker=ticker):
+                trader.save_state(STATE_PATH)
+
+    #need to return some function
+    res = {
+        "ok": True,
+        "ticker": ticker,
+        "spot": spot,
+        "expiry": expiry_str,
+        "listed_strike": listed_strike,
+        "market_mid": mid_price,
+        "model_price": model_price,
+        "model_stderr": float(estimate.stderr),
+        "model_paths": int(estimate.paths),
+        "edge": edge,
+        "decision": decision,
+    }
+    if isinstance(estimate, lsmc_engine.Greeks):
+        res.update(delta=estimate.delta, gamma=estimate.gamma, vega=estimate.vega)
+    return res
+
+#edges for the whole scanned chain at once; the SCAN_TOP contracts by |edge| go through apply_decision
+#(no per-contract standard error: the batch shares one set of paths)
+def apply_chain_scan(inputs: Dict[str, Any], prices, trader: Optional[PaperTrader]) -> List[Dict[str, Any]]:
+    mids = inputs["mid"]
+    edges = (prices - mids) / np.maximum(mids, 1e-12)
+    order = np.argsort(-np.abs(edges), kind="stable")
+    if scan_top > 0:
+        order = order[:scan_top]
+    get_metrics().count("contracts_scanned", mids.size, ticker=inputs["ticker"])
+
+    out = []
+    for c in order:
+        contract = {"ticker": inputs["ticker"], "spot": inputs["spot"], "expiry": inputs["expiry"][c],
+                    "listed_strike": float(inputs["strike"][c]), "market_mid": float(mids[c])}
+        estimate = lsmc_engine.PriceEstimate(float(prices[c]), float("nan"), float("nan"), float("nan"), I)
+        res = apply_decision(contract, estimate, trader)
+        res["scanned"] = int(mids.size)
+        out.append(res)
+    return out
+
+def run_once_for_ticker(ticker: str, trader: Optional[PaperTrader], seed=None) -> Dict[str, Any]:
+    try:
+        mx = get_metrics()
+        inputs = fetch_ticker_inputs(ticker)
+        if not inputs.get("ok", False):
+            mx.count("skipped", ticker=ticker)
+            return inputs
+        with mx.timer("screen", ticker=ticker):
+            estimate = screen_with_surface(inputs)
+        if estimate is None:
+            with mx.timer("price", ticker=ticker):
+                estimate = price_ticker_inputs(inputs, seed)
+        return apply_decision(inputs, estimate, trader)
+
+    except Exception as e:
+        #patch so it doesnt retun None
+        return {"ok": False, "ticker": ticker, "reason": f"Unhandled error: {type(e).__name__}: {e}"}
+
+#runs a watchlist concurrently: fetches overlap on a thread pool, pricing fans out to a process pool,
+#and trades are applied one at a time in ticker order so results match a sequential run
+#keep one instance alive across cycles (it is a context manager) to avoid re-spawning pools every poll
+class TickerBatchExecutor:
+    def __init__(self, fetch_workers: int = fetch_workers, price_workers: int = price_workers):
+        self.fetch_pool = ThreadPoolExecutor(max_workers=max(1, int(fetch_workers)))
+        #one price worker means price inline, no process pool
+        self.price_pool = ProcessPoolExecutor(max_workers=int(price_workers)) if int(price_workers) > 1 else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self) -> None:
+        self.fetch_pool.shutdown(wait=True)
+        if self.price_pool is not None:
+            self.price_pool.shutdown(wait=True)
+
+    #batch overrides WATCHLIST_BATCH for this call (the pricing service always batches)
+    def run(self, ticker_list, trader: Optional[PaperTrader], batch: Optional[bool] = None) -> List[Dict[str, Any]]:
+        if scan_full_chain:
+            return self.scan(ticker_list, trader)
+        names = [t.strip().upper() for t in ticker_list if t.strip()]
+        refresh_vol(names, self.fetch_pool)
+        seeds = np.random.SeedSequence().spawn(len(names) + 1)
+        #tickers the watchlist batch prices together once every fetch is in
+        batched = watchlist_batch if batch is None else batch
+        batched = batched and not (price_cache or streaming_pricer or adaptive_pricing or compute_greeks)
+        waiting = []
+        results: List[Optional[Dict[str, Any]]] = [None] * len(names)
+        pricing = {}
+        fetched = {}
+        mx = get_metrics()
+
+        #price each ticker as soon as its fetch lands
+        fetches = {self.fetch_pool.submit(fetch_ticker_inputs, t): i for i, t in enumerate(names)}
+        for fut in as_completed(fetches):
+            i = fetches[fut]
+            inputs = fetched[i] = fut.result()
+            if not inputs.get("ok", False):
+                mx.count("skipped", ticker=names[i])
+                results[i] = inputs
+                continue
+            #a ticker that raises here (inline pricing included) fails alone, as it would at .result() below
+            try:
+                with mx.timer("screen", ticker=names[i]):
+                    screened = screen_with_surface(inputs)
+                if screened is not None:
+                    pricing[i] = (inputs, screened)
+                elif price_cache and self.price_pool is not None:
+                    #look up in this process; only the grid points a miss needs go to the pool
+                    cache = get_price_cache()
+                    plan = None
+                    if cache.get(*_cache_args(inputs)) is None:
+                        plan = cache.plan(*_cache_args(inputs))
+                    if plan is None:
+                        pricing[i] = (inputs, cache.estimate(*_cache_args(inputs), count=False))
+                    else:
+                        pricing[i] = (inputs, (plan, self.price_pool.submit(pricing_cache.priceGrid, *plan)))
+                elif batched:
+                    waiting.append(i)
+                elif self.price_pool is None:
+                    pricing[i] = (inputs, price_ticker_inputs_timed(inputs, seeds[i]))
+                else:
+                    pricing[i] = (inputs, self.price_pool.submit(price_ticker_inputs_timed, inputs, seeds[i]))
+            except Exception as e:
+                results[i] = {"ok": False, "ticker": names[i], "reason": f"Unhandled error: {type(e).__name__}: {e}"}
+
+        if waiting:
+            batch = [fetched[i] for i in waiting]
+            try:
+                if self.price_pool is None:
+                    estimates, seconds = price_watchlist_inputs(batch, seeds[-1])
+                else:
+                    estimates, seconds = self.price_pool.submit(price_watchlist_inputs, batch, seeds[-1]).result()
+                mx.observe_stage("price_watchlist", seconds)
+                for i, est in zip(waiting, estimates):
+                    pricing[i] = (fetched[i], est)
+            except Exception as e:
+                #one engine pass for the batch: every ticker in it gets the error
+                for i in waiting:
+                    results[i] = {"ok": False, "ticker": names[i],
+                                  "reason": f"Unhandled error: {type(e).__name__}: {e}"}
+
+        #execution stays serialized and deterministic: ticker order
+        for i in range(len(names)):
+            if i not in pricing:
+                continue
+            inputs, estimate = pricing[i]
+            try:
+                if isinstance(estimate, tuple) and len(estimate) == 2 and isinstance(estimate[1], Future):
+                    get_price_cache().fill(estimate[0], estimate[1].result())
+                    estimate = get_price_cache().estimate(*_cache_args(inputs), count=False)
+                else:
+                    if isinstance(estimate, Future):
+                        estimate = estimate.result()
+                    if isinstance(estimate, tuple) and len(estimate) == 2:
+                        estimate, seconds = estimate
+                        mx.observe_stage("price", seconds, ticker=names[i])
+                results[i] = apply_decision(inputs, estimate, trader)
+            except Exception as e:
+                results[i] = {"ok": False, "ticker": names[i], "reason": f"Unhandled error: {type(e).__name__}: {e}"}
+        return results
+
+    #one ticker for the market-hours scheduler: fetch, screen and price on a fetch thread (process-pool pricing
+    #is waited on there) and hand back (inputs, estimate) -- prices for the whole chain under SCAN_FULL_CHAIN,
+    #None when the fetch was not ok; the caller applies the decision
+    def submit(self, ticker: str, seed=None) -> Future:
+        return self.fetch_pool.submit(self._fetch_and_price, ticker, seed)
+
+    def _fetch_and_price(self, ticker: str, seed=None):
+        mx = get_metrics()
+        if scan_full_chain:
+            inputs = fetch_chain_inputs(ticker)
+            if not inputs.get("ok", False):
+                return inputs, None
+            if self.price_pool is None:
+                prices, seconds = price_chain_inputs(inputs, seed)
+            else:
+                prices, seconds = self.price_pool.submit(price_chain_inputs, inputs, seed).result()
+            mx.observe_stage("price_chain", seconds, ticker=ticker)
+            return inputs, prices
+
+        inputs = fetch_ticker_inputs(ticker)
+        if not inputs.get("ok", False):
+            return inputs, None
+        with mx.timer("screen", ticker=ticker):
+            estimate = screen_with_surface(inputs)
+        if estimate is not None:
+            return inputs, estimate
+        if price_cache and self.price_pool is not None:
+            cache = get_price_cache()
+            if cache.get(*_cache_args(inputs)) is None:
+                plan = cache.plan(*_cache_args(inputs))
+                if plan is not None:
+                    cache.fill(plan, self.price_pool.submit(pricing_cache.priceGrid, *plan).result())
+            return inputs, cache.estimate(*_cache_args(inputs), count=False)
+        if self.price_pool is None:
+            estimate, seconds = price_ticker_inputs_timed(inputs, seed)
+        else:
+            estimate, seconds = self.price_pool.submit(price_ticker_inputs_timed, inputs, seed).result()
+        mx.observe_stage("price", seconds, ticker=ticker)
+        return inputs, estimate
+
+    #SCAN_FULL_CHAIN: every quoted contract per ticker, one batched pricing job per ticker;
+    #returns the top contracts of each ticker (ticker order, largest |edge| first) and one row per skipped ticker
+    def scan(self, ticker_list, trader: Optional[PaperTrader]) -> List[Dict[str, Any]]:
+        names = [t.strip().upper() for t in ticker_list if t.strip()]
+        refresh_vol(names, self.fetch_pool)
+        seeds = np.random.SeedSequence().spawn(len(names))
+        fetched = {}
+        pricing = {}
+        mx = get_metrics()
+
+        fetches = {self.fetch_pool.submit(fetch_chain_inputs, t): i for i, t in enumerate(names)}
+        for fut in as_completed(fetches):
+            i = fetches[fut]
+            inputs = fetched[i] = fut.result()
+            if not inputs.get("ok", False):
+                mx.count("skipped", ticker=names[i])
+            elif self.price_pool is None:
+                try:
+                    pricing[i] = price_chain_inputs(inputs, seeds[i])
+                except Exception as e:
+                    #reported in the ticker's place below, like a failed pool job
+                    fetched[i] = {"ok": False, "ticker": names[i],
+                                  "reason": f"Unhandled error: {type(e).__name__}: {e}"}
+            else:
+                pricing[i] = self.price_pool.submit(price_chain_inputs, inputs, seeds[i])
+
+        results = []
+        for i in range(len(names)):
+            if i not in pricing:
+                results.append(fetched[i])
+                continue
+            try:
+                job = pricing[i]
+                prices, seconds = job.result() if isinstance(job, Future) else job
+                mx.observe_stage("price_chain", seconds, ticker=names[i])
+                results.extend(apply_chain_scan(fetched[i], prices, trader))
+            except Exception as e:
+                results.append({"ok": False, "ticker": names[i], "reason": f"Unhandled error: {type(e).__name__}: {e}"})
+        return results
+
+#end-of-cycle book maintenance: expiry sweep (SETTLE_EXPIRED), then marks for every open row
+#(MARK_TO_MARKET): market = listed mids matched by strike per (ticker, expiry, type) snapshot,
+#model = one calcChainPrices pass per (ticker, type) over all of its open strikes and expiries
+#close of ticker on the expiry date from its daily history, None when that bar is missing
+def _expiry_close(md, ticker: str, exp: str) -> Optional[float]:
+    try:
+        day = np.datetime64(str(exp), "D")
+        bars = md.history(ticker, str(day), str(day + np.timedelta64(1, "D")))
+    except Exception:
+        return None
+    if not bars:
+        return None
+    dates = np.asarray(bars.get("date", []), dtype="datetime64[D]")
+    close = np.asarray(bars.get("close", []), dtype=np.float64).reshape(-1)
+    hit = np.flatnonzero((dates == day) & np.isfinite(close))
+    return float(close[hit[-1]]) if hit.size else None
+
+def revalue_book(trader: PaperTrader) -> None:
+    book = trader.positions
+    md = get_market_data()
+    mx = get_metrics()
+    now = _clock()
+    today = now.date()
+
+    if settle_expired and book.expired(today).size:
+        with mx.timer("settle"):
+            rows = book.expired(today)
+            #settle at the underlying's close on the expiry date; today's spot only when that bar is missing
+            closes, spots = {}, {}
+            for tk, exp in set(zip(book.column("ticker")[rows], book.column("exp_str")[rows])):
+                close = _expiry_close(md, tk, exp)
+                if close is not None:
+                    closes[(tk, exp)] = close
+                elif tk not in spots:
+                    try:
+                        spots[tk] = md.spot(tk)
+                    except Exception:
+                        continue
+            settled = trader.settleExpired({k: v for k, v in spots.items() if v is not None}, today,
+                                           now.strftime("%Y-%m-%d %H:%M:%S"), closes=closes)
+        if settled:
+            mx.count("settled", len(settled))
+            trader.save_state(STATE_PATH)
+
+    if mark_to_market == "off" or len(book) == 0:
+        return
+    with mx.timer("mark"):
+        marks = np.full(len(book), np.nan)
+        tickers, types = book.column("ticker"), book.column("typ")
+        strikes = book.column("strike")
+        if mark_to_market == "market":
+            exps = book.column("exp_str")
+            groups = {}
+            for i, key in enumerate(zip(tickers, exps, types)):
+                groups.setdefault(key, []).append(i)
+            for (tk, exp, typ), rows in groups.items():
+                try:
+                    chain = md.chain_snapshot(tk, exp, typ)
+                except Exception:
+                    continue
+                if len(chain) == 0:
+                    continue
+                rows = np.asarray(rows)
+                j = np.minimum(np.searchsorted(chain.strike, strikes[rows]), len(chain) - 1)
+                hit = chain.strike[j] == strikes[rows]
+                marks[rows[hit]] = chain.mid[j[hit]]
+        elif mark_to_market == "model":
+            days = (book.column("expiry") - np.datetime64(today)).astype(np.int64)
+            groups = {}
+            for i, key in enumerate(zip(tickers, types)):
+                groups.setdefault(key, []).append(i)
+            for (tk, typ), rows in groups.items():
+                spot, sigma, reason = fetch_spot_and_sigma(tk)
+                rows = np.asarray(rows)
+                rows = rows[days[rows] >= 0]
+                if reason is not None or rows.size == 0:
+                    continue
+                inputs = {"spot": spot, "hist_sigma": sigma, "strike": strikes[rows], "days": days[rows],
+                          "option_type": "Call" if str(typ).lower() == "call" else "Put"}
+                marks[rows] = price_chain_inputs(inputs)[0]
+        else:
+            raise ValueError("MARK_TO_MARKET must be one of off/market/model")
+        trader.calcPNL(marks)
+        mx.gauge("unrealized_pnl", trader.unrealized_PNL)
+
+def print_result(t: str, res) -> None:
+    if isinstance(res, dict) and res.get("ok"):
+        print(f"{t} | {res['expiry']} @ {res['listed_strike']:.2f}: "
+              f"spot={res['spot']:.2f} mid={res['market_mid']:.2f} "
+              f"model={res['model_price']:.2f} edge={res['edge']*100:.2f}% "
+              f"decision={res['decision']}"
+              + (f" (of {res['scanned']} scanned)" if "scanned" in res else "")
+              + (f" delta={res['delta']:.3f} gamma={res['gamma']:.4f} vega={res['vega']:.2f}" if "delta" in res else ""))
+    elif isinstance(res, dict):
+        print(f"{t} | SKIPPED - {res.get('reason', 'unknown reason')}")
+    else:
+        print(f"{t} | SKIPPED - run_once_for_ticker returned {type(res).__name__}")
+
+#end of cycle: the cycle's capture segment (RECORD_DIR) and the vol state to disk, then latency histogram,
+#overrun count, cache hit rates and one metrics export
+#seconds: one cycle's duration, or a list of them (the scheduler's per-ticker runs); overruns: cycles known to
+#have missed their deadline, on top of those longer than poll_seconds
+def record_cycle(seconds, poll_seconds: Optional[float] = None, overruns: int = 0) -> None:
+    md = get_market_data()
+    if hasattr(md, "flush"):
+        md.flush()
+    if _vol_state is not None:
+        _vol_state.save()
+    mx = get_metrics()
+    if not mx.enabled:
+        return
+    cycles = seconds if isinstance(seconds, list) else [seconds]
+    for s in cycles:
+        mx.observe("cycle_seconds", s)
+    if poll_seconds is not None:
+        overruns += sum(s > poll_seconds for s in cycles)
+    if overruns:
+        mx.count("cycle_overruns", overruns)
+    if hasattr(md, "stats"):
+        mx.cache_stats("market_data", md.stats())
+    if _price_cache is not None:
+        mx.cache_stats("price", _price_cache.stats())
+    mx.flush()
+
+def run_batch_once():
+    trader = PaperTrader()
+    mx = get_metrics()
+    t0 = time.perf_counter()
+    with TickerBatchExecutor() as executor:
+        for res in executor.run(tickers, trader):
+            print_result(res.get("ticker", "?"), res)
+    revalue_book(trader)
+    with mx.timer("excel"):
+        trader.export_trades()
+    record_cycle(time.perf_counter() - t0)
+    portfolio = trader.getPortfolio()
+    print(f"\nCash: {portfolio['cash']:.2f}  |  Positions: {len(portfolio['positions'])}  |  PnL: {portfolio['PnL']}")
+    return portfolio
+
+def _seconds_until_next_open(now_et):
+    open_t = dtime(9, 30)
+    close_t = dtime(16, 0)
+
+    #if it’s a weekday and before 9:30
+    if now_et.weekday() < 5 and now_et.time() < open_t:
+        next_open = now_et.replace(hour=open_t.hour, minute=open_t.minute, second=0, microsecond=0)
+        return (next_open - now_et).total_seconds()
+
+    #otherwise find the next weekday and use 9:30 that day
+    days_ahead = 1
+    while True:
+        candidate = now_et + timedelta(days=days_ahead)
+        if candidate.weekday() < 5:
+            next_open = candidate.replace(hour=open_t.hour, minute=open_t.minute, second=0, microsecond=0)
+            return (next_open - now_et).total_seconds()
+        days_ahead += 1
+
+#a scheduled ticker came back: decisions (serially, on the loop thread), then its next deadline,
+#sooner while its edge sits near THRESHOLD or its contract is close to expiry
+def _apply_scheduled(ticker: str, fut: Future, sched: DeadlineScheduler, trader: PaperTrader) -> None:
+    mx = get_metrics()
+    try:
+        inputs, estimate = fut.result()
+        if estimate is None:
+            mx.count("skipped", ticker=ticker)
+            results = [inputs]
+        elif scan_full_chain:
+            results = apply_chain_scan(inputs, estimate, trader)
+        else:
+            results = [apply_decision(inputs, estimate, trader)]
+    except Exception as e:
+        sched.release(ticker, time.monotonic())
+        mx.count("cycle_errors")
+        print(f"[Loop] {ticker} error: {type(e).__name__}: {e}")
+        return
+
+    today = _clock().date()
+    near_threshold = near_expiry = False
+    for res in results:
+        print_result(res.get("ticker", ticker), res)
+        if res.get("ok"):
+            near_threshold |= abs(abs(res["edge"]) - float(thresh)) <= sched_edge_band
+            near_expiry |= (date.fromisoformat(res["expiry"]) - today).days <= sched_near_expiry_days
+
+    latency, skipped = sched.finish(ticker, time.monotonic(), near_threshold, near_expiry)
+    mx.observe("ticker_latency_seconds", latency, ticker=ticker)
+    if skipped:
+        mx.count("ticker_overruns", ticker=ticker)
+        mx.count("ticker_skipped_deadlines", skipped, ticker=ticker)
+
+#once per poll period: book upkeep, state and trades to disk, scheduler stats out
+def _close_period(sched: DeadlineScheduler, trader: PaperTrader) -> None:
+    mx = get_metrics()
+    try:
+        revalue_book(trader)
+        with mx.timer("state_save"):
+            trader.save_state(STATE_PATH)
+        with mx.timer("excel"):
+            trader.export_trades()
+    except Exception as e:
+        mx.count("cycle_errors")
+        print(f"[Loop] Error: {type(e).__name__}: {e}")
+
+    st = sched.stats()
+    for key in ("latency_p50", "latency_p95", "latency_max", "queue_delay_max"):
+        if st[key] == st[key]:
+            mx.gauge(f"sched_{key}_seconds", st[key])
+    print(f"[Sched] runs={st['runs']} overruns={st['overruns']} skipped={st['skipped']} "
+          f"in_flight={st['in_flight']} latency p50={st['latency_p50']:.2f}s p95={st['latency_p95']:.2f}s "
+          f"max={st['latency_max']:.2f}s queue_max={st['queue_delay_max']:.2f}s"
+          + (f" fast={','.join(st['fast'])}" if st["fast"] else ""))
+    #a cycle here is one ticker's run, measured against its own deadline; an overrun is a run that skipped deadlines
+    latency, overruns = sched.period()
+    record_cycle(latency, overruns=overruns)
+
+#event-driven: every ticker has its own fixed deadline grid (poll_seconds, SCHED_INTERVALS, SCHED_FAST_SECONDS),
+#at most SCHED_MAX_IN_FLIGHT of them fetch/price at once and results are applied as they land; a ticker still
+#running at its next deadline skips the deadlines it missed instead of queueing them
+#the book is closed every poll_seconds on its own grid, and outside the session the loop sleeps toward the open
+def run_market_hours_loop(poll_seconds=60):
+    from zoneinfo import ZoneInfo
+    tz = ZoneInfo("America/Toronto")
+    open_t = dtime(9, 0); close_t = dtime(16, 30)
+    trader = PaperTrader.load_state(STATE_PATH, starting_cash=200.0, allow_multiple_lots_same_option=False)
+    names = [t.strip().upper() for t in tickers if t.strip()]
+    sched = DeadlineScheduler({t: sched_intervals.get(t, poll_seconds) for t in names}, sched_fast_seconds,
+                              sched_max_in_flight)
+    seeds = np.random.SeedSequence()
+    mx = get_metrics()
+    running: Dict[Future, str] = {}
+    period_due = None
+    dirty = False
+
+    print("Starting market-hours loop. Ctrl+C to stop.")
+    with TickerBatchExecutor() as executor:
+        while True:
+            now = datetime.now(tz)
+            is_weekday = now.weekday() < 5
+            in_session = is_weekday and (open_t <= now.time() < close_t)
+            if not in_session:
+                #let in-flight tickers land and close the books once, then sleep toward the open
+                for fut in as_completed(list(running)):
+                    _apply_scheduled(running.pop(fut), fut, sched, trader)
+                    dirty = True
+                if dirty:
+                    _close_period(sched, trader)
+                    dirty = False
+                period_due = None
+                secs = _seconds_until_next_open(now)
+                time.sleep(max(30, min(int(secs), 900)))
+                continue
+
+            if period_due is None:
+                #the day's new bars for the whole watchlist in one pass before the first deadlines
+                refresh_vol(names, executor.fetch_pool)
+                sched.reset(time.monotonic())
+                period_due = time.monotonic() + poll_seconds
+
+            for t in sched.take_due(time.monotonic()):
+                running[executor.submit(t, seeds.spawn(1)[0])] = t
+            mx.gauge("in_flight", len(running))
+
+            #sleep until a result lands, a ticker comes due or the period closes (at least every minute,
+            #so the session check stays current)
+            timeout = max(0.0, min(sched.next_deadline(), period_due, time.monotonic() + 60) - time.monotonic())
+            if running:
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    _apply_scheduled(running.pop(fut), fut, sched, trader)
+                    dirty = True
+            else:
+                time.sleep(timeout)
+
+            if time.monotonic() >= period_due:
+                _close_period(sched, trader)
+                dirty = False
+                #next boundary on the grid strictly after now, also when the overshoot is a whole number of periods
+                period_due += poll_seconds * (math.floor((time.monotonic() - period_due) / poll_seconds) + 1)
+
+
+def main():
+    trader = PaperTrader.load_state(STATE_PATH, starting_cash=200.0, allow_multiple_lots_same_option=False)
+    mx = get_metrics()
+    t0 = time.perf_counter()
+    with TickerBatchExecutor() as executor:
+        results = executor.run(tickers, trader)
+    for res in results:
+        print_result(res.get("ticker", "?"), res)
+    revalue_book(trader)
+    with mx.timer("excel"):
+        trader.export_trades()
+    record_cycle(time.perf_counter() - t0)
+    #show portfolio
+    portfolio = trader.getPortfolio()
+    print(f"\nCash: {portfolio['cash']:.2f}  |  Positions: {len(portfolio['positions'])}  |  PnL: {portfolio['PnL']}")
+
+if __name__ == "__main__":
+    main()
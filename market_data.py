@@ -0,0 +1,304 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, Any, Optional, List, Callable
+
+import numpy as np
+
+#data kinds the cache keeps apart, each with its own ttl (seconds)
+KINDS = ("spot", "history", "expiries", "chain", "snapshot", "schedule")
+
+#history bars come back columnar: date (datetime64[D]), close, high, low as float64 arrays
+BAR_COLUMNS = ("date", "close", "high", "low")
+
+#yfinance (and the pandas under it) is imported on first use, so offline runs and light CLI paths skip it
+yf = None
+
+def _yfinance():
+    global yf
+    if yf is None:
+        import yfinance
+        yf = yfinance
+    return yf
+
+#straight yfinance access, one Ticker object per symbol instead of one per call
+class YFinanceProvider:
+    def __init__(self):
+        self._tickers: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _ticker(self, ticker: str):
+        with self._lock:
+            tk = self._tickers.get(ticker)
+            if tk is None:
+                tk = self._tickers[ticker] = _yfinance().Ticker(ticker)
+            return tk
+
+    def spot(self, ticker: str) -> Optional[float]:
+        spot_hist = self._ticker(ticker).history(period="1d", auto_adjust=True)
+        if spot_hist is None or spot_hist.empty:
+            return None
+        return float(spot_hist["Close"].iloc[-1])
+
+    def history(self, ticker: str, start: str, end: str) -> Optional[Dict[str, np.ndarray]]:
+        prices = self._ticker(ticker).history(start=start, end=end, auto_adjust=True)
+        if prices is None or prices.empty:
+            return None
+
+        if "Close" in prices.columns:
+            close = prices["Close"]
+        elif "Adj Close" in prices.columns:
+            close = prices["Adj Close"]
+        else:
+            close = prices.select_dtypes(include="number").iloc[:, 0]
+        close = np.asarray(close, dtype="float64").reshape(-1)
+
+        #high/low only feed range-based vol estimators, fall back to close when missing
+        high = np.asarray(prices["High"], dtype="float64") if "High" in prices.columns else close.copy()
+        low = np.asarray(prices["Low"], dtype="float64") if "Low" in prices.columns else close.copy()
+        dates = np.asarray([d.date() for d in prices.index], dtype="datetime64[D]")
+        return {"date": dates, "close": close, "high": high, "low": low}
+
+    def expiries(self, ticker: str) -> List[str]:
+        return list(self._ticker(ticker).options or [])
+
+    def option_chain(self, ticker: str, expiry_str: str):
+        return self._ticker(ticker).option_chain(expiry_str)
+
+    def chain_snapshot(self, ticker: str, expiry_str: str, option_type: str) -> "ChainSnapshot":
+        return ChainSnapshot.from_chain(self.option_chain(ticker, expiry_str), option_type)
+
+    def expiry_schedule(self, ticker: str) -> "ExpirySchedule":
+        return ExpirySchedule(self.expiries(ticker))
+
+#local stand-in serving fixed data, for tests, benchmarks and offline runs
+#bars: ticker -> columnar dict as above, chains: (ticker, expiry) -> object with .calls/.puts frames
+class LocalProvider:
+    def __init__(self, spots: Dict[str, float], bars: Dict[str, Dict[str, np.ndarray]],
+                 expiries: Dict[str, List[str]], chains: Dict[Any, Any]):
+        self.spots = spots
+        self.bars = bars
+        self.expiry_lists = expiries
+        self.chains = chains
+
+    def spot(self, ticker: str) -> Optional[float]:
+        return self.spots.get(ticker)
+
+    def history(self, ticker: str, start: str, end: str) -> Optional[Dict[str, np.ndarray]]:
+        bars = self.bars.get(ticker)
+        if bars is None:
+            return None
+        keep = (bars["date"] >= np.datetime64(start)) & (bars["date"] < np.datetime64(end))
+        return {k: np.asarray(v)[keep] for k, v in bars.items()}
+
+    def expiries(self, ticker: str) -> List[str]:
+        return list(self.expiry_lists.get(ticker, []))
+
+    def option_chain(self, ticker: str, expiry_str: str):
+        chain = self.chains.get((ticker, expiry_str))
+        if chain is None:
+            raise KeyError(f"no chain for {ticker} {expiry_str}")
+        return chain
+
+    def chain_snapshot(self, ticker: str, expiry_str: str, option_type: str) -> "ChainSnapshot":
+        return ChainSnapshot.from_chain(self.option_chain(ticker, expiry_str), option_type)
+
+    def expiry_schedule(self, ticker: str) -> "ExpirySchedule":
+        return ExpirySchedule(self.expiries(ticker))
+
+#wraps any provider with an in-memory LRU+TTL cache (separate ttl per data kind)
+#and an on-disk npz store for history windows that have fully closed and can never change
+class CachedProvider:
+    def __init__(self, provider, ttl: Optional[Dict[str, float]] = None, maxsize: int = 1024,
+                 store_dir: Optional[str] = "market_data"):
+        self.provider = provider
+        self.ttl = {"spot": 15.0, "history": 86400.0, "expiries": 3600.0, "chain": 30.0}
+        self.ttl.update(ttl or {})
+        #parsed forms (chain snapshots, expiry schedules) are counted as their own kinds, with the raw data's ttl
+        self.ttl.setdefault("snapshot", self.ttl["chain"])
+        self.ttl.setdefault("schedule", self.ttl["expiries"])
+        self.maxsize = int(maxsize)
+        self.store_dir = Path(store_dir) if store_dir else None
+        self._entries: "OrderedDict[Any, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = {k: 0 for k in KINDS}
+        self.misses = {k: 0 for k in KINDS}
+        self.disk_hits = 0
+
+    def _get(self, kind: str, key, loader: Callable[[], Any]):
+        full_key = (kind,) + key
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(full_key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(full_key)
+                self.hits[kind] += 1
+                return entry[1]
+            self.misses[kind] += 1
+
+        #load outside the lock so slow fetches for other tickers are not serialized
+        value = loader()
+        if value is None:
+            return None
+
+        with self._lock:
+            self._entries[full_key] = (now + self.ttl[kind], value)
+            self._entries.move_to_end(full_key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def spot(self, ticker: str) -> Optional[float]:
+        return self._get("spot", (ticker,), lambda: self.provider.spot(ticker))
+
+    def history(self, ticker: str, start: str, end: str) -> Optional[Dict[str, np.ndarray]]:
+        return self._get("history", (ticker, start, end), lambda: self._load_history(ticker, start, end))
+
+    def expiries(self, ticker: str) -> List[str]:
+        return self._get("expiries", (ticker,), lambda: self.provider.expiries(ticker) or None) or []
+
+    def option_chain(self, ticker: str, expiry_str: str):
+        return self._get("chain", (ticker, expiry_str), lambda: self.provider.option_chain(ticker, expiry_str))
+
+    #parsed forms share the raw entries' ttl, so they are rebuilt exactly when the data is refetched
+    def chain_snapshot(self, ticker: str, expiry_str: str, option_type: str) -> "ChainSnapshot":
+        return self._get("snapshot", (ticker, expiry_str, option_type.lower()),
+                         lambda: ChainSnapshot.from_chain(self.option_chain(ticker, expiry_str), option_type))
+
+    def expiry_schedule(self, ticker: str) -> "ExpirySchedule":
+        return self._get("schedule", (ticker,), lambda: ExpirySchedule(self.expiries(ticker)))
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            out = {}
+            for k in KINDS:
+                total = self.hits[k] + self.misses[k]
+                out[k] = {"hits": self.hits[k], "misses": self.misses[k],
+                          "hit_rate": (self.hits[k] / total) if total else 0.0}
+            out["disk"] = {"hits": self.disk_hits}
+            return out
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _history_file(self, ticker: str, start: str, end: str) -> Optional[Path]:
+        if self.store_dir is None:
+            return None
+        #a window ending in the future can still gain bars, only persist closed ones
+        if np.datetime64(end) > np.datetime64(date.today()):
+            return None
+        return self.store_dir / f"{ticker}_{start}_{end}.npz"
+
+    def _load_history(self, ticker: str, start: str, end: str) -> Optional[Dict[str, np.ndarray]]:
+        path = self._history_file(ticker, start, end)
+        if path is not None and path.exists():
+            try:
+                with np.load(path) as data:
+                    bars = {k: data[k] for k in BAR_COLUMNS}
+                with self._lock:
+                    self.disk_hits += 1
+                return bars
+            except Exception:
+                #unreadable file, refetch and overwrite below
+                pass
+
+        bars = self.provider.history(ticker, start, end)
+        if bars is not None and path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(".tmp.npz")
+            np.savez_compressed(tmp, **{k: bars[k] for k in BAR_COLUMNS})
+            tmp.replace(path)
+        return bars
+
+#a chain object shaped like yfinance's, handy for building LocalProvider data
+def make_chain(calls, puts=None):
+    return SimpleNamespace(calls=calls, puts=puts if puts is not None else calls.iloc[0:0])
+
+#one side (calls or puts) of one expiry as strike-sorted float64 arrays with the mid already worked out
+#mid follows the quote rule used for trading: (bid+ask)/2, else last, else a lone bid or ask; nan when none
+class ChainSnapshot:
+    def __init__(self, strike, bid, ask, last, symbol=None):
+        strike = np.asarray(strike, dtype=np.float64)
+        keep = ~np.isnan(strike)
+        order = np.argsort(strike[keep], kind="stable")
+        def col(a):
+            return np.asarray(a, dtype=np.float64)[keep][order]
+        self.strike = strike[keep][order]
+        self.bid, self.ask, self.last = col(bid), col(ask), col(last)
+        self.symbol = None if symbol is None else np.asarray(symbol, dtype=object)[keep][order]
+
+        b, a, l = self.bid, self.ask, self.last
+        with np.errstate(invalid="ignore"):
+            self.mid = np.select([(b > 0) & (a > 0), l > 0, (b > 0) & (a == 0), (a > 0) & (b == 0)],
+                                 [(b + a) / 2.0, l, b, a], default=np.nan)
+
+    @classmethod
+    def from_frame(cls, df) -> "ChainSnapshot":
+        if df is None or df.empty:
+            return cls(np.empty(0), np.empty(0), np.empty(0), np.empty(0))
+        import pandas as pd
+        def num(name):
+            if name not in df.columns:
+                return np.zeros(len(df))
+            return np.asarray(pd.to_numeric(df[name], errors="coerce"), dtype=np.float64)
+        symbol = df["contractSymbol"].to_numpy() if "contractSymbol" in df.columns else None
+        return cls(num("strike"), num("bid"), num("ask"), num("lastPrice"), symbol)
+
+    @classmethod
+    def from_chain(cls, chain, option_type: str) -> "ChainSnapshot":
+        return cls.from_frame(chain.calls if option_type.lower() == "call" else chain.puts)
+
+    def __len__(self) -> int:
+        return self.strike.size
+
+    #index of the listed strike closest to strike (the lower one on a tie), -1 for an empty side
+    def nearest(self, strike: float) -> int:
+        n = self.strike.size
+        if n == 0:
+            return -1
+        i = int(np.searchsorted(self.strike, strike))
+        if i == 0:
+            return 0
+        if i == n:
+            return n - 1
+        return i if self.strike[i] - strike < strike - self.strike[i - 1] else i - 1
+
+    #indices of every contract with a usable mid
+    def quoted(self) -> np.ndarray:
+        return np.flatnonzero(self.mid > 0)
+
+#listed expiries parsed once into datetime64[D], in listing order; unparseable strings are dropped
+class ExpirySchedule:
+    def __init__(self, expiries: List[str]):
+        keep, dates = [], []
+        for s in expiries:
+            try:
+                dates.append(np.datetime64(date.fromisoformat(s), "D"))
+                keep.append(s)
+            except (TypeError, ValueError):
+                continue
+        self.expiries = keep
+        self.dates = np.array(dates, dtype="datetime64[D]")
+
+    def __len__(self) -> int:
+        return len(self.expiries)
+
+    #expiry closest to target among those not yet past (the earlier one on a tie), else the soonest listed
+    def select(self, target: date, today: date) -> Optional[int]:
+        if not self.expiries:
+            return None
+        diff = (self.dates - np.datetime64(target, "D")).astype(np.int64)
+        live = np.flatnonzero(self.dates >= np.datetime64(today, "D"))
+        if live.size:
+            #minimize |diff|, then diff itself, then listing order
+            return int(live[np.lexsort((live, diff[live], np.abs(diff[live])))[0]])
+        return int(np.argmin(self.dates))
+
+    def upcoming(self, today: date, horizon_days: Optional[int] = None) -> List[int]:
+        days = (self.dates - np.datetime64(today, "D")).astype(np.int64)
+        ok = days >= 0 if horizon_days is None else (days >= 0) & (days <= horizon_days)
+        return [int(i) for i in np.flatnonzero(ok)]
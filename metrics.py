@@ -0,0 +1,206 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+
+#lightweight in-process instrumentation: stage timers, counters, gauges and latency histograms
+#exported once per cycle either as JSON lines (that cycle's numbers) or as a Prometheus text file
+#(cumulative, rewritten atomically for a node_exporter textfile collector or any local scraper)
+#when disabled every call returns straight away, timers hand back one shared no-op context
+FORMATS = ("off", "jsonl", "prometheus")
+
+#cycle latency buckets in seconds, +Inf is implicit
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+def _key(name: str, labels: Dict[str, Any]) -> Tuple:
+    return (name,) + tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+class Metrics:
+    def __init__(self, fmt: str = "off", path: Optional[str] = None, buckets=LATENCY_BUCKETS):
+        fmt = (fmt or "off").lower()
+        if fmt not in FORMATS:
+            raise ValueError(f"METRICS must be one of {FORMATS}, got {fmt!r}")
+        self.format = fmt
+        self.enabled = fmt != "off"
+        self.path = Path(path or ("metrics.jsonl" if fmt == "jsonl" else "metrics.prom"))
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        #cumulative since start (prometheus) and since the last flush (jsonl)
+        self._total = self._empty()
+        self._window = self._empty()
+        self.cycles = 0
+
+    @staticmethod
+    def _empty() -> Dict[str, Dict]:
+        return {"counters": {}, "gauges": {}, "summaries": {}, "histograms": {}}
+
+    #time a block: metrics.timer("history", ticker="AAPL")
+    def timer(self, stage: str, **labels):
+        if not self.enabled:
+            return _NULL_TIMER
+        return self._timer(stage, labels)
+
+    @contextmanager
+    def _timer(self, stage, labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_stage(stage, time.perf_counter() - t0, **labels)
+
+    #stage durations measured elsewhere (e.g. inside a worker process)
+    def observe_stage(self, stage: str, seconds: float, **labels) -> None:
+        if not self.enabled:
+            return
+        key = _key("stage_seconds", dict(labels, stage=stage))
+        with self._lock:
+            for store in (self._total, self._window):
+                s = store["summaries"].setdefault(key, [0, 0.0, 0.0])
+                s[0] += 1
+                s[1] += seconds
+                s[2] = max(s[2], seconds)
+
+    def count(self, name: str, n: float = 1, **labels) -> None:
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self._lock:
+            for store in (self._total, self._window):
+                store["counters"][key] = store["counters"].get(key, 0) + n
+
+    def gauge(self, name: str, value: float, **labels) -> None:
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self._lock:
+            for store in (self._total, self._window):
+                store["gauges"][key] = float(value)
+
+    #histogram observation, e.g. whole-cycle latency
+    def observe(self, name: str, value: float, **labels) -> None:
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self._lock:
+            for store in (self._total, self._window):
+                h = store["histograms"].setdefault(key, [[0] * (len(self.buckets) + 1), 0.0, 0])
+                i = 0
+                while i < len(self.buckets) and value > self.buckets[i]:
+                    i += 1
+                h[0][i] += 1
+                h[1] += value
+                h[2] += 1
+
+    #hit/miss/hit_rate gauges from a cache's stats() ({kind: {...}} or one flat dict)
+    def cache_stats(self, cache: str, stats: Dict[str, Any]) -> None:
+        if not self.enabled or not stats:
+            return
+        groups = stats.items() if all(isinstance(v, dict) for v in stats.values()) else [("all", stats)]
+        for kind, values in groups:
+            for field, value in values.items():
+                if isinstance(value, (int, float)):
+                    self.gauge(f"cache_{field}", value, cache=cache, kind=kind)
+
+    #write out and start a new window; called once per cycle
+    def flush(self) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self.cycles += 1
+            window, self._window = self._window, self._empty()
+            total = {k: {kk: (list(vv) if isinstance(vv, list) else vv) for kk, vv in v.items()}
+                     for k, v in self._total.items()}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.format == "jsonl":
+            with open(self.path, "a", encoding="utf-8") as fh:
+                fh.write(json.dumps(self._as_json(window), separators=(",", ":")) + "\n")
+        else:
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            tmp.write_text(self._as_prometheus(total), encoding="utf-8")
+            os.replace(tmp, self.path)
+
+    def _as_json(self, store) -> Dict[str, Any]:
+        def row(key, **values):
+            return dict(dict(key[1:]), name=key[0], **values)
+        return {
+            "ts": time.time(), "cycle": self.cycles,
+            "stages": [row(k, count=s[0], sum=s[1], max=s[2]) for k, s in store["summaries"].items()],
+            "counters": [row(k, value=v) for k, v in store["counters"].items()],
+            "gauges": [row(k, value=v) for k, v in store["gauges"].items()],
+            "histograms": [row(k, buckets=dict(zip([str(b) for b in self.buckets] + ["+Inf"], h[0])),
+                               sum=h[1], count=h[2]) for k, h in store["histograms"].items()],
+        }
+
+    def _as_prometheus(self, store) -> str:
+        def labels(key, extra=None):
+            pairs = list(key[1:]) + (extra or [])
+            if not pairs:
+                return ""
+            body = ",".join(f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+                            for k, v in pairs)
+            return "{" + body + "}"
+
+        lines = []
+        typed = set()
+        def head(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for key, v in sorted(store["counters"].items()):
+            name = f"lsmc_{key[0]}_total"
+            head(name, "counter")
+            lines.append(f"{name}{labels(key)} {v}")
+        for key, v in sorted(store["gauges"].items()):
+            name = f"lsmc_{key[0]}"
+            head(name, "gauge")
+            lines.append(f"{name}{labels(key)} {v}")
+        #a family's samples must be contiguous, so the max gauges go out after all the summaries
+        summaries = sorted(store["summaries"].items())
+        for key, s in summaries:
+            name = f"lsmc_{key[0]}"
+            head(name, "summary")
+            lines.append(f"{name}_count{labels(key)} {s[0]}")
+            lines.append(f"{name}_sum{labels(key)} {s[1]}")
+        for key, s in summaries:
+            name = f"lsmc_{key[0]}_max"
+            head(name, "gauge")
+            lines.append(f"{name}{labels(key)} {s[2]}")
+        for key, h in sorted(store["histograms"].items()):
+            name = f"lsmc_{key[0]}"
+            head(name, "histogram")
+            acc = 0
+            for b, c in zip([str(b) for b in self.buckets] + ["+Inf"], h[0]):
+                acc += c
+                lines.append(f"{name}_bucket{labels(key, [('le', b)])} {acc}")
+            lines.append(f"{name}_sum{labels(key)} {h[1]}")
+            lines.append(f"{name}_count{labels(key)} {h[2]}")
+        lines.append("# TYPE lsmc_cycles_total counter")
+        lines.append(f"lsmc_cycles_total {self.cycles}")
+        return "\n".join(lines) + "\n"
+
+#process-wide instance, configured from METRICS / METRICS_PATH on first use
+_metrics = None
+
+def get_metrics() -> Metrics:
+    global _metrics
+    if _metrics is None:
+        from config import metrics_format, metrics_path
+        _metrics = Metrics(metrics_format, metrics_path)
+    return _metrics
+
+def set_metrics(metrics: Optional[Metrics]) -> None:
+    global _metrics
+    _metrics = metrics
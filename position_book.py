@@ -0,0 +1,199 @@
+from collections.abc import MutableMapping
+from datetime import date
+from typing import Dict, Any, Iterator, Mapping, Optional
+
+import numpy as np
+
+#the keys a position has always carried per optnID
+FIELDS = ("strk_price", "prem_paid", "qty", "exp_date", "optn_typ", "underlying_price")
+
+#open positions as numpy columns, one row per optnID, with an optnID -> row index
+#columns: strike, average premium, qty, expiry (as listed and as datetime64), option type (as given and as a
+#call flag), underlying ticker (the optnID prefix) and the spot at the last trade; capacity doubles as needed
+#and a delete moves the last row into the hole, so the live rows are always the leading len(book) entries
+#still a mapping optnID -> position dict for existing callers; a looked-up position is a live view of its row
+class PositionBook(MutableMapping):
+    def __init__(self, capacity: int = 64):
+        self._n = 0
+        self._index: Dict[str, int] = {}
+        self._alloc(max(1, int(capacity)))
+
+    def _alloc(self, capacity: int) -> None:
+        old = self.__dict__.get("_cols")
+        cols = {
+            "id": np.empty(capacity, dtype=object),
+            "strike": np.empty(capacity),
+            "prem": np.empty(capacity),
+            "qty": np.empty(capacity, dtype=np.int64),
+            "exp_str": np.empty(capacity, dtype=object),
+            "expiry": np.empty(capacity, dtype="datetime64[D]"),
+            "typ": np.empty(capacity, dtype=object),
+            "is_call": np.empty(capacity, dtype=bool),
+            "ticker": np.empty(capacity, dtype=object),
+            "spot": np.empty(capacity),
+        }
+        if old is not None:
+            for name, col in cols.items():
+                col[:self._n] = old[name][:self._n]
+        self._cols = cols
+
+    @classmethod
+    def from_dict(cls, positions: Mapping[str, Mapping[str, Any]]) -> "PositionBook":
+        book = cls(capacity=max(64, 2 * len(positions)))
+        for optnID, position in positions.items():
+            book[optnID] = position
+        return book
+
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        return {self._cols["id"][i]: self._row(i) for i in range(self._n)}
+
+    #live columns, the leading len(book) rows (views: writes go into the book)
+    def column(self, name: str) -> np.ndarray:
+        return self._cols[name][:self._n]
+
+    def _row(self, i: int) -> Dict[str, Any]:
+        c = self._cols
+        return {
+            "strk_price": float(c["strike"][i]),
+            "prem_paid": float(c["prem"][i]),
+            "qty": int(c["qty"][i]),
+            "exp_date": c["exp_str"][i],
+            "optn_typ": c["typ"][i],
+            "underlying_price": float(c["spot"][i]),
+        }
+
+    def _field(self, optnID: str, key: str):
+        i = self._index[optnID]
+        if key not in FIELDS:
+            raise KeyError(key)
+        return self._row(i)[key]
+
+    def _setField(self, optnID: str, key: str, value) -> None:
+        i = self._index[optnID]
+        c = self._cols
+        if key == "strk_price":
+            c["strike"][i] = float(value)
+        elif key == "prem_paid":
+            c["prem"][i] = float(value)
+        elif key == "qty":
+            c["qty"][i] = int(value)
+        elif key == "exp_date":
+            c["exp_str"][i] = value
+            c["expiry"][i] = _parseExpiry(value)
+        elif key == "optn_typ":
+            c["typ"][i] = value
+            c["is_call"][i] = str(value).lower() == "call"
+        elif key == "underlying_price":
+            c["spot"][i] = np.nan if value is None else float(value)
+        else:
+            raise KeyError(key)
+
+    #mapping interface
+    def __getitem__(self, optnID: str) -> "PositionView":
+        if optnID not in self._index:
+            raise KeyError(optnID)
+        return PositionView(self, optnID)
+
+    def __setitem__(self, optnID: str, position: Mapping[str, Any]) -> None:
+        values = dict(position)
+        missing = [k for k in FIELDS if k not in values]
+        if missing:
+            raise KeyError(f"position {optnID!r} is missing {missing}")
+        if optnID not in self._index:
+            if self._n == self._cols["id"].size:
+                self._alloc(2 * self._n)
+            self._index[optnID] = self._n
+            self._cols["id"][self._n] = optnID
+            self._cols["ticker"][self._n] = str(optnID).split("_", 1)[0]
+            self._n += 1
+        for key in FIELDS:
+            self._setField(optnID, key, values[key])
+
+    def __delitem__(self, optnID: str) -> None:
+        i = self._index.pop(optnID)
+        last = self._n - 1
+        if i != last:
+            for col in self._cols.values():
+                col[i] = col[last]
+            self._index[self._cols["id"][i]] = i
+        for name in ("id", "exp_str", "typ", "ticker"):
+            self._cols[name][last] = None
+        self._n = last
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._cols["id"][:self._n]))
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __contains__(self, optnID) -> bool:
+        return optnID in self._index
+
+    def __repr__(self) -> str:
+        return f"PositionBook({self.to_dict()!r})"
+
+    #marks for every row from an optnID -> price mapping, nan where a position has no price
+    def align(self, prices: Mapping[str, float]) -> np.ndarray:
+        marks = np.full(self._n, np.nan)
+        for optnID, price in prices.items():
+            i = self._index.get(optnID)
+            if i is not None:
+                marks[i] = float(price)
+        return marks
+
+    #sum of (mark - average premium) * qty over the rows with a finite mark
+    def unrealized(self, marks: np.ndarray) -> float:
+        marks = np.asarray(marks, dtype=np.float64)
+        ok = np.isfinite(marks)
+        diff = np.where(ok, marks - self.column("prem"), 0.0)
+        return float(diff @ self.column("qty"))
+
+    #rows whose expiry is before today (unparseable expiries never match)
+    def expired(self, today: Optional[date] = None) -> np.ndarray:
+        today = np.datetime64(today or date.today(), "D")
+        exp = self.column("expiry")
+        return np.flatnonzero(~np.isnat(exp) & (exp < today))
+
+    #row indices of the given optnIDs (as taken by intrinsic)
+    def rows(self, optnIDs) -> np.ndarray:
+        return np.array([self._index[o] for o in optnIDs], dtype=np.intp)
+
+    #per-contract intrinsic value of rows at the given spots
+    def intrinsic(self, rows: np.ndarray, spots: np.ndarray) -> np.ndarray:
+        K = self._cols["strike"][rows]
+        return np.where(self._cols["is_call"][rows], np.maximum(spots - K, 0.0), np.maximum(K - spots, 0.0))
+
+#one position as a mapping, reading and writing its row of the book
+class PositionView(MutableMapping):
+    __slots__ = ("_book", "_id")
+
+    def __init__(self, book: PositionBook, optnID: str):
+        self._book = book
+        self._id = optnID
+
+    def __getitem__(self, key):
+        return self._book._field(self._id, key)
+
+    def __setitem__(self, key, value) -> None:
+        self._book._setField(self._id, key, value)
+
+    def __delitem__(self, key) -> None:
+        raise TypeError("position fields cannot be removed")
+
+    def __iter__(self):
+        return iter(FIELDS)
+
+    def __len__(self) -> int:
+        return len(FIELDS)
+
+    def copy(self) -> Dict[str, Any]:
+        return dict(self)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+def _parseExpiry(value) -> np.datetime64:
+    try:
+        return np.datetime64(date.fromisoformat(str(value)), "D")
+    except ValueError:
+        return np.datetime64("NaT", "D")
@@ -0,0 +1,141 @@
+import bisect
+import json
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+
+import lsmc_engine
+
+#precomputed American prices over (moneyness K/S, sigma, maturity, rate), normalized to spot 1
+#so price(S, K) = S * surface(K/S, ...); built offline by buildSurface, looked up online by PriceSurface
+#on disk, for a prefix p:
+#  p.npy      float32 prices, shape (moneyness, sigma, maturity, rate), memory-mapped on load
+#  p.err.npy  float32 per-node interpolation error estimate, same shape
+#  p.json     axes, option type, paths/steps/seed and the Monte Carlo standard error per (sigma, rate)
+AXES = ("moneyness", "sigma", "maturity", "rate")
+
+#"lo,hi,n" -> n evenly spaced points, a single number -> that one point
+def parseGrid(spec) -> np.ndarray:
+    parts = [float(p) for p in str(spec).split(",") if p.strip()]
+    if len(parts) == 1:
+        return np.array(parts)
+    if len(parts) != 3 or parts[2] < 2:
+        raise ValueError(f"grid spec {spec!r} must be 'value' or 'lo,hi,n'")
+    return np.linspace(parts[0], parts[1], int(parts[2]))
+
+#estimated multilinear interpolation error at each node: h^2/8 * |f''| summed over the axes,
+#with f'' the second divided difference and h the wider of the node's two cells
+def _interpError(P, axes) -> np.ndarray:
+    err = np.zeros_like(P)
+    for d, x in enumerate(axes):
+        if x.size < 3:
+            continue
+        f = np.moveaxis(P, d, 0)
+        h = np.diff(x)
+        shape = (-1,) + (1,) * (P.ndim - 1)
+        hl, hr = h[:-1].reshape(shape), h[1:].reshape(shape)
+        d2 = 2.0 * ((f[2:] - f[1:-1]) / hr - (f[1:-1] - f[:-2]) / hl) / (hl + hr)
+        d2 = np.abs(np.concatenate([d2[:1], d2, d2[-1:]], axis=0))
+        hmax = np.maximum(np.concatenate([h[:1], h]), np.concatenate([h, h[-1:]])).reshape(shape)
+        err += np.moveaxis(hmax**2 / 8.0 * d2, 0, d)
+    return err
+
+#price the whole grid: one spot-1 path set per (sigma, rate) covering the longest maturity, every
+#moneyness x maturity contract on it in one batched backward pass (calcOptnPrices)
+#maturities are snapped to the path grid dt = T/M of the online pricer so both discretize the same way
+def buildSurface(prefix, moneyness, sigmas, maturities, rates, dt, paths=50000, optionType="Call", seed=12345,
+                 basis="poly2", dtype=np.float64, z=1.96, verbose=False) -> "PriceSurface":
+    moneyness = np.unique(np.asarray(moneyness, dtype=np.float64))
+    sigmas = np.unique(np.asarray(sigmas, dtype=np.float64))
+    rates = np.unique(np.asarray(rates, dtype=np.float64))
+    steps = np.unique(np.maximum(1, np.rint(np.asarray(maturities, dtype=np.float64) / dt).astype(int)))
+    maturities = steps * dt
+    T_max, M_max = float(maturities[-1]), int(steps[-1])
+    atm = int(np.argmin(np.abs(moneyness - 1.0)))
+
+    P = np.empty((moneyness.size, sigmas.size, maturities.size, rates.size))
+    mc_stderr = np.empty((sigmas.size, rates.size))
+    seeds = np.random.SeedSequence(seed).spawn(sigmas.size * rates.size)
+    for si, sigma in enumerate(sigmas):
+        for ri, rate in enumerate(rates):
+            rng = np.random.default_rng(seeds[si * rates.size + ri])
+            S = lsmc_engine.genPricePaths(sigma, 1.0, rate, T_max, M_max, paths, dtype=dtype, rng=rng)
+            P[:, si, :, ri] = lsmc_engine.calcOptnPrices(S, moneyness, rate, T_max, optionType,
+                                                         maturities=maturities, basis=basis).T
+            #one error bar per path set, at the money and longest maturity (the noisiest point)
+            mc_stderr[si, ri] = lsmc_engine.calcOptnPriceStats(S, moneyness[atm], rate, T_max, optionType,
+                                                               basis=basis).stderr
+            if verbose:
+                print(f"surface sigma={sigma:.4f} r={rate:.4f} done")
+
+    prefix = Path(prefix)
+    prefix.parent.mkdir(parents=True, exist_ok=True)
+    axes = [moneyness, sigmas, maturities, rates]
+    meta = {"axes": {name: ax.tolist() for name, ax in zip(AXES, axes)}, "option_type": optionType,
+            "paths": int(paths), "dt": float(dt), "seed": int(seed), "basis": basis, "z": float(z),
+            "mc_stderr": mc_stderr.tolist()}
+    #data files first, metadata last (atomically), so a reader never sees axes without their arrays
+    np.save(prefix.with_name(prefix.name + ".npy"), P.astype(np.float32))
+    np.save(prefix.with_name(prefix.name + ".err.npy"), _interpError(P, axes).astype(np.float32))
+    tmp = prefix.with_name(prefix.name + ".json.tmp")
+    tmp.write_text(json.dumps(meta))
+    tmp.replace(prefix.with_name(prefix.name + ".json"))
+    return PriceSurface(prefix)
+
+class PriceSurface:
+    def __init__(self, prefix):
+        prefix = Path(prefix)
+        meta = json.loads(prefix.with_name(prefix.name + ".json").read_text())
+        self.axes = [list(map(float, meta["axes"][name])) for name in AXES]
+        self.option_type = meta["option_type"]
+        self.paths = int(meta["paths"])
+        self.z = float(meta["z"])
+        self.mc_stderr = np.asarray(meta["mc_stderr"], dtype=np.float64)
+        #plain ndarray views of the memory maps, pages load on first touch
+        self.prices = np.asarray(np.load(prefix.with_name(prefix.name + ".npy"), mmap_mode="r"))
+        self.err = np.asarray(np.load(prefix.with_name(prefix.name + ".err.npy"), mmap_mode="r"))
+
+    #(cell start, 2-point weights) along one axis, None outside the grid
+    #a single-point axis only matches its own value
+    @staticmethod
+    def _locate(x, v):
+        n = len(x)
+        if n == 1:
+            return (0, np.ones(1)) if abs(v - x[0]) <= 1e-9 * max(1.0, abs(x[0])) else None
+        if v < x[0] or v > x[-1]:
+            return None
+        i = min(bisect.bisect_right(x, v) - 1, n - 2)
+        w = (v - x[i]) / (x[i + 1] - x[i])
+        return i, np.array([1.0 - w, w])
+
+    #(price, error bound) at spot, or None when the point is off the surface
+    #the bound is the interpolation estimate at the cell's corners plus z Monte Carlo standard errors
+    def lookup(self, spot, K, sigma, T, r, optionType="Call") -> Optional[Tuple[float, float]]:
+        if optionType != self.option_type:
+            return None
+        cell = []
+        for x, v in zip(self.axes, (float(K) / float(spot), float(sigma), float(T), float(r))):
+            loc = self._locate(x, v)
+            if loc is None:
+                return None
+            cell.append(loc)
+        sl = tuple(slice(i, i + w.size) for i, w in cell)
+
+        #contract the 2x2x2x2 corner block one axis at a time
+        price = self.prices[sl].astype(np.float64)
+        for _, w in reversed(cell):
+            price = price @ w
+        mc = float(self.mc_stderr[sl[1], sl[3]].max())
+        bound = float(self.err[sl].max()) + self.z * mc
+        return float(spot) * float(price), float(spot) * bound
+
+if __name__ == "__main__":
+    from config import (T, M, I, r, price_surface, surface_moneyness, surface_sigmas, surface_maturities,
+                        surface_rates, surface_paths, path_dtype, regression_basis)
+    if not price_surface:
+        raise SystemExit("set PRICE_SURFACE to the output prefix (e.g. surfaces/call)")
+    surf = buildSurface(price_surface, parseGrid(surface_moneyness), parseGrid(surface_sigmas),
+                        parseGrid(surface_maturities), parseGrid(surface_rates), T / M, paths=surface_paths,
+                        optionType="Call", basis=regression_basis, dtype=path_dtype, verbose=True)
+    print(f"wrote {price_surface}: {surf.prices.shape} grid, {surf.prices.nbytes} bytes")
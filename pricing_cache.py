@@ -0,0 +1,117 @@
+import math
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+
+import lsmc_engine
+
+#memoized lsmc prices using GBM homogeneity: price(S, K) = S * price(1, K/S)
+#a slice is (sigma, T, r, M, option type); within a slice prices live on a moneyness grid K/S = i*step,
+#all priced on the same fixed-seed spot-1 paths (common random numbers), so neighbouring grid points are
+#consistent with each other and a lookup between two of them is a linear interpolation
+#grid points are the LRU entries; a miss prices the bracketing points plus a few neighbours in one batched pass
+class PricingCache:
+    def __init__(self, paths: int = 10000, maxsize: int = 4096, step: float = 0.0025, neighbours: int = 2,
+                 seed: int = 12345, dtype=np.float64, basis: str = "poly2"):
+        self.paths = int(paths)
+        self.maxsize = int(maxsize)
+        self.step = float(step)
+        self.neighbours = max(0, int(neighbours))
+        self.seed = int(seed)
+        self.dtype = dtype
+        self.basis = basis
+        self._entries: "OrderedDict[Tuple, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _slice(self, sigma, T, r, M, optionType) -> Tuple:
+        #sigma from the same history window is bit-identical between polls, rounding only absorbs float noise
+        return (round(float(sigma), 10), float(T), float(r), int(M), optionType)
+
+    def _bracket(self, spot, K) -> Tuple[int, float]:
+        x = (float(K) / float(spot)) / self.step
+        i = max(1, int(math.floor(x)))
+        return i, min(max(x - i, 0.0), 1.0)
+
+    #spot-1 price by interpolation, or None when either bracketing grid point is missing
+    #count=False leaves the hit/miss counters alone (for re-reads of a lookup already counted)
+    def get(self, spot, K, sigma, T, r, M, optionType="Call", count: bool = True) -> Optional[float]:
+        key = self._slice(sigma, T, r, M, optionType)
+        i, w = self._bracket(spot, K)
+        with self._lock:
+            lo = self._entries.get(key + (i,))
+            hi = self._entries.get(key + (i + 1,))
+            found = lo is not None and hi is not None
+            if count:
+                if found:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+            if not found:
+                return None
+            self._entries.move_to_end(key + (i,))
+            self._entries.move_to_end(key + (i + 1,))
+        return (1.0 - w) * lo + w * hi
+
+    #grid points a miss needs priced, as picklable arguments for priceGrid (None when nothing is missing)
+    def plan(self, spot, K, sigma, T, r, M, optionType="Call"):
+        key = self._slice(sigma, T, r, M, optionType)
+        i, _ = self._bracket(spot, K)
+        want = range(max(1, i - self.neighbours), i + 2 + self.neighbours)
+        with self._lock:
+            idx = [j for j in want if key + (j,) not in self._entries]
+        if not idx:
+            return None
+        return (key, np.array(idx), self.step, self.paths, self.seed, self.dtype, self.basis)
+
+    def fill(self, plan, prices) -> None:
+        key, idx = plan[0], plan[1]
+        with self._lock:
+            for j, p in zip(idx, prices):
+                self._entries[key + (int(j),)] = float(p)
+                self._entries.move_to_end(key + (int(j),))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    #price at the given spot, pricing the missing grid inline when needed
+    def price(self, spot, K, sigma, T, r, M, optionType="Call", count: bool = True) -> float:
+        unit = self.get(spot, K, sigma, T, r, M, optionType, count)
+        if unit is None:
+            plan = self.plan(spot, K, sigma, T, r, M, optionType)
+            if plan is not None:
+                self.fill(plan, priceGrid(*plan))
+            unit = self.get(spot, K, sigma, T, r, M, optionType, count=False)
+            if unit is None:
+                #evicted straight away (maxsize below the grid window), price the bracket directly
+                i, w = self._bracket(spot, K)
+                lo, hi = priceGrid(self._slice(sigma, T, r, M, optionType), np.array([i, i + 1]), self.step,
+                                   self.paths, self.seed, self.dtype, self.basis)
+                unit = (1.0 - w) * lo + w * hi
+        return float(spot) * unit
+
+    #same price as a PriceEstimate; the cache keeps no per-path values, so no standard error
+    def estimate(self, spot, K, sigma, T, r, M, optionType="Call", count: bool = True) -> lsmc_engine.PriceEstimate:
+        price = self.price(spot, K, sigma, T, r, M, optionType, count)
+        return lsmc_engine.PriceEstimate(price, float("nan"), float("nan"), float("nan"), self.paths)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "hit_rate": (self.hits / total) if total else 0.0,
+                    "entries": len(self._entries)}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+#spot-1 prices for grid indices idx of a slice; module level so a process pool can run it
+#the paths depend only on the slice and the seed, so any subset of the grid comes out the same
+#(up to roundoff: the batched regressions do not depend on which other strikes are in the batch)
+def priceGrid(key, idx, step, paths, seed, dtype=np.float64, basis="poly2"):
+    sigma, T, r, M, optionType = key
+    rng = np.random.default_rng(seed)
+    S = lsmc_engine.genPricePaths(sigma, 1.0, r, T, M, paths, dtype=dtype, rng=rng)
+    return lsmc_engine.calcOptnPrices(S, np.asarray(idx, dtype=np.float64) * step, r, T, optionType, basis=basis)
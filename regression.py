@@ -0,0 +1,143 @@
+import numpy as np
+
+#continuation-value regressions for the LSMC engine
+#a basis is named by family + degree, e.g. "poly2" (1, x, x^2, the original), "laguerre3", "hermite4";
+#x is normalized moneyness S/scale so the columns stay O(1) whatever the price level
+BASES = ("poly", "laguerre", "hermite")
+
+#Gram matrices with a larger (Jacobi-scaled) condition number than this go to the lstsq fallback
+COND_LIMIT = 1e10
+
+def parseBasis(basis):
+    name = basis.rstrip("0123456789")
+    digits = basis[len(name):]
+    if name not in BASES or not digits:
+        raise ValueError(f"unknown regression basis {basis!r}, expected e.g. poly2, laguerre3, hermite4")
+    return name, int(digits)
+
+#(n, degree+1) design matrix, written into out when given
+#poly: 1, x, .., x^d
+#laguerre: 1 plus the weighted Laguerre functions exp(-x/2) L_k(x), k < d (Longstaff-Schwartz's choice)
+#hermite: probabilists' Hermite polynomials He_k of x - 1, i.e. centred on at-the-money
+def basisMatrix(x, basis="poly2", out=None):
+    name, degree = parseBasis(basis)
+    n = x.shape[0]
+    A = out if out is not None else np.empty((n, degree + 1))
+    A[:, 0] = 1.0
+    if degree == 0:
+        return A
+
+    if name == "poly":
+        A[:, 1] = x
+        for k in range(2, degree + 1):
+            np.multiply(A[:, k - 1], x, out=A[:, k])
+    elif name == "laguerre":
+        w = np.exp(-0.5 * x)
+        A[:, 1] = w
+        if degree >= 2:
+            np.multiply(w, 1.0 - x, out=A[:, 2])
+        for k in range(2, degree):
+            #k*L_k = (2k - 1 - x) L_{k-1} - (k - 1) L_{k-2}, carried with the weight attached
+            A[:, k + 1] = ((2 * k - 1 - x) * A[:, k] - (k - 1) * A[:, k - 1]) / k
+    else:
+        z = x - 1.0
+        A[:, 1] = z
+        for k in range(2, degree + 1):
+            A[:, k] = z * A[:, k - 1] - (k - 1) * A[:, k - 2]
+    return A
+
+#least squares through the small Gram matrix: Jacobi-scale it, Cholesky-solve the normal equations,
+#and only fall back to SVD lstsq on the design matrix when the Gram is singular or badly conditioned
+def solveLeastSquares(A, y):
+    return solveNormalEquations(A.T @ A, A.T @ y, lambda: np.linalg.lstsq(A, y, rcond=None)[0])
+
+#the same from a Gram matrix and right-hand side formed elsewhere (e.g. summed over blocks of paths);
+#fallback() returns the lstsq solution and is only called when the Cholesky route is refused
+def solveNormalEquations(G, b, fallback):
+    d = np.sqrt(np.diag(G))
+    if np.all(d > 0):
+        Gs = G / np.outer(d, d)
+        try:
+            L = np.linalg.cholesky(Gs)
+            ld = np.diag(L)
+            if (ld.max() / ld.min()) ** 2 < COND_LIMIT:
+                u = np.linalg.solve(L, b / d)
+                return np.linalg.solve(L.T, u) / d
+        except np.linalg.LinAlgError:
+            pass
+    return fallback()
+
+#fit one continuation regression: returns fitted values at S and the coefficients
+def fitContinuation(S, futureVals, scale, basis="poly2"):
+    A = basisMatrix(S / scale, basis)
+    beta = solveLeastSquares(A, futureVals)
+    return A @ beta, beta
+
+#many regressions sharing one set of S (e.g. several strikes on the same paths)
+#row c of weights (0/1, typically the ITM mask) selects the paths contract c regresses on,
+#futureVals is (contracts, paths); returns fitted values for every contract on every path
+def fitContinuationBatched(S, weights, futureVals, scale, basis="poly2"):
+    A = basisMatrix(S / scale, basis)
+    n, p = A.shape
+    W = np.asarray(weights, dtype=np.float64)
+
+    #per-contract Gram matrices in one product: G_c = A' diag(w_c) A
+    outer = (A[:, :, None] * A[:, None, :]).reshape(n, p * p)
+    G = (W @ outer).reshape(-1, p, p)
+    b = (futureVals * W) @ A
+
+    beta = _solveBatched(G, b, lambda c, rows: A[rows], W, futureVals)
+    return beta @ A.T
+
+#contracts on different underlyings: S is (contracts, paths), each contract regresses on its own row
+#(weights/futureVals as above, scale one per contract); same Gram/Cholesky route as fitContinuationBatched
+#the design is stored basis-function-major, (p, contracts, paths), so every product runs on contiguous rows
+def fitContinuationMulti(S, weights, futureVals, scale, basis="poly2"):
+    C, n = S.shape
+    x = (S / np.asarray(scale, dtype=np.float64).reshape(-1, 1)).reshape(-1)
+    p = parseBasis(basis)[1] + 1
+    buf = np.empty((p, C * n))
+    basisMatrix(x, basis, out=buf.T)
+    A = buf.reshape(p, C, n)
+    W = np.asarray(weights, dtype=np.float64)
+
+    AW = np.multiply(A, W)
+    #(C, p, n) @ (C, n, p) through strided views, one small GEMM per contract
+    G = np.matmul(AW.transpose(1, 0, 2), A.transpose(1, 2, 0))
+    b = np.matmul(AW.transpose(1, 0, 2), futureVals[:, :, None])[..., 0]
+    beta = _solveBatched(G, b, lambda c, rows: A[:, c, rows].T, W, futureVals)
+
+    fitted = A[0] * beta[:, 0, None]
+    for k in range(1, p):
+        fitted += A[k] * beta[:, k, None]
+    return fitted
+
+#per-contract normal equations G_c beta_c = b_c: Jacobi-scaled batched Cholesky, and lstsq on the
+#contract's own rows (design(c, rows)) for singular, ill-conditioned or under-populated contracts
+def _solveBatched(G, b, design, W, futureVals):
+    p = G.shape[1]
+    beta = np.zeros_like(b)
+    d = np.sqrt(np.einsum("cii->ci", G))
+    #G[c, 0, 0] counts the paths in the regression, fewer than p leaves it singular
+    ok = np.all(d > 0, axis=1) & (G[:, 0, 0] >= p)
+    if ok.any():
+        dk = d[ok]
+        Gs = G[ok] / (dk[:, :, None] * dk[:, None, :])
+        try:
+            L = np.linalg.cholesky(Gs)
+            ld = np.einsum("cii->ci", L)
+            good = (ld.max(axis=1) / ld.min(axis=1)) ** 2 < COND_LIMIT
+            u = np.linalg.solve(L, (b[ok] / dk)[:, :, None])
+            sol = np.linalg.solve(np.swapaxes(L, 1, 2), u)[..., 0] / dk
+            idx = np.flatnonzero(ok)
+            beta[idx[good]] = sol[good]
+            ok[idx[~good]] = False
+        except np.linalg.LinAlgError:
+            ok[:] = False
+
+    #singular or ill-conditioned contracts (e.g. fewer ITM paths than basis functions) go through lstsq
+    for c in np.flatnonzero(~ok):
+        rows = W[c] > 0
+        if rows.any():
+            beta[c] = np.linalg.lstsq(design(c, rows), futureVals[c, rows], rcond=None)[0]
+    return beta
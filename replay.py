@@ -0,0 +1,524 @@
+import argparse
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, date
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Sequence
+
+import numpy as np
+
+from market_data import BAR_COLUMNS, ChainSnapshot, ExpirySchedule
+from paper_trader import PaperTrader
+from trade_journal import TradeJournal
+from vol_state import VolState
+
+#capture and offline replay of the market data the strategy sees
+#  RECORD_DIR=captures python main.py        any live run records what its polls read, one segment per cycle
+#  python replay.py info captures            days, polls, tickers and size of a capture
+#  python replay.py run captures             every recorded poll through run_once_for_ticker against a fresh book
+#  python replay.py run captures --param thresh=0.03,0.05 --param strike_type=ATM,OTM --by-day --workers 4
+#a capture directory holds segments, each a set of .npy columns (loaded with mmap_mode="r") and a meta.json
+#with the segment's ticker / history-window string tables:
+#  poll.{ts,ticker}                                       one row per poll (fetch_ticker_inputs / fetch_chain_inputs)
+#  spot.{ts,ticker,value}                                 every spot read
+#  expiries.{ts,ticker,offset} + expiry.date              listed expiries, rows i's are date[offset[i]:offset[i+1]]
+#  chain.{ts,ticker,expiry,call,offset} + contract.{strike,bid,ask,last}   one side of one expiry per row
+#  history.{ts,ticker,window,offset} + bar.{date,close,high,low}
+#reads made inside a poll carry the poll's timestamp, so the replay of a poll sees exactly what it read;
+#expiry, chain and history rows are only written when they changed since the same key's last row that day
+
+#row tables: columns, then the ragged child table and its columns
+LAYOUT = {
+    "poll": (("ts", "ticker"), None, ()),
+    "spot": (("ts", "ticker", "value"), None, ()),
+    "expiries": (("ts", "ticker"), "expiry", ("date",)),
+    "chain": (("ts", "ticker", "expiry", "call"), "contract", ("strike", "bid", "ask", "last")),
+    "history": (("ts", "ticker", "window"), "bar", BAR_COLUMNS),
+}
+DTYPES = {"ts": np.float64, "ticker": np.int32, "value": np.float64, "expiry": "datetime64[D]", "call": bool,
+          "window": np.int32, "date": "datetime64[D]"}
+
+#main globals a replay may override per job (--param name=v1,v2,...)
+REPLAY_PARAMS = ("thresh", "strike_type", "strike_pct", "T", "M", "I", "r", "regression_basis", "vr_antithetic",
+                 "vr_control_variate", "adaptive_pricing", "compute_greeks", "settle_expired", "mark_to_market",
+                 "vol_estimator", "vol_window", "vol_ewma_lambda")
+
+def _same(a: np.ndarray, b: np.ndarray) -> bool:
+    if a.shape != b.shape:
+        return False
+    return bool(np.array_equal(a, b, equal_nan=a.dtype.kind == "f"))
+
+#provider wrapper for live runs (RECORD_DIR): passes every call through and buffers what came back;
+#flush() (once per cycle, from main.record_cycle) writes the buffered rows as one new segment
+class RecordingProvider:
+    def __init__(self, provider, root: str):
+        self.provider = provider
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._rows = self._empty()
+        self._last: Dict[Any, Any] = {}
+        self._day = None
+
+    @staticmethod
+    def _empty() -> Dict[str, Dict[str, list]]:
+        rows = {}
+        for table, (cols, child, child_cols) in LAYOUT.items():
+            rows[table] = {c: [] for c in cols}
+            if child is not None:
+                rows[table]["children"] = []
+        return rows
+
+    #every read inside is stamped with the poll's start time
+    @contextmanager
+    def poll(self, ticker: str):
+        ts = time.time()
+        self._append("poll", ts=ts, ticker=ticker)
+        prev = getattr(self._local, "ts", None)
+        self._local.ts = ts
+        try:
+            yield
+        finally:
+            self._local.ts = prev
+
+    def _now(self) -> float:
+        ts = getattr(self._local, "ts", None)
+        return time.time() if ts is None else ts
+
+    def _append(self, table: str, children=None, **values) -> None:
+        with self._lock:
+            rows = self._rows[table]
+            for k, v in values.items():
+                rows[k].append(v)
+            if children is not None:
+                rows["children"].append(children)
+
+    #unchanged data (same key, same day) is not written again; the replay's as-of lookup finds the earlier row
+    #the day is kept per key, so polls of different days finishing out of order (threads around midnight) never
+    #dedupe one day's first row against another day's; keys not seen since before the latest day are dropped
+    def _changed(self, ts: float, key, arrays) -> bool:
+        day = date.fromtimestamp(ts)
+        with self._lock:
+            if self._day is None or day > self._day:
+                oldest = self._day or day
+                self._last = {k: v for k, v in self._last.items() if v[0] >= oldest}
+                self._day = day
+            prev = self._last.get(key)
+            if prev is not None and prev[0] == day and all(_same(a, b) for a, b in zip(prev[1], arrays)):
+                return False
+            self._last[key] = (day, arrays)
+            return True
+
+    def spot(self, ticker: str) -> Optional[float]:
+        value = self.provider.spot(ticker)
+        if value is not None:
+            self._append("spot", ts=self._now(), ticker=ticker, value=float(value))
+        return value
+
+    def history(self, ticker: str, start: str, end: str) -> Optional[Dict[str, np.ndarray]]:
+        bars = self.provider.history(ticker, start, end)
+        if bars is not None:
+            ts = self._now()
+            cols = tuple(np.asarray(bars[c], dtype=DTYPES.get(c, np.float64)) for c in BAR_COLUMNS)
+            if self._changed(ts, ("history", ticker, start, end), cols):
+                self._append("history", children=cols, ts=ts, ticker=ticker, window=(start, end))
+        return bars
+
+    def _record_expiries(self, ticker: str, dates: np.ndarray) -> None:
+        ts = self._now()
+        dates = np.asarray(dates, dtype="datetime64[D]")
+        if self._changed(ts, ("expiries", ticker), (dates,)):
+            self._append("expiries", children=(dates,), ts=ts, ticker=ticker)
+
+    def expiries(self, ticker: str) -> List[str]:
+        listed = self.provider.expiries(ticker)
+        self._record_expiries(ticker, ExpirySchedule(listed).dates)
+        return listed
+
+    def expiry_schedule(self, ticker: str) -> ExpirySchedule:
+        schedule = self.provider.expiry_schedule(ticker)
+        self._record_expiries(ticker, schedule.dates)
+        return schedule
+
+    #raw frames are not captured, only the parsed snapshots the strategy prices from
+    def option_chain(self, ticker: str, expiry_str: str):
+        return self.provider.option_chain(ticker, expiry_str)
+
+    def chain_snapshot(self, ticker: str, expiry_str: str, option_type: str) -> ChainSnapshot:
+        snap = self.provider.chain_snapshot(ticker, expiry_str, option_type)
+        ts = self._now()
+        call = option_type.lower() == "call"
+        cols = (snap.strike, snap.bid, snap.ask, snap.last)
+        if self._changed(ts, ("chain", ticker, expiry_str, call), cols):
+            self._append("chain", children=cols, ts=ts, ticker=ticker, expiry=np.datetime64(expiry_str, "D"),
+                         call=call)
+        return snap
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return self.provider.stats() if hasattr(self.provider, "stats") else {}
+
+    def clear(self) -> None:
+        if hasattr(self.provider, "clear"):
+            self.provider.clear()
+
+    #buffered rows out as one segment (written under a temporary name, then renamed); None when nothing was read
+    def flush(self) -> Optional[Path]:
+        with self._lock:
+            rows, self._rows = self._rows, self._empty()
+        if not any(rows[t]["ts"] for t in LAYOUT):
+            return None
+
+        tickers = sorted({t for table in rows.values() for t in table["ticker"]})
+        tid = {t: i for i, t in enumerate(tickers)}
+        windows = sorted(set(rows["history"]["window"]))
+        wid = {w: i for i, w in enumerate(windows)}
+
+        name = f"{datetime.now().strftime('%Y%m%dT%H%M%S%f')}-{os.getpid()}"
+        tmp = self.root / (name + ".tmp")
+        tmp.mkdir(parents=True, exist_ok=True)
+        for table, (cols, child, child_cols) in LAYOUT.items():
+            data = rows[table]
+            for c in cols:
+                values = data[c]
+                if c == "ticker":
+                    values = [tid[v] for v in values]
+                elif c == "window":
+                    values = [wid[v] for v in values]
+                np.save(tmp / f"{table}.{c}.npy", np.asarray(values, dtype=DTYPES[c]))
+            if child is None:
+                continue
+            children = data["children"]
+            offset = np.zeros(len(children) + 1, dtype=np.int64)
+            offset[1:] = np.cumsum([ch[0].size for ch in children])
+            np.save(tmp / f"{table}.offset.npy", offset)
+            for j, c in enumerate(child_cols):
+                dtype = DTYPES.get(c, np.float64)
+                parts = [np.asarray(ch[j], dtype=dtype) for ch in children]
+                np.save(tmp / f"{child}.{c}.npy", np.concatenate(parts) if parts else np.empty(0, dtype=dtype))
+        meta = {"version": 1, "tickers": tickers, "windows": [list(w) for w in windows]}
+        (tmp / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+        final = self.root / name
+        os.replace(tmp, final)
+        return final
+
+#all segments of a capture: the small row tables merged (ts-sorted, tickers as one global table) and grouped per
+#key for as-of lookups; the contract and bar columns stay memory-mapped in their segments
+class Capture:
+    def __init__(self, root: str):
+        self.root = Path(root)
+        segments = sorted(p for p in self.root.iterdir() if p.is_dir() and (p / "meta.json").exists()) \
+            if self.root.is_dir() else []
+        if not segments:
+            raise FileNotFoundError(f"no capture segments under {self.root}")
+        self.segments = segments
+        self.tickers: List[str] = []
+        self.windows: List[tuple] = []
+        self.children: List[Dict[str, Dict[str, np.ndarray]]] = []
+        tid: Dict[str, int] = {}
+        wid: Dict[tuple, int] = {}
+        parts: Dict[str, List[Dict[str, np.ndarray]]] = {t: [] for t in LAYOUT}
+
+        for s, seg in enumerate(segments):
+            meta = json.loads((seg / "meta.json").read_text(encoding="utf-8"))
+            tmap = np.array([tid.setdefault(t, len(tid)) for t in meta["tickers"]] or [0], dtype=np.int32)
+            wmap = np.array([wid.setdefault(tuple(w), len(wid)) for w in meta["windows"]] or [0], dtype=np.int32)
+            kids = {}
+            for table, (cols, child, child_cols) in LAYOUT.items():
+                part = {c: np.load(seg / f"{table}.{c}.npy", mmap_mode="r") for c in cols}
+                part["ticker"] = tmap[part["ticker"]]
+                if "window" in part:
+                    part["window"] = wmap[part["window"]]
+                n = part["ts"].size
+                part["seg"] = np.full(n, s, dtype=np.int32)
+                if child is not None:
+                    offset = np.load(seg / f"{table}.offset.npy")
+                    part["lo"], part["hi"] = offset[:-1], offset[1:]
+                    kids[child] = {c: np.load(seg / f"{child}.{c}.npy", mmap_mode="r") for c in child_cols}
+                parts[table].append(part)
+            self.children.append(kids)
+        self.tickers = sorted(tid, key=tid.get)
+        self.windows = sorted(wid, key=wid.get)
+
+        self.tables: Dict[str, Dict[str, np.ndarray]] = {}
+        for table, chunks in parts.items():
+            merged = {c: np.concatenate([np.asarray(p[c]) for p in chunks]) for c in chunks[0]}
+            order = np.argsort(merged["ts"], kind="stable")
+            self.tables[table] = {c: v[order] for c, v in merged.items()}
+        self._groups = {table: self._group(table) for table in ("spot", "expiries", "chain", "history")}
+
+    #key -> (ts ascending, row indices); keys are (ticker,) or (ticker, expiry day, call) for chains
+    def _group(self, table: str) -> Dict[tuple, tuple]:
+        rows = self.tables[table]
+        keys = [rows["ticker"].astype(np.int64)]
+        if table == "chain":
+            keys += [rows["expiry"].astype(np.int64), rows["call"].astype(np.int64)]
+        if rows["ts"].size == 0:
+            return {}
+        K = np.stack(keys)
+        uniq, inverse = np.unique(K, axis=1, return_inverse=True)
+        inverse = np.asarray(inverse).reshape(-1)
+        order = np.lexsort((rows["ts"], inverse))
+        bounds = np.flatnonzero(np.diff(inverse[order])) + 1
+        out = {}
+        for g, idx in enumerate(np.split(order, bounds)):
+            out[tuple(int(v) for v in uniq[:, g])] = (rows["ts"][idx], idx)
+        return out
+
+    #rows of table for key written at or before ts, oldest first
+    def upto(self, table: str, key: tuple, ts: float) -> np.ndarray:
+        group = self._groups[table].get(key)
+        if group is None:
+            return np.empty(0, dtype=np.int64)
+        return group[1][:int(np.searchsorted(group[0], ts, side="right"))]
+
+    #row of table holding key's latest value at or before ts, -1 when there is none yet
+    def asof(self, table: str, key: tuple, ts: float) -> int:
+        rows = self.upto(table, key, ts)
+        return int(rows[-1]) if rows.size else -1
+
+    def child(self, table: str, row: int) -> Dict[str, np.ndarray]:
+        rows = self.tables[table]
+        kids = self.children[int(rows["seg"][row])][LAYOUT[table][1]]
+        lo, hi = int(rows["lo"][row]), int(rows["hi"][row])
+        return {c: v[lo:hi] for c, v in kids.items()}
+
+    #polls (ts, ticker name) in time order, optionally only on the given local dates
+    def polls(self, days: Optional[Sequence[date]] = None):
+        rows = self.tables["poll"]
+        ts, tk = rows["ts"], rows["ticker"]
+        idx = np.arange(ts.size)
+        if days is not None:
+            keep = set(days)
+            idx = np.array([i for i in idx if date.fromtimestamp(ts[i]) in keep], dtype=np.int64)
+        return [(int(i), float(ts[i]), self.tickers[tk[i]]) for i in idx]
+
+    def days(self) -> List[date]:
+        return sorted({date.fromtimestamp(t) for t in self.tables["poll"]["ts"]})
+
+    def nbytes(self) -> int:
+        return sum(f.stat().st_size for seg in self.segments for f in seg.iterdir())
+
+#market data provider answering from a capture as of .now (epoch seconds), for offline replays
+class ReplayProvider:
+    def __init__(self, capture: Capture):
+        self.capture = capture
+        self.now = float("inf")
+        self._tid = {t: i for i, t in enumerate(capture.tickers)}
+        #parsed form of the last row served per key (a poll tends to reread the same chain and schedule)
+        self._parsed: Dict[tuple, tuple] = {}
+
+    def _row(self, table: str, ticker: str, *extra) -> int:
+        i = self._tid.get(ticker)
+        if i is None:
+            return -1
+        return self.capture.asof(table, (i,) + extra, self.now)
+
+    def spot(self, ticker: str) -> Optional[float]:
+        row = self._row("spot", ticker)
+        return None if row < 0 else float(self.capture.tables["spot"]["value"][row])
+
+    #every bar recorded so far (live runs read the full window once, then only tails), the latest row winning
+    #on a date, cut to [start, end) like LocalProvider
+    def history(self, ticker: str, start: str, end: str) -> Optional[Dict[str, np.ndarray]]:
+        i = self._tid.get(ticker)
+        rows = self.capture.upto("history", (i,), self.now) if i is not None else ()
+        if len(rows) == 0:
+            return None
+        parts = [self.capture.child("history", int(row)) for row in rows[::-1]]
+        bars = {c: np.concatenate([np.asarray(p[c]) for p in parts]) for c in BAR_COLUMNS}
+        _, first = np.unique(bars["date"], return_index=True)
+        d = bars["date"][first]
+        keep = first[(d >= np.datetime64(start)) & (d < np.datetime64(end))]
+        return {k: v[keep] for k, v in bars.items()}
+
+    def expiry_schedule(self, ticker: str) -> ExpirySchedule:
+        row = self._row("expiries", ticker)
+        if row < 0:
+            return ExpirySchedule([])
+        cached = self._parsed.get(("expiries", ticker))
+        if cached is None or cached[0] != row:
+            dates = self.capture.child("expiries", row)["date"]
+            cached = self._parsed[("expiries", ticker)] = (row, ExpirySchedule([str(d) for d in dates]))
+        return cached[1]
+
+    def expiries(self, ticker: str) -> List[str]:
+        return list(self.expiry_schedule(ticker).expiries)
+
+    def option_chain(self, ticker: str, expiry_str: str):
+        raise KeyError("captures hold parsed chain snapshots only, use chain_snapshot")
+
+    def chain_snapshot(self, ticker: str, expiry_str: str, option_type: str) -> ChainSnapshot:
+        call = option_type.lower() == "call"
+        key = ("chain", ticker, expiry_str, call)
+        row = self._row("chain", ticker, int(np.datetime64(expiry_str, "D").astype(np.int64)), int(call))
+        if row < 0:
+            raise KeyError(f"no recorded chain for {ticker} {expiry_str}")
+        cached = self._parsed.get(key)
+        if cached is None or cached[0] != row:
+            c = self.capture.child("chain", row)
+            cached = self._parsed[key] = (row, ChainSnapshot(c["strike"], c["bid"], c["ask"], c["last"]))
+        return cached[1]
+
+#replayed books stay in memory: no state files, no journal files (trades are still in trader.trade_log)
+class _MemoryJournal(TradeJournal):
+    def append(self, entry: Dict[str, Any], day: str) -> None:
+        pass
+
+class _ReplayTrader(PaperTrader):
+    def save_state(self, path: str = "portfolio_state.json", force: bool = False) -> None:
+        pass
+
+def _cast(current, value):
+    if isinstance(current, bool):
+        return str(value).strip().lower() in ("1", "true", "yes")
+    return type(current)(value)
+
+#one backtest: a fresh book fed every recorded poll (of the given days) in time order through the live
+#strategy code, with main's globals overridden by params and its clock set to each poll's time;
+#poll k is priced with SeedSequence(seed, spawn_key=(k,)), so parameter sets share random numbers poll by poll
+#and a by-day split prices each poll exactly as the full run does; the book is settled/marked after each day
+def replay(root: str, params: Optional[Dict[str, Any]] = None, days: Optional[Sequence[date]] = None,
+           seed: int = 0, starting_cash: float = 200.0, verbose: bool = False) -> Dict[str, Any]:
+    import main
+
+    params = dict(params or {})
+    bad = [k for k in params if k not in REPLAY_PARAMS]
+    if bad:
+        raise ValueError(f"cannot override {bad} in a replay, expected some of {REPLAY_PARAMS}")
+    saved = {k: getattr(main, k) for k in REPLAY_PARAMS}
+    saved_provider = main._market_data
+    saved_vol = main._vol_state
+    t0 = time.perf_counter()
+    try:
+        for k, v in params.items():
+            setattr(main, k, _cast(saved[k], v))
+        if main.mark_to_market == "off":
+            #a backtest wants its open positions valued; listed mids unless the params ask for model marks
+            main.mark_to_market = "market"
+        capture = Capture(root)
+        provider = ReplayProvider(capture)
+        main.set_market_data_provider(provider)
+        #vol rebuilt from the recorded bars as the replay goes, never from (or into) VOL_STATE_PATH
+        main.set_vol_state(VolState(main.vol_estimator, main.vol_window, main.vol_ewma_lambda, None,
+                                    main.start_date, main.end_date))
+        trader = _ReplayTrader(starting_cash=starting_cash, journal=_MemoryJournal())
+        decisions = {"BUY": 0, "SELL": 0, "HOLD": 0}
+        skipped = 0
+        polls = capture.polls(days)
+        day = None
+        for k, ts, ticker in polls:
+            when = datetime.fromtimestamp(ts)
+            if day is not None and when.date() != day:
+                main.revalue_book(trader)
+            day = when.date()
+            provider.now = ts
+            main.set_clock(lambda when=when: when)
+            res = main.run_once_for_ticker(ticker, trader, seed=np.random.SeedSequence(seed, spawn_key=(k,)))
+            if res.get("ok"):
+                decisions[res["decision"]] += 1
+            else:
+                skipped += 1
+            if verbose:
+                main.print_result(ticker, res)
+        if day is not None:
+            main.revalue_book(trader)
+    finally:
+        for k, v in saved.items():
+            setattr(main, k, v)
+        main.set_market_data_provider(saved_provider)
+        main.set_vol_state(saved_vol)
+        main.set_clock(None)
+
+    return {
+        "params": params,
+        "days": [str(d) for d in (days if days is not None else capture.days())],
+        "polls": len(polls),
+        "skipped": skipped,
+        "decisions": decisions,
+        "trades": len(trader.trade_log),
+        "cash": trader.currCash,
+        "positions": len(trader.positions),
+        "realized": trader.realized_PNL,
+        "unrealized": trader.unrealized_PNL,
+        "total": trader.realized_PNL + trader.unrealized_PNL,
+        "seconds": time.perf_counter() - t0,
+    }
+
+#every parameter set x (each day, or all days together) as its own replay, spread over worker processes
+#(workers <= 1 runs them here); results come back in job order
+def run_jobs(root: str, param_sets: Sequence[Dict[str, Any]], by_day: bool = False,
+             days: Optional[Sequence[date]] = None, workers: int = 0, seed: int = 0,
+             starting_cash: float = 200.0) -> List[Dict[str, Any]]:
+    all_days = list(days) if days is not None else Capture(root).days()
+    spans = [[d] for d in all_days] if by_day else [all_days]
+    jobs = [(root, dict(p), span, seed, starting_cash) for p in (param_sets or [{}]) for span in spans]
+    workers = int(workers) or (os.cpu_count() or 1)
+    if workers <= 1 or len(jobs) == 1:
+        return [replay(*job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        return list(pool.map(replay, *zip(*jobs)))
+
+#name=v1,v2 options -> the cartesian product of parameter sets
+def parse_params(specs: Sequence[str]) -> List[Dict[str, str]]:
+    axes = []
+    for spec in specs:
+        name, _, values = spec.partition("=")
+        if not values:
+            raise ValueError(f"--param expects name=value[,value...], got {spec!r}")
+        axes.append([(name.strip(), v.strip()) for v in values.split(",") if v.strip()])
+    return [dict(combo) for combo in itertools.product(*axes)]
+
+def _print_job(res: Dict[str, Any]) -> None:
+    params = " ".join(f"{k}={v}" for k, v in res["params"].items()) or "(config)"
+    days = res["days"][0] if len(res["days"]) == 1 else f"{res['days'][0]}..{res['days'][-1]}" if res["days"] else "-"
+    d = res["decisions"]
+    print(f"{params} | {days}: polls={res['polls']} buy={d['BUY']} sell={d['SELL']} hold={d['HOLD']} "
+          f"skipped={res['skipped']} trades={res['trades']} cash={res['cash']:.2f} realized={res['realized']:.2f} "
+          f"unrealized={res['unrealized']:.2f} total={res['total']:.2f} ({res['seconds']:.1f}s)")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="capture replay / backtest")
+    sub = ap.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("info")
+    p.add_argument("capture")
+    p = sub.add_parser("run")
+    p.add_argument("capture")
+    p.add_argument("--param", action="append", default=[], help="name=v1,v2 (repeatable, all combinations run)")
+    p.add_argument("--by-day", action="store_true", help="one job per day, each from a fresh book")
+    p.add_argument("--days", default=None, help="comma-separated YYYY-MM-DD, default every recorded day")
+    p.add_argument("--workers", type=int, default=None)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--cash", type=float, default=200.0)
+    p.add_argument("--json", action="store_true")
+    args = ap.parse_args(argv)
+
+    if args.command == "info":
+        cap = Capture(args.capture)
+        days = cap.days()
+        print(f"{args.capture}: {len(cap.segments)} segments, {cap.nbytes()/2**20:.1f} MiB, "
+              f"{cap.tables['poll']['ts'].size} polls over {len(days)} days "
+              f"({days[0] if days else '-'}..{days[-1] if days else '-'}), "
+              f"{cap.tables['chain']['ts'].size} chain snapshots, tickers {','.join(cap.tickers)}")
+        return 0
+
+    from config import replay_workers
+    days = [date.fromisoformat(d.strip()) for d in args.days.split(",") if d.strip()] if args.days else None
+    t0 = time.perf_counter()
+    results = run_jobs(args.capture, parse_params(args.param), args.by_day, days,
+                       replay_workers if args.workers is None else args.workers, args.seed, args.cash)
+    if args.json:
+        print(json.dumps(results, indent=2, default=str))
+    else:
+        for res in results:
+            _print_job(res)
+        print(f"{len(results)} jobs, {sum(r['polls'] for r in results)} polls in {time.perf_counter() - t0:.1f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
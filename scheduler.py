@@ -0,0 +1,119 @@
+import math
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional
+
+#per-ticker deadline bookkeeping for the market-hours loop (the loop in main owns the actual work)
+#every ticker runs on its own fixed grid of deadlines, due = anchor + k * interval, so the period never
+#stretches by the time a run takes; a ticker is never in flight twice: a run still going at its next deadline
+#is an overrun and the deadlines it missed are skipped (coalesced into the next one) rather than queued
+#at most max_in_flight tickers run at once, the highest priority and then the most overdue go first
+class TickerSlot:
+    def __init__(self, name: str, interval: float, due: float):
+        self.name = name
+        self.base_interval = float(interval)
+        self.interval = float(interval)
+        self.priority = 0
+        self.due = due
+        self.dispatched_due: Optional[float] = None
+        self.started: Optional[float] = None
+        self.runs = 0
+        self.overruns = 0
+        self.skipped = 0
+
+class DeadlineScheduler:
+    def __init__(self, intervals: Dict[str, float], fast_interval: float, max_in_flight: int = 4,
+                 now: Optional[float] = None, history: int = 1024):
+        now = time.monotonic() if now is None else now
+        self.fast_interval = float(fast_interval)
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.slots: Dict[str, TickerSlot] = {name: TickerSlot(name, iv, now) for name, iv in intervals.items()}
+        self.latency = deque(maxlen=history)
+        self.queue_delay = deque(maxlen=history)
+        self._period_latency: List[float] = []
+        self._period_overruns = 0
+        self.reset(now)
+
+    #fresh grids from now, first deadlines spread across each interval so the tickers do not all fire together
+    def reset(self, now: float) -> None:
+        n = max(1, len(self.slots))
+        for i, slot in enumerate(self.slots.values()):
+            slot.due = now + slot.interval * i / n
+            slot.dispatched_due = None
+            slot.started = None
+
+    def in_flight(self) -> int:
+        return sum(1 for s in self.slots.values() if s.started is not None)
+
+    #tickers to start now, marked in flight; bounded by the free in-flight capacity
+    def take_due(self, now: float) -> List[str]:
+        free = self.max_in_flight - self.in_flight()
+        if free <= 0:
+            return []
+        ready = [s for s in self.slots.values() if s.started is None and s.due <= now]
+        ready.sort(key=lambda s: (-s.priority, s.due))
+        out = []
+        for slot in ready[:free]:
+            slot.dispatched_due = slot.due
+            slot.started = now
+            self.queue_delay.append(now - slot.due)
+            out.append(slot.name)
+        return out
+
+    #a run came back: reclassify, then put the next deadline on the grid of the deadline it ran for
+    #returns (latency past its deadline, deadlines skipped)
+    def finish(self, name: str, now: float, near_threshold: bool = False, near_expiry: bool = False):
+        slot = self.slots[name]
+        d = slot.dispatched_due if slot.dispatched_due is not None else now
+        slot.started = None
+        slot.dispatched_due = None
+        slot.runs += 1
+
+        slot.priority = int(near_threshold) + int(near_expiry)
+        slot.interval = min(slot.base_interval, self.fast_interval) if slot.priority else slot.base_interval
+
+        k = max(1, math.ceil((now - d) / slot.interval))
+        slot.due = d + k * slot.interval
+        skipped = k - 1
+        if skipped:
+            slot.overruns += 1
+            slot.skipped += skipped
+        latency = now - d
+        self.latency.append(latency)
+        self._period_latency.append(latency)
+        self._period_overruns += int(skipped > 0)
+        return latency, skipped
+
+    #the run was abandoned (error): back on the grid without counting it
+    def release(self, name: str, now: float) -> None:
+        slot = self.slots[name]
+        d = slot.dispatched_due if slot.dispatched_due is not None else now
+        slot.started = None
+        slot.dispatched_due = None
+        slot.due = d + max(1, math.ceil((now - d) / slot.interval)) * slot.interval
+
+    #earliest deadline of an idle ticker (inf when every ticker is in flight)
+    def next_deadline(self) -> float:
+        return min((s.due for s in self.slots.values() if s.started is None), default=math.inf)
+
+    #latencies of the runs finished and overruns counted since the last call (one poll period of the loop)
+    def period(self):
+        latency, overruns = self._period_latency, self._period_overruns
+        self._period_latency, self._period_overruns = [], 0
+        return latency, overruns
+
+    def stats(self) -> Dict[str, Any]:
+        lat = sorted(self.latency)
+        def pct(q):
+            return lat[min(len(lat) - 1, int(q * len(lat)))] if lat else float("nan")
+        return {
+            "runs": sum(s.runs for s in self.slots.values()),
+            "overruns": sum(s.overruns for s in self.slots.values()),
+            "skipped": sum(s.skipped for s in self.slots.values()),
+            "in_flight": self.in_flight(),
+            "latency_p50": pct(0.5),
+            "latency_p95": pct(0.95),
+            "latency_max": lat[-1] if lat else float("nan"),
+            "queue_delay_max": max(self.queue_delay) if self.queue_delay else float("nan"),
+            "fast": [s.name for s in self.slots.values() if s.priority],
+        }
@@ -0,0 +1,359 @@
+import argparse
+import http.client
+import json
+import math
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+from typing import Dict, Any, List, Optional
+from urllib.parse import urlparse, parse_qs
+
+#long-running pricing daemon plus light clients
+#  python service.py serve                 warm engine, caches and portfolio behind http (or SERVICE_SOCKET)
+#  python service.py price AAPL MSFT       ask the daemon for run_once_for_ticker-style results (--trade to execute)
+#  python service.py cycle                 one full watchlist cycle on the daemon, like run_batch_once
+#  python service.py portfolio             print the saved portfolio straight from the state files
+#endpoints: GET /health, GET /portfolio, GET /price?ticker=AAPL&ticker=MSFT[&trade=1],
+#           POST /price {"tickers": [...], "trade": false}, POST /cycle
+#only serve imports main (numpy, the engine, market data); the client and portfolio commands stay on the
+#standard library, config and state_store, so they start in milliseconds
+
+#main.STATE_PATH, repeated so the portfolio command does not import main
+STATE_PATH = "portfolio_state.json"
+
+#collects concurrent price requests for a short window and runs them as one executor call: duplicate tickers
+#are fetched and priced once, and the batch goes through the watchlist engine in a single pass;
+#one worker thread drains the queue, so trades from the service are applied one batch at a time
+class PriceBatcher:
+    def __init__(self, service: "PricingService", window_ms: float = 20.0, max_batch: int = 64):
+        self.service = service
+        self.window = max(0.0, float(window_ms)) / 1000.0
+        self.max_batch = max(1, int(max_batch))
+        self._pending: List[Dict[str, Any]] = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._loop, name="price-batcher", daemon=True)
+        self._thread.start()
+
+    #blocks until the batch holding these tickers is done; results in request order
+    def submit(self, tickers: List[str], trade: bool = False) -> List[Dict[str, Any]]:
+        req = {"tickers": [t.strip().upper() for t in tickers if t.strip()], "trade": bool(trade),
+               "done": threading.Event(), "results": None}
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("service is shutting down")
+            self._pending.append(req)
+            self._cond.notify()
+        req["done"].wait()
+        if isinstance(req["results"], Exception):
+            raise req["results"]
+        return req["results"]
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+    def _take(self) -> Optional[List[Dict[str, Any]]]:
+        with self._cond:
+            while not self._pending and not self._closed:
+                self._cond.wait()
+            if not self._pending:
+                return None
+            #first request in: hold the window open for more, unless the batch is already full
+            deadline = time.monotonic() + self.window
+            while sum(len(q["tickers"]) for q in self._pending) < self.max_batch:
+                left = deadline - time.monotonic()
+                if left <= 0 or self._closed:
+                    break
+                self._cond.wait(left)
+            batch, self._pending = self._pending, []
+            return batch
+
+    def _loop(self) -> None:
+        while True:
+            batch = self._take()
+            if batch is None:
+                return
+            mx = self.service.main.get_metrics()
+            mx.count("service_batches")
+            mx.count("service_requests", len(batch))
+            #trading and read-only requests are separate executor calls, each over its unique tickers
+            for trade in (True, False):
+                group = [q for q in batch if q["trade"] == trade]
+                if not group:
+                    continue
+                names = list(dict.fromkeys(t for q in group for t in q["tickers"]))
+                try:
+                    #a full chain scan (SCAN_FULL_CHAIN) gives several results per ticker, all of them go back
+                    by_ticker: Dict[str, List[Dict[str, Any]]] = {}
+                    for res in self.service.run(names, trade):
+                        by_ticker.setdefault(res.get("ticker"), []).append(res)
+                    for q in group:
+                        q["results"] = [res for t in q["tickers"]
+                                        for res in by_ticker.get(t, [{"ok": False, "ticker": t, "reason": "not priced"}])]
+                except Exception as e:
+                    for q in group:
+                        q["results"] = e
+                for q in group:
+                    q["done"].set()
+
+#the warm half: one trader, one executor (thread and process pools), the module-level market data,
+#price cache, surface and pricer workspaces all stay alive between requests
+class PricingService:
+    def __init__(self, state_path: Optional[str] = None, window_ms: Optional[float] = None,
+                 max_batch: Optional[int] = None):
+        import main
+        from config import service_batch_ms, service_max_batch
+        self.main = main
+        self.state_path = state_path or main.STATE_PATH
+        self.trader = main.PaperTrader.load_state(self.state_path, starting_cash=200.0,
+                                                  allow_multiple_lots_same_option=False)
+        self.executor = main.TickerBatchExecutor()
+        #the trader is touched by the batcher, /cycle and /portfolio
+        self.lock = threading.Lock()
+        self.batcher = PriceBatcher(self, service_batch_ms if window_ms is None else window_ms,
+                                    service_max_batch if max_batch is None else max_batch)
+        self.started = time.time()
+
+    def run(self, names: List[str], trade: bool) -> List[Dict[str, Any]]:
+        with self.lock:
+            return self.executor.run(names, self.trader if trade else None, batch=True)
+
+    def price(self, tickers: List[str], trade: bool = False) -> List[Dict[str, Any]]:
+        return self.batcher.submit(tickers, trade)
+
+    def cycle(self) -> Dict[str, Any]:
+        main = self.main
+        t0 = time.perf_counter()
+        with self.lock:
+            results = self.executor.run(main.tickers, self.trader)
+            main.revalue_book(self.trader)
+            self.trader.save_state(self.state_path)
+            self.trader.export_trades()
+            portfolio = self._portfolio()
+        main.record_cycle(time.perf_counter() - t0)
+        return {"results": results, "portfolio": portfolio, "seconds": time.perf_counter() - t0}
+
+    def portfolio(self) -> Dict[str, Any]:
+        with self.lock:
+            return self._portfolio()
+
+    def _portfolio(self) -> Dict[str, Any]:
+        p = self.trader.getPortfolio()
+        return {"cash": p["cash"], "positions": self.trader.positions.to_dict(), "PnL": p["PnL"]}
+
+    def close(self) -> None:
+        self.batcher.close()
+        self.executor.close()
+        with self.lock:
+            self.trader.save_state(self.state_path, force=True)
+
+#plain JSON for a result: numpy scalars and arrays as lists, nan/inf (failed prices, empty stats) as null,
+#since json.dumps would write NaN/Infinity tokens that strict parsers reject
+def _jsonable(obj):
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {k: _jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_jsonable(v) for v in obj]
+    if hasattr(obj, "tolist"):
+        return _jsonable(obj.tolist())
+    return obj
+
+def _dumps(obj, **kwargs) -> str:
+    return json.dumps(_jsonable(obj), allow_nan=False, **kwargs)
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    server_version = "lsmc-service/1"
+    protocol_version = "HTTP/1.1"
+
+    def _send(self, code: int, body: Dict[str, Any]) -> None:
+        data = _dumps(body, separators=(",", ":")).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self) -> Dict[str, Any]:
+        n = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(n) or b"{}") if n else {}
+
+    def _dispatch(self, method: str) -> None:
+        service: PricingService = self.server.service
+        url = urlparse(self.path)
+        try:
+            #always drain the body, the connection is kept alive for the next request
+            body = self._body() if method == "POST" else {}
+            if url.path == "/health" and method == "GET":
+                self._send(200, {"ok": True, "uptime": time.time() - service.started})
+            elif url.path == "/portfolio" and method == "GET":
+                self._send(200, service.portfolio())
+            elif url.path == "/price":
+                if method == "GET":
+                    q = parse_qs(url.query)
+                    tickers = [t for v in q.get("ticker", []) for t in v.split(",")]
+                    trade = (q.get("trade", ["0"])[0].lower() in ("1", "true", "yes"))
+                else:
+                    tickers = body.get("tickers") or ([body["ticker"]] if body.get("ticker") else [])
+                    trade = bool(body.get("trade", False))
+                if not tickers:
+                    self._send(400, {"ok": False, "reason": "no ticker given"})
+                else:
+                    self._send(200, {"results": service.price(tickers, trade)})
+            elif url.path == "/cycle" and method == "POST":
+                self._send(200, service.cycle())
+            else:
+                self._send(404, {"ok": False, "reason": f"no route {method} {url.path}"})
+        except ValueError as e:
+            self._send(400, {"ok": False, "reason": f"{type(e).__name__}: {e}"})
+        except Exception as e:
+            self._send(500, {"ok": False, "reason": f"{type(e).__name__}: {e}"})
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def log_message(self, format, *args):
+        #quiet by default, the metrics carry the numbers
+        pass
+
+class UnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+    #BaseHTTPRequestHandler expects an (host, port) client address
+    def get_request(self):
+        request, _ = super().get_request()
+        return request, ("unix", 0)
+
+def serve(host: str, port: int, socket_path: Optional[str] = None, state_path: Optional[str] = None) -> None:
+    service = PricingService(state_path)
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = UnixHTTPServer(socket_path, ServiceHandler)
+        where = socket_path
+    else:
+        server = ThreadingHTTPServer((host, port), ServiceHandler)
+        server.daemon_threads = True
+        where = f"http://{host}:{server.server_address[1]}"
+    server.service = service
+
+    #SIGTERM stops like Ctrl+C: drain the batcher, close the pools, write a final snapshot
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown, daemon=True).start())
+    print(f"pricing service listening on {where}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        if socket_path and os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float = 300.0):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+def request(method: str, path: str, body: Optional[Dict[str, Any]] = None, host: str = "127.0.0.1", port: int = 8765,
+            socket_path: Optional[str] = None, timeout: float = 300.0) -> Dict[str, Any]:
+    conn = UnixHTTPConnection(socket_path, timeout) if socket_path else http.client.HTTPConnection(host, port,
+                                                                                                  timeout=timeout)
+    try:
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        conn.request(method, path, body=data, headers={"Content-Type": "application/json"} if data else {})
+        resp = conn.getresponse()
+        return json.loads(resp.read() or b"{}")
+    finally:
+        conn.close()
+
+#reads the snapshot + log tail without repairing it, so it is safe next to a running daemon
+def show_portfolio(state_path: str = STATE_PATH, as_json: bool = False) -> Dict[str, Any]:
+    from state_store import StateStore
+    data = StateStore(state_path, fsync=False).load(repair=False)
+    if data is None:
+        print(f"no saved portfolio at {state_path}")
+        return {}
+    positions = data.get("positions", {})
+    realized = float(data.get("realized_PNL", 0.0))
+    unrealized = float(data.get("unrealized_PNL", 0.0))
+    out = {"cash": float(data.get("currCash", 0.0)), "positions": positions,
+           "PnL": {"realized": realized, "unrealized": unrealized, "total": realized + unrealized}}
+    if as_json:
+        print(_dumps(out, indent=2))
+        return out
+    print(f"Cash: {out['cash']:.2f}  |  Positions: {len(positions)}  |  PnL: {out['PnL']}")
+    for optnID, p in sorted(positions.items()):
+        print(f"  {optnID}: qty={p['qty']} avg={float(p['prem_paid']):.2f} exp={p['exp_date']}")
+    return out
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="LSMC pricing service")
+    sub = ap.add_subparsers(dest="command", required=True)
+    for name in ("serve", "price", "cycle"):
+        p = sub.add_parser(name)
+        p.add_argument("--host", default=None)
+        p.add_argument("--port", type=int, default=None)
+        p.add_argument("--socket", default=None, help="Unix socket path instead of http")
+        if name == "serve":
+            p.add_argument("--state", default=None)
+        if name == "price":
+            p.add_argument("tickers", nargs="+")
+            p.add_argument("--trade", action="store_true", help="execute BUY/SELL decisions on the daemon's book")
+    p = sub.add_parser("portfolio")
+    p.add_argument("--state", default=STATE_PATH)
+    p.add_argument("--json", action="store_true")
+    args = ap.parse_args(argv)
+
+    if args.command == "portfolio":
+        show_portfolio(args.state, args.json)
+        return 0
+
+    from config import service_host, service_port, service_socket
+    host = args.host or service_host
+    port = service_port if args.port is None else args.port
+    socket_path = args.socket or (None if args.host or args.port is not None else service_socket)
+    if args.command == "serve":
+        serve(host, port, socket_path, args.state)
+        return 0
+    #the same formatter as the batch runs (main's heavy imports are lazy)
+    from main import print_result
+    try:
+        if args.command == "price":
+            out = request("POST", "/price", {"tickers": args.tickers, "trade": args.trade}, host, port, socket_path)
+            if "results" not in out:
+                print(out.get("reason", out))
+                return 1
+            for res in out["results"]:
+                print_result(res.get("ticker", "?"), res)
+        else:
+            out = request("POST", "/cycle", {}, host, port, socket_path)
+            for res in out.get("results", []):
+                print_result(res.get("ticker", "?"), res)
+            p = out.get("portfolio")
+            if p:
+                print(f"\nCash: {p['cash']:.2f}  |  Positions: {len(p['positions'])}  |  PnL: {p['PnL']}")
+    except (ConnectionError, FileNotFoundError, socket.timeout) as e:
+        print(f"pricing service not reachable ({type(e).__name__}: {e}); start it with: python service.py serve")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
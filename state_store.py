@@ -0,0 +1,96 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+#portfolio persistence as compact atomic snapshots plus a write-ahead log of per-trade deltas
+#a delta carries the post-trade values it touches (one position, cash, realized pnl), so replay is O(1)
+#per event and replaying an event twice is harmless; every event has a sequence number and the snapshot
+#records the last one it includes, so a crash between snapshot and log truncation loses nothing
+class StateStore:
+    def __init__(self, snapshot_path: str, snapshot_every: int = 100, fsync: bool = True):
+        self.snapshot_path = Path(snapshot_path)
+        self.wal_path = self.snapshot_path.with_name(self.snapshot_path.name + ".wal")
+        self.snapshot_every = max(1, int(snapshot_every))
+        self.fsync = bool(fsync)
+        self.seq = 0
+        self.snapshot_seq = 0
+        self._fh = None
+
+    #last snapshot + replayed log tail, or None when nothing was ever saved
+    #repair=False leaves a torn tail in place (for readers while another process owns the log)
+    def load(self, repair: bool = True) -> Optional[Dict[str, Any]]:
+        state = None
+        if self.snapshot_path.exists():
+            state = json.loads(self.snapshot_path.read_text() or "{}")
+        base_seq = int(state.get("wal_seq", 0)) if state else 0
+        self.seq = self.snapshot_seq = base_seq
+
+        if self.wal_path.exists():
+            good_end = 0
+            with open(self.wal_path, "rb") as fh:
+                for line in fh:
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError("partial line")
+                        event = json.loads(line)
+                    except ValueError:
+                        #torn final line from a crash mid-append
+                        break
+                    good_end += len(line)
+                    if int(event.get("seq", 0)) <= base_seq:
+                        continue
+                    state = apply_event(state if state is not None else {}, event)
+                    self.seq = int(event["seq"])
+            #cut the torn tail so new appends start on a clean line
+            if repair and good_end < self.wal_path.stat().st_size:
+                with open(self.wal_path, "r+b") as fh:
+                    fh.truncate(good_end)
+        return state
+
+    def append(self, event: Dict[str, Any]) -> None:
+        self.seq += 1
+        event = dict(event, seq=self.seq)
+        if self._fh is None:
+            self._fh = open(self.wal_path, "a", encoding="utf-8")
+        self._fh.write(json.dumps(event, separators=(",", ":")) + "\n")
+        self._fh.flush()
+        if self.fsync:
+            os.fsync(self._fh.fileno())
+
+    def pending(self) -> int:
+        return self.seq - self.snapshot_seq
+
+    #write the full state atomically (temp file + rename) and start a fresh log
+    def snapshot(self, state: Dict[str, Any]) -> None:
+        data = dict(state, wal_seq=self.seq)
+        tmp = self.snapshot_path.with_name(self.snapshot_path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as fh:
+            fh.write(json.dumps(data, separators=(",", ":")))
+            fh.flush()
+            if self.fsync:
+                os.fsync(fh.fileno())
+        os.replace(tmp, self.snapshot_path)
+
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+        open(self.wal_path, "w").close()
+        self.snapshot_seq = self.seq
+
+    def close(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+#fold one logged delta into a state dict (same layout as PaperTrader.to_state)
+def apply_event(state: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    positions = state.setdefault("positions", {})
+    if event.get("position") is None:
+        positions.pop(event["optnID"], None)
+    else:
+        positions[event["optnID"]] = event["position"]
+    for key in ("startCash", "currCash", "realized_PNL", "allow_multiple"):
+        if key in event:
+            state[key] = event[key]
+    return state
@@ -0,0 +1,181 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+import lsmc_engine
+
+S0, K, R, SIGMA, T, M = 100.0, 100.0, 0.03, 0.25, 0.5, 20
+
+
+def test_price_parallel_is_bit_identical_for_any_worker_count():
+    kwargs = dict(optionType="Put", seed=1234, blockPaths=1000)
+    ests = [lsmc_engine.priceParallel(SIGMA, S0, R, T, M, 4500, K, workers=w, **kwargs) for w in (1, 2, 4)]
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        ests.append(lsmc_engine.priceParallel(SIGMA, S0, R, T, M, 4500, K, pool=pool, **kwargs))
+    for est in ests[1:]:
+        assert est.price == ests[0].price
+        assert est.stderr == ests[0].stderr
+    assert np.isfinite(ests[0].price) and ests[0].stderr > 0
+
+
+def test_price_parallel_reseeded_blocks_repeat():
+    a = lsmc_engine.priceParallel(SIGMA, S0, R, T, M, 3000, K, "Put", seed=np.random.SeedSequence(7), blockPaths=1000)
+    b = lsmc_engine.priceParallel(SIGMA, S0, R, T, M, 3000, K, "Put", seed=np.random.SeedSequence(7), blockPaths=1000,
+                                  workers=2)
+    c = lsmc_engine.priceParallel(SIGMA, S0, R, T, M, 3000, K, "Put", seed=8, blockPaths=1000)
+    assert (a.price, a.stderr) == (b.price, b.stderr)
+    assert a.price != c.price
+    #an independent seed lands within a few standard errors
+    assert abs(a.price - c.price) < 5 * np.hypot(a.stderr, c.stderr)
+
+
+@pytest.mark.parametrize("optionType", ["Call", "Put"])
+def test_streaming_matches_full_path_matrix(optionType):
+    I = 3000
+    paths = lsmc_engine.genPricePaths(SIGMA, S0, R, T, M, I, rng=np.random.default_rng(11))
+    full = lsmc_engine.calcOptnPrice(paths, K, R, T, optionType)
+    rng = np.random.default_rng(11)
+    streamed = lsmc_engine.calcOptnPriceStreaming(SIGMA, S0, R, T, M, I, K, optionType, rng=rng)
+    assert streamed == pytest.approx(full, rel=1e-9)
+    #the stream is left where the full draw leaves it
+    after = np.random.default_rng(11)
+    after.standard_normal((M, I))
+    assert rng.standard_normal() == after.standard_normal()
+
+
+#the plain per-step backward induction the pricer's buffers replaced
+def _per_step_price(paths, K, r, T, optionType, basis="poly2"):
+    I, M_plus_1 = paths.shape
+    M = M_plus_1 - 1
+    dt = T / M
+    cashflows = lsmc_engine.payoffCalc(np.asarray(paths[:, -1], dtype=np.float64), K, optionType)
+    exerciseTimes = np.full(I, M, dtype=int)
+    for t in range(M - 1, 0, -1):
+        lsmc_engine._exerciseStep(np.asarray(paths[:, t], dtype=np.float64), t, cashflows, exerciseTimes, K, r, dt,
+                                  optionType, basis)
+    return float(np.mean(lsmc_engine.discountCashFlow(cashflows, r, dt, exerciseTimes, 0)))
+
+
+@pytest.mark.parametrize("basis", ["poly2", "laguerre3", "hermite3"])
+@pytest.mark.parametrize("optionType", ["Call", "Put"])
+def test_pricer_matches_per_step_induction(optionType, basis):
+    paths = lsmc_engine.genPricePaths(SIGMA, S0, R, T, M, 2000, rng=np.random.default_rng(5))
+    ref = _per_step_price(paths, K, R, T, optionType, basis)
+    assert lsmc_engine.calcOptnPrice(paths, K, R, T, optionType, basis) == pytest.approx(ref, rel=1e-12)
+    assert lsmc_engine.LSMCPricer(2000, M, basis).price(paths, K, R, T, optionType) == pytest.approx(ref, rel=1e-12)
+
+
+def test_pricer_buffers_reused_across_shapes_and_contracts():
+    shapes = [(2000, 10), (500, 50), (2000, 10)]
+    sets = [lsmc_engine.genPricePaths(SIGMA, S0, R, T, m, i, rng=np.random.default_rng(k))
+            for k, (i, m) in enumerate(shapes)]
+    fresh = [lsmc_engine.LSMCPricer(i, m).price(p, K, R, T, "Put") for (i, m), p in zip(shapes, sets)]
+    reused = [lsmc_engine.calcOptnPrice(p, K, R, T, "Put") for p in sets]
+    assert reused == fresh
+    #same shape again after another contract, another rate and the other type on the same pricer
+    pricer = lsmc_engine.getPricer(2000, 10)
+    first = pricer.price(sets[0], K, R, T, "Put")
+    pricer.price(sets[0], 90.0, 0.01, T, "Call")
+    assert pricer.price(sets[0], K, R, T, "Put") == first == fresh[0]
+    assert lsmc_engine.calcOptnPrice(sets[2], K, R, T, "Put") == fresh[2]
+    with pytest.raises(ValueError):
+        lsmc_engine.LSMCPricer(2000, 10).price(sets[1], K, R, T, "Put")
+
+
+@pytest.mark.parametrize("antithetic", [False, True])
+@pytest.mark.parametrize("block", [lsmc_engine.PATH_BLOCK_ELEMS, 256])
+def test_memmap_paths_match_ram_paths(tmp_path, monkeypatch, block, antithetic):
+    #block=256 takes the path-chunked branch used when one time step exceeds the block
+    monkeypatch.setattr(lsmc_engine, "PATH_BLOCK_ELEMS", block)
+    args = (SIGMA, S0, R, T, M, 1000)
+    ram = lsmc_engine.genPricePaths(*args, rng=np.random.default_rng(3), antithetic=antithetic)
+    disk = lsmc_engine.genPricePaths(*args, rng=np.random.default_rng(3), antithetic=antithetic, scratch=str(tmp_path))
+    assert isinstance(disk.base, np.memmap)
+    assert np.array_equal(np.asarray(disk), ram)
+    assert lsmc_engine.calcOptnPrice(disk, K, R, T, "Put") == lsmc_engine.calcOptnPrice(ram, K, R, T, "Put")
+
+
+def test_float32_paths_within_tolerance_of_float64(tmp_path):
+    args = (SIGMA, S0, R, T, M, 2000)
+    p64 = lsmc_engine.genPricePaths(*args, rng=np.random.default_rng(4))
+    p32 = lsmc_engine.genPricePaths(*args, rng=np.random.default_rng(4), dtype=np.float32, scratch=str(tmp_path))
+    assert p32.dtype == np.float32
+    #log-prices are accumulated in float64, so only the final rounding differs
+    assert np.allclose(p32, p64, rtol=1e-6, atol=0)
+    price64 = lsmc_engine.calcOptnPrice(p64, K, R, T, "Put")
+    assert lsmc_engine.calcOptnPrice(p32, K, R, T, "Put") == pytest.approx(price64, rel=1e-4)
+
+
+def test_exercise_every_keeps_every_kth_column():
+    full = lsmc_engine.genPricePaths(SIGMA, S0, R, T, M, 500, rng=np.random.default_rng(6))
+    sparse = lsmc_engine.genPricePaths(SIGMA, S0, R, T, M, 500, rng=np.random.default_rng(6), exercise_every=4)
+    assert sparse.shape == (500, M // 4 + 1)
+    assert np.allclose(sparse, full[:, ::4], rtol=1e-12)
+    with pytest.raises(ValueError):
+        lsmc_engine.genPricePaths(SIGMA, S0, R, T, M, 500, exercise_every=3)
+
+
+@pytest.mark.parametrize("basis", ["poly2", "poly3", "hermite3", "laguerre3"])
+@pytest.mark.parametrize("optionType", ["Call", "Put"])
+def test_batched_prices_equal_per_contract_prices(optionType, basis):
+    paths = lsmc_engine.genPricePaths(SIGMA, S0, R, T, M, 4000, rng=np.random.default_rng(8))
+    strikes = np.array([80.0, 95.0, 100.0, 110.0, 130.0])
+    single = [lsmc_engine.calcOptnPrice(paths, k, R, T, optionType, basis) for k in strikes]
+    assert lsmc_engine.calcOptnPrices(paths, strikes, R, T, optionType, basis=basis) == pytest.approx(single, rel=1e-9)
+    #a chain price does not depend on the other strikes in the batch
+    chain = lsmc_engine.calcChainPrices(paths, strikes[[2, 0]], [T, T], R, T, optionType, basis)
+    assert chain == pytest.approx([single[2], single[0]], rel=1e-9)
+
+
+def test_multi_maturity_grid_equals_each_maturity_alone():
+    paths = lsmc_engine.genPricePaths(SIGMA, S0, R, T, M, 3000, rng=np.random.default_rng(9))
+    strikes = [90.0, 100.0, 115.0]
+    steps = [5, 10, 20]
+    maturities = [T * s / M for s in steps]
+    grid = lsmc_engine.calcOptnPrices(paths, strikes, R, T, "Put", maturities=maturities)
+    assert grid.shape == (3, 3)
+    for row, (s, mat) in enumerate(zip(steps, maturities)):
+        alone = [lsmc_engine.calcOptnPrice(paths[:, :s + 1], k, R, mat, "Put") for k in strikes]
+        assert grid[row] == pytest.approx(alone, rel=1e-9)
+    chain = lsmc_engine.calcChainPrices(paths, [100.0, 90.0, 115.0], [maturities[0], maturities[2], maturities[1]],
+                                        R, T, "Put")
+    assert chain == pytest.approx([grid[0, 1], grid[2, 0], grid[1, 2]], rel=1e-12)
+
+
+def test_watchlist_induction_equals_each_underlying_alone():
+    spots, sigmas, rates = [100.0, 50.0, 250.0], [0.2, 0.35, 0.3], [0.03, 0.03, 0.01]
+    corr = [[1.0, 0.5, 0.2], [0.5, 1.0, 0.3], [0.2, 0.3, 1.0]]
+    paths = lsmc_engine.genCorrelatedPaths(spots, sigmas, rates, T, M, 2000, corr=corr, rng=np.random.default_rng(10))
+    strikes, mats, types = [105.0, 45.0, 250.0], [T, T / 2, T / 4], ["Put", "Call", "Put"]
+    est = lsmc_engine.calcOptnPricesMulti(paths, strikes, rates, mats, types)
+    for c in range(3):
+        s = int(round(mats[c] / T * M))
+        alone = lsmc_engine.calcOptnPriceStats(np.ascontiguousarray(paths[c, :, :s + 1]), strikes[c], rates[c], mats[c],
+                                               types[c])
+        assert est.price[c] == pytest.approx(alone.price, rel=1e-9)
+        assert est.stderr[c] == pytest.approx(alone.stderr, rel=1e-6)
+
+
+def test_greeks_match_bump_and_reprice_with_common_random_numbers():
+    I, seed = 20000, 12
+
+    def price(spot=S0, sigma=SIGMA):
+        paths = lsmc_engine.genPricePaths(sigma, spot, R, T, M, I, rng=np.random.default_rng(seed))
+        return lsmc_engine.calcOptnPrice(paths, K, R, T, "Put")
+
+    paths = lsmc_engine.genPricePaths(SIGMA, S0, R, T, M, I, rng=np.random.default_rng(seed))
+    g = lsmc_engine.calcOptnGreeks(paths, K, R, T, SIGMA, "Put")
+    assert g.price == pytest.approx(price(), rel=1e-12)
+
+    h = 0.01 * S0
+    delta = (price(spot=S0 + h) - price(spot=S0 - h)) / (2 * h)
+    assert g.delta < 0
+    assert abs(g.delta - delta) < 4 * g.greek_stderr["delta"]
+
+    dv = 0.01
+    vega = (price(sigma=SIGMA + dv) - price(sigma=SIGMA - dv)) / (2 * dv)
+    assert g.vega > 0
+    assert g.vega == pytest.approx(vega, rel=0.02)
+
+    assert g.gamma > 0
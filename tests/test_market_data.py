@@ -0,0 +1,32 @@
+import benchmarks
+from market_data import CachedProvider
+
+
+def _counts(stats, kind):
+    return stats[kind]["hits"], stats[kind]["misses"]
+
+
+def test_snapshots_and_raw_chains_are_counted_apart():
+    local = benchmarks.fake_provider(["AAPL"], "2024-01-01", "2024-03-01")
+    exp = local.expiry_lists["AAPL"][0]
+    md = CachedProvider(local, store_dir=None)
+
+    #cold snapshot: one snapshot miss, and one chain miss for the raw chain it parses
+    snap = md.chain_snapshot("AAPL", exp, "Call")
+    assert _counts(md.stats(), "snapshot") == (0, 1)
+    assert _counts(md.stats(), "chain") == (0, 1)
+
+    #warm snapshot never touches the chain
+    assert md.chain_snapshot("AAPL", exp, "call") is snap
+    assert _counts(md.stats(), "snapshot") == (1, 1)
+    assert _counts(md.stats(), "chain") == (0, 1)
+
+    #other side over a warm chain: a snapshot miss and a chain hit
+    md.chain_snapshot("AAPL", exp, "Put")
+    assert _counts(md.stats(), "snapshot") == (1, 2)
+    assert _counts(md.stats(), "chain") == (1, 1)
+
+    md.expiry_schedule("AAPL")
+    md.expiry_schedule("AAPL")
+    assert _counts(md.stats(), "schedule") == (1, 1)
+    assert _counts(md.stats(), "expiries") == (0, 1)
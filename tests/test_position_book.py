@@ -0,0 +1,111 @@
+from datetime import date, datetime
+
+import numpy as np
+import pytest
+
+import main
+from market_data import LocalProvider
+from paper_trader import PaperTrader
+from position_book import PositionBook
+from trade_journal import TradeJournal
+
+
+def _position(strike, typ, exp="2026-10-16", qty=1, prem=1.0):
+    return {"strk_price": strike, "prem_paid": prem, "qty": qty, "exp_date": exp, "optn_typ": typ,
+            "underlying_price": 100.0}
+
+
+def _book():
+    book = PositionBook(capacity=2)
+    book["AAPL_C100"] = _position(100.0, "call")
+    book["AAPL_P100"] = _position(100.0, "put")
+    book["MSFT_C300"] = _position(300.0, "call", exp="2026-12-18", qty=3)
+    book["MSFT_P310"] = _position(310.0, "put", exp="2026-10-01", qty=2)
+    return book
+
+
+def test_view_survives_delete_that_moves_its_row():
+    book = _book()
+    moved = book["MSFT_P310"]
+    other = book["MSFT_C300"]
+    doomed = book["AAPL_C100"]
+    #the last row fills the freed one
+    del book["AAPL_C100"]
+    assert book._index["MSFT_P310"] == 0
+    assert moved["strk_price"] == 310.0 and moved["optn_typ"] == "put" and moved["qty"] == 2
+    assert other["strk_price"] == 300.0
+    moved["qty"] = 5
+    assert book.to_dict()["MSFT_P310"]["qty"] == 5
+    assert book.to_dict()["MSFT_C300"]["qty"] == 3
+    with pytest.raises(KeyError):
+        doomed["qty"]
+    assert len(book) == 3 and "AAPL_C100" not in book
+
+
+def test_expired_and_intrinsic_on_mixed_book():
+    book = _book()
+    rows = book.expired(date(2026, 10, 17))
+    assert sorted(book.column("id")[rows]) == ["AAPL_C100", "AAPL_P100", "MSFT_P310"]
+    assert book.expired(date(2026, 10, 16)).size == 1
+
+    spots = {"AAPL": 104.0, "MSFT": 305.0}
+    S = np.array([spots[t] for t in book.column("ticker")[rows]])
+    payoff = dict(zip(book.column("id")[rows], book.intrinsic(rows, S)))
+    assert payoff == {"AAPL_C100": 4.0, "AAPL_P100": 0.0, "MSFT_P310": 5.0}
+
+
+def test_paper_trader_save_load_round_trip(tmp_path):
+    path = str(tmp_path / "portfolio_state.json")
+    journal = TradeJournal(str(tmp_path / "journal"), fsync=False)
+    trader = PaperTrader.load_state(path, starting_cash=1000.0, journal=journal)
+    trader.store.fsync = False
+    for optnID, p in _book().to_dict().items():
+        trader.buyOptn(optnID, p["strk_price"], p["qty"], p["prem_paid"], p["optn_typ"], p["exp_date"],
+                       p["underlying_price"], "2026-09-30 10:00:00")
+    trader.sellOptn("AAPL_C100", 2.0, 1, "2026-10-01 10:00:00", underlying_price=101.0)
+    trader.save_state(path, force=True)
+    before = trader.to_state()
+    trader.store.close()
+
+    loaded = PaperTrader.load_state(path, journal=journal, wal=False)
+    assert loaded.to_state() == before
+    assert list(loaded.positions) == list(trader.positions)
+
+
+def test_expired_positions_settle_at_the_expiry_close(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(main, "settle_expired", True)
+    monkeypatch.setattr(main, "mark_to_market", "off")
+    bars = {
+        #AAPL closed at 104 on its expiry day, MSFT has no bar for 2026-10-01
+        "AAPL": {"date": np.array(["2026-10-15", "2026-10-16"], dtype="datetime64[D]"),
+                 "close": np.array([90.0, 104.0])},
+        "MSFT": {"date": np.array(["2026-09-30"], dtype="datetime64[D]"), "close": np.array([320.0])},
+    }
+    main.set_market_data_provider(LocalProvider({"AAPL": 80.0, "MSFT": 305.0}, bars, {}, {}))
+    main.set_clock(lambda: datetime(2026, 10, 17, 10, 0))
+    try:
+        trader = PaperTrader(starting_cash=0.0, journal=TradeJournal(str(tmp_path / "journal"), fsync=False))
+        trader.positions = _book()
+        main.revalue_book(trader)
+    finally:
+        main.set_clock()
+        main.set_market_data_provider(None)
+    assert sorted(trader.positions) == ["MSFT_C300"]
+    #AAPL at the 104 expiry close (not the 80 spot): call 4, put 0; MSFT falls back to the 305 spot: 2 * 5
+    assert trader.currCash == pytest.approx(4.0 + 0.0 + 10.0)
+
+
+def test_exercise_pays_intrinsic_for_calls_and_puts(tmp_path):
+    trader = PaperTrader(starting_cash=0.0, journal=TradeJournal(str(tmp_path / "journal"), fsync=False))
+    trader.positions = _book()
+    assert trader.exerciseOptn("MSFT_P310", 302.0, "2026-09-30 10:00:00")
+    assert trader.currCash == pytest.approx(2 * 8.0)
+    assert trader.exerciseOptn("AAPL_C100", 104.0, "2026-09-30 10:00:00")
+    assert trader.currCash == pytest.approx(2 * 8.0 + 4.0)
+    #out of the money: closed for nothing
+    assert trader.exerciseOptn("AAPL_P100", 104.0, "2026-09-30 10:00:00")
+    assert trader.currCash == pytest.approx(20.0)
+    assert not trader.exerciseOptn("AAPL_P100", 90.0, "2026-09-30 10:00:00")
+    assert sorted(trader.positions) == ["MSFT_C300"]
+    assert [e["trad_typ"] for e in trader.journal.read("2026-09-30")] == ["EXERCISE"] * 3
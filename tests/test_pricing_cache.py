@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+import lsmc_engine
+from pricing_cache import PricingCache, priceGrid
+
+ARGS = dict(sigma=0.3, T=0.5, r=0.03, M=10, optionType="Put")
+
+
+def test_hit_returns_the_fresh_price_for_the_same_moneyness():
+    cache = PricingCache(paths=2000, step=0.01, neighbours=1, seed=3)
+    fresh = cache.price(100.0, 97.0, **ARGS)
+    assert cache.stats()["misses"] == 1
+    assert cache.price(100.0, 97.0, **ARGS) == fresh
+    #same moneyness at another spot: the same spot-1 entries, scaled
+    assert cache.price(50.0, 48.5, **ARGS) == pytest.approx(fresh / 2, rel=1e-12)
+    assert cache.stats()["hits"] == 2
+    assert PricingCache(paths=2000, step=0.01, neighbours=1, seed=3).price(100.0, 97.0, **ARGS) == fresh
+
+    #on a grid point the cache is the plain lsmc price on the fixed-seed spot-1 paths
+    paths = lsmc_engine.genPricePaths(0.3, 1.0, 0.03, 0.5, 10, 2000, rng=np.random.default_rng(3))
+    direct = lsmc_engine.calcOptnPrice(paths, 0.97, 0.03, 0.5, "Put")
+    assert fresh == pytest.approx(100.0 * direct, rel=1e-9)
+    key = cache._slice(**ARGS)
+    assert priceGrid(key, np.array([97]), 0.01, 2000, 3)[0] == pytest.approx(direct, rel=1e-9)
+
+
+def test_lru_eviction_respects_maxsize():
+    cache = PricingCache(paths=500, maxsize=6, step=0.01, neighbours=0, seed=1)
+    cache.price(100.0, 90.0, **ARGS)
+    key = cache._slice(**ARGS)
+    for K in (95.0, 100.0, 105.0, 110.0):
+        cache.price(100.0, K, **ARGS)
+        #the first bracket is kept warm, so eviction drops the others first
+        cache.get(100.0, 90.0, **ARGS, count=False)
+        assert len(cache._entries) <= 6
+    assert cache.stats()["entries"] == 6
+    assert key + (90,) in cache._entries and key + (91,) in cache._entries
+    assert key + (95,) not in cache._entries and key + (100,) not in cache._entries
+    assert key + (110,) in cache._entries
+
+    #a maxsize below the bracket still prices, straight from the grid
+    tiny = PricingCache(paths=500, maxsize=1, step=0.01, neighbours=0, seed=1)
+    assert tiny.price(100.0, 90.0, **ARGS) == cache.price(100.0, 90.0, **ARGS)
+    assert len(tiny._entries) == 1
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+import regression
+
+
+def _lstsq(A, y):
+    return np.linalg.lstsq(A, y, rcond=None)[0]
+
+
+def test_well_conditioned_design_matches_lstsq():
+    rng = np.random.default_rng(0)
+    x = rng.uniform(0.5, 1.5, 5000)
+    A = regression.basisMatrix(x, "poly3")
+    y = 2.0 - x + 0.5 * x**2 + rng.normal(0, 0.1, x.size)
+    called = []
+    beta = regression.solveNormalEquations(A.T @ A, A.T @ y, lambda: called.append(1) or _lstsq(A, y))
+    assert not called
+    assert beta == pytest.approx(_lstsq(A, y), rel=1e-8, abs=1e-10)
+    assert regression.solveLeastSquares(A, y) == pytest.approx(_lstsq(A, y), rel=1e-8, abs=1e-10)
+
+
+def test_near_collinear_design_takes_lstsq_fallback():
+    rng = np.random.default_rng(1)
+    x = rng.uniform(0.5, 1.5, 2000)
+    #third column equals the second up to 1e-7: the scaled Gram's condition number is far above COND_LIMIT
+    A = np.column_stack([np.ones_like(x), x, x + 1e-7 * rng.normal(size=x.size)])
+    y = 1.0 + 3.0 * x
+    G = A.T @ A
+    d = np.sqrt(np.diag(G))
+    assert np.linalg.cond(G / np.outer(d, d)) > regression.COND_LIMIT
+    called = []
+    def fallback():
+        called.append(1)
+        return _lstsq(A, y)
+    beta = regression.solveNormalEquations(G, A.T @ y, fallback)
+    assert called
+    assert np.all(np.isfinite(beta))
+    assert A @ beta == pytest.approx(y, rel=1e-6)
+    assert np.all(np.isfinite(regression.solveLeastSquares(A, y)))
+
+
+def test_batched_fit_matches_one_regression_per_contract():
+    rng = np.random.default_rng(2)
+    S = rng.uniform(60, 140, 3000)
+    S[:2] = 55.0
+    W = np.stack([S < k for k in (90.0, 100.0, 110.0)]).astype(float)
+    #one contract with fewer ITM paths than basis functions goes through lstsq
+    W = np.vstack([W, (S < 56.0).astype(float)])
+    fv = rng.normal(5, 1, (4, S.size))
+    fitted = regression.fitContinuationBatched(S, W, fv, 100.0, "poly2")
+    for c in range(4):
+        rows = W[c] > 0
+        ref, _ = regression.fitContinuation(S[rows], fv[c, rows], 100.0, "poly2")
+        assert fitted[c, rows] == pytest.approx(ref, rel=1e-8)
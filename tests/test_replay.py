@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import benchmarks
+import main
+import replay
+from vol_state import VolState
+
+TICKERS = ["AAPL", "MSFT", "TSLA"]
+
+
+def _record(root, monkeypatch):
+    provider = benchmarks.fake_provider(TICKERS, "2024-01-01", "2025-01-01")
+    clock = [datetime(2026, 10, 12, 10, 0)]
+    monkeypatch.setattr(replay.time, "time", lambda: clock[0].timestamp())
+    main.set_market_data_provider(replay.RecordingProvider(provider, root))
+    main.set_clock(lambda: clock[0])
+    main.set_vol_state(VolState(main.vol_estimator, main.vol_window, main.vol_ewma_lambda, None,
+                                main.start_date, main.end_date))
+    rng = np.random.default_rng(1)
+    trader = replay._ReplayTrader(journal=replay._MemoryJournal())
+    live = []
+    try:
+        for d in range(3):
+            for p in range(4):
+                clock[0] = datetime(2026, 10, 12 + d, 10, 0) + timedelta(minutes=p)
+                for t in TICKERS:
+                    provider.spots[t] *= float(np.exp(rng.normal(0, 0.01)))
+                    if p % 2 == 0:
+                        calls = provider.chains[(t, provider.expiry_lists[t][0])].calls
+                        for col in ("bid", "ask", "lastPrice"):
+                            calls[col] *= 1.01
+                for t in TICKERS:
+                    clock[0] += timedelta(seconds=1)
+                    seed = np.random.SeedSequence(0, spawn_key=(len(live),))
+                    live.append(main.run_once_for_ticker(t, trader, seed=seed))
+            main.revalue_book(trader)
+            main.record_cycle(0.0)
+    finally:
+        main.set_market_data_provider(None)
+        main.set_clock()
+        main.set_vol_state(None)
+    return live
+
+
+def test_replay_reproduces_recorded_decisions(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    root = str(tmp_path / "capture")
+    live = _record(root, monkeypatch)
+    assert all(r["ok"] for r in live)
+    monkeypatch.undo()
+    monkeypatch.chdir(tmp_path)
+
+    replayed = []
+    run_once = main.run_once_for_ticker
+    def spy(ticker, trader, seed=None):
+        res = run_once(ticker, trader, seed=seed)
+        replayed.append(res)
+        return res
+    monkeypatch.setattr(main, "run_once_for_ticker", spy)
+    out = replay.replay(root, {}, None, seed=0)
+
+    assert out["polls"] == len(live) and out["skipped"] == 0
+    assert [r["decision"] for r in replayed] == [r["decision"] for r in live]
+    assert [r["edge"] for r in replayed] == [r["edge"] for r in live]
+
+
+def test_unchanged_reads_dedupe_per_key_and_day(tmp_path):
+    rec = replay.RecordingProvider(benchmarks.fake_provider(["AAPL"], "2024-01-01", "2024-03-01"), str(tmp_path))
+    day1 = datetime(2026, 10, 12, 23, 59).timestamp()
+    day2 = datetime(2026, 10, 13, 0, 1).timestamp()
+    same = (np.arange(3.0),)
+    assert rec._changed(day1, "a", same)
+    assert not rec._changed(day1, "a", same)
+    assert rec._changed(day2, "a", same)
+    #a day-1 poll finishing after midnight neither dedupes against day 2 nor resets day 2's keys
+    assert rec._changed(day1, "b", same)
+    assert not rec._changed(day2, "a", same)
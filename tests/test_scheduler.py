@@ -0,0 +1,40 @@
+import main
+from metrics import Metrics, set_metrics
+from paper_trader import PaperTrader
+from scheduler import DeadlineScheduler
+from trade_journal import TradeJournal
+
+
+def test_overrun_skips_missed_deadlines_and_is_reported_once_per_period():
+    sched = DeadlineScheduler({"A": 10.0, "B": 10.0}, fast_interval=2.0, max_in_flight=1, now=0.0)
+    assert sched.take_due(0.0) == ["A"]
+    #A runs past two of its deadlines: one overrun, two skipped, next deadline back on its grid
+    assert sched.finish("A", 25.0) == (25.0, 2)
+    assert sched.slots["A"].due == 30.0
+    assert sched.take_due(25.0) == ["B"]
+    assert sched.finish("B", 26.0) == (21.0, 2)
+
+    latency, overruns = sched.period()
+    assert latency == [25.0, 21.0] and overruns == 2
+    assert sched.period() == ([], 0)
+    assert sched.stats()["overruns"] == 2
+
+
+def test_close_period_records_ticker_runs_as_cycles(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(main, "settle_expired", False)
+    mx = Metrics("jsonl", str(tmp_path / "metrics.jsonl"))
+    set_metrics(mx)
+    try:
+        sched = DeadlineScheduler({"A": 10.0, "B": 10.0}, fast_interval=2.0, now=0.0)
+        sched.take_due(5.0)
+        sched.finish("A", 25.0)
+        sched.finish("B", 6.0)
+        trader = PaperTrader(journal=TradeJournal(str(tmp_path / "journal"), fsync=False))
+        main._close_period(sched, trader)
+    finally:
+        set_metrics(None)
+    total = mx._total
+    assert total["histograms"][("cycle_seconds",)][2] == 2
+    assert total["histograms"][("cycle_seconds",)][1] == 25.0 + 1.0
+    assert total["counters"][("cycle_overruns",)] == 1
@@ -0,0 +1,38 @@
+import threading
+import types
+
+from metrics import Metrics
+from service import PriceBatcher
+
+
+class _FakeService:
+    def __init__(self, results):
+        self.main = types.SimpleNamespace(get_metrics=lambda: Metrics("off"))
+        self.results = results
+        self.calls = []
+
+    def run(self, names, trade):
+        self.calls.append((list(names), trade))
+        return [dict(r) for r in self.results if r["ticker"] in names]
+
+
+def test_batcher_returns_every_scan_result_per_ticker():
+    scan = [{"ok": True, "ticker": "AAPL", "listed_strike": k} for k in (95.0, 100.0, 105.0)]
+    service = _FakeService(scan + [{"ok": True, "ticker": "MSFT", "listed_strike": 300.0}])
+    batcher = PriceBatcher(service, window_ms=300.0)
+    try:
+        out = {}
+        threads = [threading.Thread(target=lambda key=key, names=names: out.__setitem__(key, batcher.submit(names)))
+                   for key, names in (("a", ["aapl", "TSLA"]), ("b", ["MSFT", "AAPL"]))]
+        for th in threads:
+            th.start()
+        for th in threads:
+            th.join()
+    finally:
+        batcher.close()
+    assert [r["listed_strike"] for r in out["a"][:3]] == [95.0, 100.0, 105.0]
+    assert out["a"][3] == {"ok": False, "ticker": "TSLA", "reason": "not priced"}
+    assert [(r["ticker"], r["listed_strike"]) for r in out["b"]] == \
+        [("MSFT", 300.0), ("AAPL", 95.0), ("AAPL", 100.0), ("AAPL", 105.0)]
+    #both requests went out as one executor call over the unique tickers
+    assert len(service.calls) == 1 and sorted(service.calls[0][0]) == ["AAPL", "MSFT", "TSLA"]
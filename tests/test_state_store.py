@@ -0,0 +1,84 @@
+import json
+
+from paper_trader import PaperTrader
+from state_store import StateStore
+from trade_journal import TradeJournal
+
+
+def _event(optnID, qty, cash):
+    return {"op": "buy", "optnID": optnID, "position": {"qty": qty}, "currCash": cash}
+
+
+def test_torn_last_wal_line_is_skipped(tmp_path):
+    store = StateStore(str(tmp_path / "state.json"), fsync=False)
+    store.load()
+    store.append(_event("A", 1, 90.0))
+    store.append(_event("B", 2, 80.0))
+    store.close()
+    good = store.wal_path.stat().st_size
+    #crash mid-append: the last line never got its newline
+    with open(store.wal_path, "a", encoding="utf-8") as fh:
+        fh.write('{"op":"buy","optnID":"C","position":{"qty":3},"currCash":70.0,"se')
+
+    reader = StateStore(str(tmp_path / "state.json"), fsync=False)
+    state = reader.load(repair=False)
+    assert sorted(state["positions"]) == ["A", "B"]
+    assert state["currCash"] == 80.0
+    assert reader.seq == 2
+    assert reader.wal_path.stat().st_size > good
+
+    owner = StateStore(str(tmp_path / "state.json"), fsync=False)
+    assert owner.load() == state
+    assert owner.wal_path.stat().st_size == good
+    #appends after the repair land on a clean line
+    owner.append(_event("C", 3, 70.0))
+    owner.close()
+    state = StateStore(str(tmp_path / "state.json"), fsync=False).load()
+    assert sorted(state["positions"]) == ["A", "B", "C"]
+
+
+def test_replay_after_snapshot_applies_only_newer_deltas(tmp_path):
+    store = StateStore(str(tmp_path / "state.json"), fsync=False)
+    store.load()
+    store.append(_event("A", 1, 90.0))
+    store.append(_event("B", 2, 80.0))
+    snap_state = {"positions": {"A": {"qty": 1}, "B": {"qty": 5}}, "currCash": 80.0}
+    store.snapshot(snap_state)
+    store.append(_event("C", 3, 70.0))
+    store.close()
+    #crash between snapshot and truncation: the old deltas are still in the log ahead of the new one
+    lines = [json.dumps(dict(_event("A", 9, 10.0), seq=1)), json.dumps(dict(_event("B", 2, 80.0), seq=2))]
+    tail = store.wal_path.read_text(encoding="utf-8")
+    store.wal_path.write_text("\n".join(lines) + "\n" + tail, encoding="utf-8")
+
+    reader = StateStore(str(tmp_path / "state.json"), fsync=False)
+    state = reader.load()
+    assert reader.snapshot_seq == 2
+    assert reader.seq == 3
+    assert state["positions"] == {"A": {"qty": 1}, "B": {"qty": 5}, "C": {"qty": 3}}
+    assert state["currCash"] == 70.0
+    assert reader.pending() == 1
+
+
+def test_compaction_every_snapshot_every_deltas_truncates_wal(tmp_path):
+    path = str(tmp_path / "portfolio_state.json")
+    trader = PaperTrader.load_state(path, starting_cash=1000.0, journal=TradeJournal(str(tmp_path / "journal"), fsync=False))
+    trader.store.snapshot_every = 3
+    trader.store.fsync = False
+
+    for i in range(5):
+        trader.buyOptn(f"X{i}", 100.0, 1, 1.0, "call", "2026-11-20", 100.0, "2026-10-01 10:00:00")
+        trader.save_state(path)
+        if i == 2:
+            #third delta: compacted into the snapshot, log starts over
+            assert trader.store.wal_path.stat().st_size == 0
+            assert trader.store.pending() == 0
+    assert trader.store.pending() == 2
+    assert len(trader.store.wal_path.read_text(encoding="utf-8").splitlines()) == 2
+    assert json.loads(trader.store.snapshot_path.read_text())["wal_seq"] == 3
+    trader.store.close()
+    trader.journal.close()
+
+    loaded = PaperTrader.load_state(path, journal=TradeJournal(str(tmp_path / "journal"), fsync=False), wal=False)
+    assert sorted(loaded.positions.keys()) == [f"X{i}" for i in range(5)]
+    assert loaded.currCash == trader.currCash
@@ -0,0 +1,100 @@
+import math
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from vol_state import VolState
+
+TICKERS = ["A", "B", "C"]
+DAYS = np.arange(np.datetime64("2024-01-01"), np.datetime64("2025-12-31"), dtype="datetime64[D]")
+DAYS = DAYS[np.is_busday(DAYS)]
+
+
+def _bars(seed):
+    rng = np.random.default_rng(seed)
+    data = {}
+    for t in TICKERS:
+        c = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, DAYS.size)))
+        data[t] = {"date": DAYS, "close": c, "high": c * np.exp(np.abs(rng.normal(0, 0.01, DAYS.size))),
+                   "low": c * np.exp(-np.abs(rng.normal(0, 0.01, DAYS.size)))}
+    data["C"]["close"][5] = np.nan
+    return data
+
+
+#history as a provider would serve it on `today`: nothing after today, today's bar still forming
+def _history(data, today):
+    def history(ticker, start, end):
+        d = data[ticker]["date"]
+        keep = (d >= np.datetime64(start)) & (d < np.datetime64(end)) & (d <= np.datetime64(today))
+        return {k: v[keep] for k, v in data[ticker].items()} if keep.any() else None
+    return history
+
+
+def _recompute(bars, today, estimator, window, lam=0.94):
+    keep = bars["date"] <= np.datetime64(today)
+    c, h, l = bars["close"][keep], bars["high"][keep], bars["low"][keep]
+    ok = ~np.isnan(c)
+    if estimator == "parkinson":
+        x = np.log(h[ok] / l[ok]) ** 2
+        x = x[-window:] if window else x
+        return math.sqrt(x.mean() / (4 * math.log(2)) * 252)
+    r = np.diff(np.log(c[ok]))
+    if estimator == "close":
+        r = r[-window:] if window else r
+        return float(np.std(r, ddof=1) * np.sqrt(252))
+    v = None
+    for x in r:
+        v = x * x if v is None else lam * v + (1 - lam) * x * x
+    return math.sqrt(v * 252)
+
+
+@pytest.mark.parametrize("window", [0, 60])
+@pytest.mark.parametrize("estimator", ["close", "ewma", "parkinson"])
+def test_incremental_matches_recompute(tmp_path, estimator, window):
+    data = _bars(3)
+    path = str(tmp_path / "vol.npz")
+    vs = VolState(estimator, window, 0.94, path, "2024-01-01", "2026-01-01")
+    for today in [date(2025, 3, 3) + timedelta(days=i) for i in range(90)]:
+        if today.day == 1:
+            #restart from disk now and then
+            vs.save()
+            vs = VolState(estimator, window, 0.94, path, "2024-01-01", "2026-01-01")
+        vs.refresh(TICKERS, _history(data, today), today)
+        for t in TICKERS:
+            assert vs.estimate(t) == pytest.approx(_recompute(data[t], today, estimator, window), rel=1e-10)
+
+
+@pytest.mark.parametrize("window", [0, 60])
+@pytest.mark.parametrize("estimator", ["close", "ewma", "parkinson"])
+def test_save_load_is_bit_stable(tmp_path, estimator, window):
+    data = _bars(5)
+    path = tmp_path / "vol.npz"
+    today = date(2025, 6, 11)
+    vs = VolState(estimator, window, 0.94, str(path), "2024-01-01", "2026-01-01")
+    vs.refresh(TICKERS, _history(data, today), today)
+    vs.save()
+
+    loaded = VolState(estimator, window, 0.94, str(path), "2024-01-01", "2026-01-01")
+    assert loaded._index == vs._index
+    for name, col in vs._cols.items():
+        if name == "checked":
+            continue
+        assert loaded._cols[name][:vs._n].tobytes() == col[:vs._n].tobytes(), name
+    loaded.refresh(TICKERS, _history(data, today), today)
+    for t in TICKERS:
+        assert loaded.estimate(t) == vs.estimate(t)
+
+    #a second round trip writes the same arrays again
+    loaded._dirty = True
+    path2 = tmp_path / "vol2.npz"
+    loaded.path = path2
+    loaded.save()
+    with np.load(path, allow_pickle=False) as a, np.load(path2, allow_pickle=False) as b:
+        for name in a.files:
+            if name != "checked":
+                assert a[name].tobytes() == b[name].tobytes(), name
+
+    #another estimator's file is not reused
+    other = "ewma" if estimator != "ewma" else "close"
+    assert VolState(other, window, 0.94, str(path), "2024-01-01", "2026-01-01")._n == 0
@@ -0,0 +1,118 @@
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Iterable
+
+#append-only trade journal, one JSON line per trade in a file per day
+#each append is a single line write + flush (+ fsync), so logging cost does not grow with the day's trades;
+#the Excel workbook is rebuilt from the journal in batches by export_excel
+class TradeJournal:
+    def __init__(self, journal_dir: str = "trade_journal", fsync: bool = True):
+        self.dir = Path(journal_dir)
+        self.fsync = bool(fsync)
+        self._files: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        #days whose file grew since its last export (sizes kept in exported.json), so trades appended just before
+        #a crash still reach the workbook after a restart
+        self._pending_days = {day for day in self.days() if self._size(day) != self._exported().get(day)}
+
+    def _day_path(self, day: str) -> Path:
+        return self.dir / f"{day}.jsonl"
+
+    def _size(self, day: str) -> int:
+        try:
+            return self._day_path(day).stat().st_size
+        except OSError:
+            return 0
+
+    #day -> size of its journal file when it was last exported
+    def _exported(self) -> Dict[str, int]:
+        try:
+            return json.loads((self.dir / "exported.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def _mark_exported(self, sizes: Dict[str, int]) -> None:
+        exported = self._exported()
+        exported.update(sizes)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.dir / "exported.json.tmp"
+        tmp.write_text(json.dumps(exported, sort_keys=True), encoding="utf-8")
+        os.replace(tmp, self.dir / "exported.json")
+
+    def append(self, entry: Dict[str, Any], day: str) -> None:
+        line = json.dumps(entry, separators=(",", ":"), default=str) + "\n"
+        with self._lock:
+            fh = self._files.get(day)
+            if fh is None:
+                #a new day: close yesterday's handle, keep at most one open
+                for old in self._files.values():
+                    old.close()
+                self._files.clear()
+                self.dir.mkdir(parents=True, exist_ok=True)
+                fh = self._files[day] = open(self._day_path(day), "a", encoding="utf-8")
+            fh.write(line)
+            fh.flush()
+            if self.fsync:
+                os.fsync(fh.fileno())
+            self._pending_days.add(day)
+
+    def days(self) -> List[str]:
+        if not self.dir.exists():
+            return []
+        return sorted(p.stem for p in self.dir.glob("*.jsonl"))
+
+    def read(self, day: str) -> List[Dict[str, Any]]:
+        path = self._day_path(day)
+        if not path.exists():
+            return []
+        entries = []
+        with open(path, "r", encoding="utf-8") as fh:
+            for line in fh:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    #torn last line from a crash mid-write, everything before it is intact
+                    continue
+        return entries
+
+    #rewrite the "Registered Trades (day)" sheet of every day with new trades (or the given days)
+    #returns False when the workbook is locked; those days stay pending and go out on the next export
+    def export_excel(self, file_name: str, days: Optional[Iterable[str]] = None) -> bool:
+        with self._lock:
+            todo = sorted(self._pending_days if days is None else set(days))
+        if not todo:
+            return True
+
+        import pandas as pd
+        #sizes before reading: a line appended meanwhile is exported now or, at worst, again next time
+        sizes = {day: self._size(day) for day in todo}
+        frames = {f"Registered Trades ({day})": pd.DataFrame(self.read(day)) for day in todo}
+        try:
+            if os.path.exists(file_name):
+                with pd.ExcelWriter(file_name, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
+                    for sheet_name, df in frames.items():
+                        df.to_excel(writer, sheet_name=sheet_name, index=False)
+            else:
+                with pd.ExcelWriter(file_name, engine='openpyxl') as writer:
+                    for sheet_name, df in frames.items():
+                        df.to_excel(writer, sheet_name=sheet_name, index=False)
+        except PermissionError:
+            print(f"[WARN] {file_name} locked. Trades stay in {self.dir} and export on the next cycle.")
+            return False
+
+        with self._lock:
+            #a day that grew while its sheet was written stays pending
+            self._pending_days.difference_update(day for day in todo if self._size(day) == sizes[day])
+            self._mark_exported(sizes)
+        return True
+
+    def close(self) -> None:
+        with self._lock:
+            for fh in self._files.values():
+                fh.close()
+            self._files.clear()
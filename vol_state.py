@@ -0,0 +1,302 @@
+import json
+import math
+import os
+import threading
+from datetime import date
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Callable, Sequence
+
+import numpy as np
+
+#annualized historical vol kept as running per-ticker state instead of recomputed from the whole series every poll
+#estimators (VOL_ESTIMATOR):
+#  close      sample std (ddof=1) of close-to-close log returns, Welford running mean/M2
+#  ewma       RiskMetrics-style exponentially weighted variance of the log returns, decay VOL_EWMA_LAMBDA
+#  parkinson  mean of ln(high/low)^2 / (4 ln 2), a range estimator that uses the intraday high and low
+#VOL_WINDOW > 0 keeps the last that many bars in a ring buffer per ticker and retires the oldest on every push
+#(close and parkinson; ewma forgets on its own), 0 = every bar since start_date
+#one row per ticker in numpy columns, so a batch of new bars updates the whole watchlist with a few array ops per
+#bar; bars before today are committed, today's (still forming) bar only enters the estimate, never the state
+ESTIMATORS = ("close", "ewma", "parkinson")
+
+#fewest closes the estimate needs, the same floor the full recompute had
+MIN_BARS = 30
+
+ANNUAL_BARS = 252.0
+
+class VolState:
+    def __init__(self, estimator: str = "close", window: int = 0, ewma_lambda: float = 0.94,
+                 path: Optional[str] = None, start: str = "2024-01-01", end: str = "2025-01-01",
+                 capacity: int = 16):
+        estimator = (estimator or "close").lower()
+        if estimator not in ESTIMATORS:
+            raise ValueError(f"VOL_ESTIMATOR must be one of {ESTIMATORS}, got {estimator!r}")
+        self.estimator = estimator
+        self.window = max(0, int(window))
+        self.ewma_lambda = float(ewma_lambda)
+        self.path = Path(path) if path else None
+        self.start, self.end = start, end
+        self._lock = threading.Lock()
+        self._index: Dict[str, int] = {}
+        self._n = 0
+        self._dirty = False
+        #today's bars (close, high, low) per ticker from the last refresh, folded into estimates only
+        self.forming: Dict[str, tuple] = {}
+        self._alloc(max(1, int(capacity)))
+        if self.path is not None:
+            self._load()
+
+    #state columns, one row per ticker:
+    #last: date of the last committed bar, checked: the day the tail was last fetched, close: last committed close
+    #count/mean/m2: Welford over the window's log returns, ewma: weighted variance, psum: sum of ln(H/L)^2,
+    #bars: closes committed, ring/pos: the window's values (returns or ln(H/L)^2) oldest at pos
+    def _alloc(self, capacity: int) -> None:
+        old = self.__dict__.get("_cols")
+        width = max(1, self.window)
+        cols = {
+            "last": np.full(capacity, np.datetime64("NaT"), dtype="datetime64[D]"),
+            "checked": np.full(capacity, np.datetime64("NaT"), dtype="datetime64[D]"),
+            "close": np.full(capacity, np.nan),
+            "count": np.zeros(capacity, dtype=np.int64),
+            "mean": np.zeros(capacity),
+            "m2": np.zeros(capacity),
+            "ewma": np.full(capacity, np.nan),
+            "psum": np.zeros(capacity),
+            "bars": np.zeros(capacity, dtype=np.int64),
+            "ring": np.zeros((capacity, width)),
+            "pos": np.zeros(capacity, dtype=np.int64),
+        }
+        if old is not None:
+            for name, col in cols.items():
+                col[:self._n] = old[name][:self._n]
+        self._cols = cols
+
+    def _row(self, ticker: str) -> int:
+        i = self._index.get(ticker)
+        if i is None:
+            if self._n == self._cols["last"].size:
+                self._alloc(2 * self._n)
+            i = self._index[ticker] = self._n
+            self._n += 1
+        return i
+
+    #what a saved state must match to be reused; anything else starts over from the full window
+    def _fingerprint(self) -> Dict[str, Any]:
+        return {"estimator": self.estimator, "window": self.window, "lambda": self.ewma_lambda,
+                "start": self.start, "end": self.end}
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                if json.loads(str(data["meta"])) != self._fingerprint():
+                    return
+                tickers = [str(t) for t in data["tickers"]]
+                self._alloc(max(16, 2 * len(tickers)))
+                for name, col in self._cols.items():
+                    col[:len(tickers)] = data[name]
+                #today's forming bar is not saved, so a restart fetches the tail again
+                self._cols["checked"][:] = np.datetime64("NaT")
+        except Exception:
+            #unreadable or from another layout: rebuilt from history on first use
+            return
+        self._index = {t: i for i, t in enumerate(tickers)}
+        self._n = len(tickers)
+
+    #atomic npz write when anything was committed since the last save
+    def save(self) -> None:
+        if self.path is None:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            n = self._n
+            arrays = {name: col[:n].copy() for name, col in self._cols.items()}
+            tickers = np.array(sorted(self._index, key=self._index.get), dtype=str)
+            self._dirty = False
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp.npz")
+        np.savez(tmp, meta=json.dumps(self._fingerprint()), tickers=tickers, **arrays)
+        os.replace(tmp, self.path)
+
+    #tickers whose bar tail has not been fetched today
+    def stale(self, tickers: Sequence[str], today: date) -> List[str]:
+        day = np.datetime64(today, "D")
+        with self._lock:
+            return [t for t in tickers if t not in self._index or self._cols["checked"][self._index[t]] != day]
+
+    #first date still missing from ticker's state (start_date for a new ticker)
+    def next_date(self, ticker: str) -> str:
+        with self._lock:
+            i = self._index.get(ticker)
+            if i is None or np.isnat(self._cols["last"][i]):
+                return self.start
+            return str(self._cols["last"][i] + np.timedelta64(1, "D"))
+
+    #fetch the missing tail of every stale ticker through history(ticker, start, end) (None = no bars; map runs
+    #the fetches, e.g. a thread pool's map) and commit the closed bars in one vectorized pass; today's bars are
+    #kept aside in self.forming for estimate(); returns the tickers whose fetch raised
+    def refresh(self, tickers: Sequence[str], history: Callable, today: date, map=map) -> List[str]:
+        stale = self.stale(tickers, today)
+        if not stale:
+            return []
+        starts = [self.next_date(t) for t in stale]
+        end = self.end
+
+        def load(args):
+            ticker, start = args
+            if np.datetime64(start) >= np.datetime64(end):
+                return ticker, {}
+            try:
+                return ticker, history(ticker, start, end) or {}
+            except Exception:
+                return ticker, None
+        tails = list(map(load, zip(stale, starts)))
+
+        day = np.datetime64(today, "D")
+        failed = [t for t, bars in tails if bars is None]
+        fetched = [(t, bars or {}) for t, bars in tails if bars is not None]
+        with self._lock:
+            rows, closed = [], []
+            for ticker, bars in fetched:
+                i = self._row(ticker)
+                d = np.asarray(bars.get("date", np.empty(0, dtype="datetime64[D]")), dtype="datetime64[D]")
+                c = np.asarray(bars.get("close", np.empty(0)), dtype=np.float64).reshape(-1)
+                h = np.asarray(bars.get("high", c), dtype=np.float64).reshape(-1)
+                l = np.asarray(bars.get("low", c), dtype=np.float64).reshape(-1)
+                last = self._cols["last"][i]
+                keep = ~np.isnan(c) & (d < day)
+                if not np.isnat(last):
+                    keep &= d > last
+                today_bars = ~np.isnan(c) & (d >= day)
+                self.forming[ticker] = (c[today_bars], h[today_bars], l[today_bars])
+                if keep.any():
+                    rows.append(i)
+                    closed.append((d[keep], c[keep], h[keep], l[keep]))
+                self._cols["checked"][i] = day
+            if rows:
+                self._commit(np.asarray(rows), closed)
+        return failed
+
+    #push k-th new bars of all rows together: one round of array ops per bar depth, not per ticker
+    def _commit(self, rows: np.ndarray, closed: List[tuple]) -> None:
+        depth = max(b[1].size for b in closed)
+        C = np.full((rows.size, depth), np.nan)
+        P = np.full((rows.size, depth), np.nan)
+        for j, (d, c, h, l) in enumerate(closed):
+            C[j, :c.size] = c
+            with np.errstate(divide="ignore", invalid="ignore"):
+                P[j, :c.size] = np.log(h / l) ** 2
+        cols = self._cols
+        for k in range(depth):
+            have = ~np.isnan(C[:, k])
+            r = rows[have]
+            x = C[have, k]
+            prev = cols["close"][r]
+            cols["bars"][r] += 1
+            cols["close"][r] = x
+            if self.estimator == "parkinson":
+                v = P[have, k]
+                ok = np.isfinite(v)
+                self._push(r[ok], v[ok])
+                continue
+            #a return needs a previous close; the first bar of a ticker only sets it
+            ok = ~np.isnan(prev)
+            self._push(r[ok], np.log(x[ok] / prev[ok]))
+        for j, (d, c, h, l) in enumerate(closed):
+            cols["last"][rows[j]] = d[-1]
+        self._dirty = True
+
+    #one new value per row: Welford add (and, with a full window, removal of the value it replaces),
+    #the ewma recursion and the range sum
+    def _push(self, r: np.ndarray, x: np.ndarray) -> None:
+        if r.size == 0:
+            return
+        cols = self._cols
+        if self.window:
+            full = cols["count"][r] >= self.window
+            if full.any():
+                rf = r[full]
+                old = cols["ring"][rf, cols["pos"][rf]]
+                self._remove(rf, old)
+            cols["ring"][r, cols["pos"][r]] = x
+            cols["pos"][r] = (cols["pos"][r] + 1) % self.window
+        n = cols["count"][r] + 1
+        d = x - cols["mean"][r]
+        mean = cols["mean"][r] + d / n
+        cols["m2"][r] += d * (x - mean)
+        cols["mean"][r] = mean
+        cols["count"][r] = n
+        cols["psum"][r] += x
+        lam = self.ewma_lambda
+        ew = cols["ewma"][r]
+        cols["ewma"][r] = np.where(np.isnan(ew), x * x, lam * np.nan_to_num(ew) + (1.0 - lam) * x * x)
+
+    def _remove(self, r: np.ndarray, x: np.ndarray) -> None:
+        cols = self._cols
+        n = cols["count"][r]
+        m = cols["mean"][r]
+        mean = np.where(n > 1, m - (x - m) / np.maximum(n - 1, 1), 0.0)
+        cols["m2"][r] = np.where(n > 1, cols["m2"][r] - (x - m) * (x - mean), 0.0)
+        cols["mean"][r] = mean
+        cols["count"][r] = n - 1
+        cols["psum"][r] -= x
+
+    #annualized vol from the committed state plus today's forming bar(s), or None when fewer than MIN_BARS
+    #closes are in (O(1): the forming bars are folded into copies of the running sums)
+    def estimate(self, ticker: str) -> Optional[float]:
+        with self._lock:
+            i = self._index.get(ticker)
+            if i is None:
+                return None
+            c = self._cols
+            bars, close = int(c["bars"][i]), float(c["close"][i])
+            count, mean, m2 = int(c["count"][i]), float(c["mean"][i]), float(c["m2"][i])
+            ew, psum = float(c["ewma"][i]), float(c["psum"][i])
+            ring = c["ring"][i].copy() if self.window else None
+            pos = int(c["pos"][i])
+            fc, fh, fl = self.forming.get(ticker, (np.empty(0), np.empty(0), np.empty(0)))
+
+        for x_close, hi, lo in zip(fc, fh, fl):
+            if self.estimator == "parkinson":
+                x = math.log(hi / lo) ** 2 if hi > 0 and lo > 0 else float("nan")
+            else:
+                x = math.log(x_close / close) if close == close else float("nan")
+            bars += 1
+            close = x_close
+            if x != x:
+                continue
+            if self.window and count >= self.window:
+                old = ring[pos]
+                mean_old = mean
+                mean = mean - (old - mean) / (count - 1) if count > 1 else 0.0
+                m2 = m2 - (old - mean_old) * (old - mean) if count > 1 else 0.0
+                psum -= old
+                count -= 1
+                ring[pos] = x
+                pos = (pos + 1) % self.window
+            count += 1
+            d = x - mean
+            mean += d / count
+            m2 += d * (x - mean)
+            psum += x
+            ew = x * x if ew != ew else self.ewma_lambda * ew + (1.0 - self.ewma_lambda) * x * x
+
+        if bars < MIN_BARS:
+            return None
+        if self.estimator == "close":
+            var = m2 / (count - 1) if count > 1 else float("nan")
+        elif self.estimator == "ewma":
+            var = ew
+        else:
+            var = psum / count / (4.0 * math.log(2.0)) if count else float("nan")
+        if not var == var or var < 0:
+            return None
+        return math.sqrt(var * ANNUAL_BARS)
+
+    #closes committed for ticker (0 when it has no history at all)
+    def bars(self, ticker: str) -> int:
+        with self._lock:
+            i = self._index.get(ticker)
+            return 0 if i is None else int(self._cols["bars"][i])